@@ -3,6 +3,11 @@ ASGI config for recipe_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Async views, such as recipes.views.like_state_async, run on the event
+loop when the site is served from here (e.g. ``uvicorn
+recipe_project.asgi:application``); under WSGI they still work, but
+each request starts its own event loop.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -1,7 +1,25 @@
 """
-Custom middleware for security headers
+Custom middleware for security headers, query budgets and request
+timing
 """
 
+import contextvars
+import functools
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger("recipe_project.timing")
+
 
 class SecurityHeadersMiddleware:
     """Add additional security headers to responses"""
@@ -44,3 +62,255 @@ class SecurityHeadersMiddleware:
         )
 
         return response
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more SQL queries than its QUERY_BUDGETS entry allows"""
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_SAVEPOINT_RE = re.compile(r'"s\d+_x\d+"')
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """
+    Reduce a query to its shape, so the same query with different
+    values (or a different number of IN (...) values) groups together.
+    """
+    sql = _SAVEPOINT_RE.sub("?", sql)
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _LIST_RE.sub("(...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def template_origin():
+    """
+    The "template:line" of the template node currently rendering, or
+    None when the caller is not inside a template.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                return f"{origin.template_name or origin.name}:{token.lineno}"
+        frame = frame.f_back
+    return None
+
+
+class QueryLog:
+    """Execute wrapper remembering each query's shape and template"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((fingerprint(sql), template_origin()))
+        return execute(sql, params, many, context)
+
+    def summary(self, limit=5):
+        """The most repeated query shapes with where they came from"""
+        counts = Counter(self.queries)
+        return [
+            f"{count}x {sql}" + (f" [{origin}]" if origin else "")
+            for (sql, origin), count in counts.most_common(limit)
+        ]
+
+
+class QueryBudgetMiddleware:
+    """
+    Check each request's query count against settings.QUERY_BUDGETS,
+    keyed by URL name. A budget is either a number or a dict of numbers
+    keyed by HTTP method; views and methods without one are unchecked.
+
+    QUERY_BUDGET_MODE "log" logs violations and flags the response with
+    an X-Query-Budget header (for staging); "raise" raises
+    QueryBudgetExceeded (for the test suite). Anything else disables
+    the middleware.
+    """
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, "QUERY_BUDGET_MODE", "off")
+        if self.mode not in ("log", "raise"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(
+            match.url_name if match else None
+        )
+        if isinstance(budget, dict):
+            budget = budget.get(request.method)
+        if budget is None or len(log) <= budget:
+            return response
+
+        message = (
+            f"{match.url_name} ran {len(log)} queries "
+            f"(budget {budget}): {request.method} {request.path}\n  "
+            + "\n  ".join(log.summary())
+        )
+        if self.mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        response["X-Query-Budget"] = f"exceeded; {len(log)}/{budget}"
+        return response
+
+
+_active_timer = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Times one request's queries and template rendering"""
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.render_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+def _timed_render(render):
+    """Wrap Template.render to add top-level render time to the timer"""
+
+    @functools.wraps(render)
+    def wrapper(self, *args, **kwargs):
+        timer = _active_timer.get()
+        if timer is None:
+            return render(self, *args, **kwargs)
+        timer.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timer.render_depth -= 1
+            # Included templates are part of their parent's time
+            if not timer.render_depth:
+                timer.template += time.perf_counter() - started
+
+    wrapper.timed = True
+    return wrapper
+
+
+class TimingStats:
+    """Per URL name request timings, aggregated in this process"""
+
+    FIELDS = ("total_ms", "db_ms", "queries", "template_ms")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, url_name, fields):
+        with self._lock:
+            entry = self._views.setdefault(
+                url_name,
+                {"count": 0, "max_total_ms": 0.0,
+                 **{name: 0.0 for name in self.FIELDS}},
+            )
+            entry["count"] += 1
+            entry["max_total_ms"] = max(
+                entry["max_total_ms"], fields["total_ms"]
+            )
+            for name in self.FIELDS:
+                entry[name] += fields[name]
+
+    def snapshot(self):
+        """Request count, mean of each field and slowest total per view"""
+        with self._lock:
+            return {
+                url_name: {
+                    "count": entry["count"],
+                    "max_total_ms": round(entry["max_total_ms"], 2),
+                    **{
+                        f"mean_{name}": round(
+                            entry[name] / entry["count"], 2
+                        )
+                        for name in self.FIELDS
+                    },
+                }
+                for url_name, entry in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+timing_stats = TimingStats()
+
+
+class RequestTimingMiddleware:
+    """
+    Measure where each request's time goes when settings.REQUEST_TIMING
+    is on: total time, database time and query count, and template
+    render time (which includes any queries run while rendering).
+
+    The numbers are sent as a Server-Timing header (shown in the
+    browser's network panel), logged to "recipe_project.timing" with
+    one structured field per measure, and added to ``timing_stats``.
+    When REQUEST_TIMING is off the middleware removes itself.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_TIMING", False):
+            raise MiddlewareNotUsed
+        if not getattr(Template.render, "timed", False):
+            Template.render = _timed_render(Template.render)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = RequestTimer()
+        token = _active_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timer):
+                response = self.get_response(request)
+        finally:
+            _active_timer.reset(token)
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        fields = {
+            "url_name": match.url_name if match else None,
+            "method": request.method,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "db_ms": round(timer.db * 1000, 2),
+            "queries": timer.queries,
+            "template_ms": round(timer.template * 1000, 2),
+        }
+        response["Server-Timing"] = (
+            f'db;dur={fields["db_ms"]};desc="{timer.queries} queries", '
+            f'tpl;dur={fields["template_ms"]};desc="Templates", '
+            f'total;dur={fields["total_ms"]}'
+        )
+        timing_logger.info(
+            " ".join(f"{name}={value}" for name, value in fields.items()),
+            extra=fields,
+        )
+        if fields["url_name"]:
+            timing_stats.add(fields["url_name"], fields)
+        return response
@@ -0,0 +1,175 @@
+"""
+Opt-in sampling profiler for production workers
+
+A single background thread wakes every PROFILING_INTERVAL_MS and reads
+the current stack of each request being profiled (sys._current_frames),
+so a profiled request runs at full speed apart from those brief reads.
+A request is profiled when it is picked at random (PROFILING_SAMPLE_RATE)
+or, if PROFILING_SLOW_MS is set, kept when it turns out to be slower
+than that.
+
+Each kept request is written to PROFILING_DIR/<url name>/ in collapsed
+stack format ("outer;inner;leaf count" per line), which flamegraph.pl,
+speedscope and similar tools read directly. The profile_report command
+merges the files per URL name and summarises where time went.
+"""
+
+import functools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+FILENAME_RE = re.compile(
+    r"^(?P<started>\d+)-(?P<pid>\d+)-(?P<thread>\d+)-(?P<ms>\d+)ms\.folded$"
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename):
+    """A module path relative to the sys.path entry it was loaded from"""
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def frame_label(code):
+    """Label a code object as ``function (module/path.py:line)``"""
+    path = _short_path(code.co_filename)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """Samples the stacks of registered threads from one helper thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._targets = {}
+        self._thread = None
+        self.interval = 0.005
+        # Frames above the profiler's own middleware are the server's
+        self.root_code = None
+
+    def start(self, thread_id):
+        """Begin sampling ``thread_id``; returns its sample Counter"""
+        samples = Counter()
+        with self._lock:
+            self._targets[thread_id] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profiling-sampler", daemon=True
+                )
+                self._thread.start()
+        return samples
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None and frame.f_code is not self.root_code:
+            labels.append(frame_label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            # Held while sampling so stop() never returns a Counter that
+            # is still being updated
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for thread_id, samples in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[self._stack(frame)] += 1
+                del frames
+
+
+sampler = Sampler()
+
+
+def write_profile(directory, url_name, started, duration, samples):
+    """Write one request's samples in collapsed stack format"""
+    folder = Path(directory) / (url_name or "unresolved")
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / (
+        f"{int(started * 1000)}-{os.getpid()}-{threading.get_ident()}-"
+        f"{int(duration * 1000)}ms.folded"
+    )
+    with open(path, "w", encoding="utf-8") as handle:
+        for stack, count in samples.most_common():
+            if stack:
+                handle.write(f"{stack} {count}\n")
+    return path
+
+
+def read_profile(path):
+    """Samples from a collapsed stack file as a Counter"""
+    samples = Counter()
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack and count.isdigit():
+                samples[stack] += int(count)
+    return samples
+
+
+class SamplingProfilerMiddleware:
+    """
+    Profile a share of requests, and/or keep profiles of slow ones.
+
+    Removed when neither PROFILING_SAMPLE_RATE nor PROFILING_SLOW_MS is
+    set, so it costs nothing unless switched on.
+    """
+
+    def __init__(self, get_response):
+        self.rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        slow_ms = getattr(settings, "PROFILING_SLOW_MS", 0)
+        if self.rate <= 0 and slow_ms <= 0:
+            raise MiddlewareNotUsed
+        self.slow = slow_ms / 1000 if slow_ms > 0 else None
+        self.directory = getattr(settings, "PROFILING_DIR", "profiles")
+        sampler.interval = getattr(settings, "PROFILING_INTERVAL_MS", 5) / 1000
+        sampler.root_code = SamplingProfilerMiddleware.__call__.__code__
+        self.get_response = get_response
+
+    def __call__(self, request):
+        chosen = random.random() < self.rate
+        if not chosen and self.slow is None:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        started = time.time()
+        clock = time.perf_counter()
+        samples = sampler.start(thread_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop(thread_id)
+        duration = time.perf_counter() - clock
+
+        if samples and (
+            chosen or (self.slow is not None and duration >= self.slow)
+        ):
+            match = request.resolver_match
+            write_profile(
+                self.directory,
+                match.url_name if match else None,
+                started,
+                duration,
+                samples,
+            )
+        return response
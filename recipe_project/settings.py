@@ -60,8 +60,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "recipe_project.middleware.RequestTimingMiddleware",
+    "recipe_project.profiling.SamplingProfilerMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "recipe_project.middleware.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -84,6 +87,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "recipes.context_processors.navigation",
             ],
         },
     },
@@ -166,6 +170,13 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Sitemaps and feeds (recipes.sitemaps): prebuilt by build_sitemaps into
+# the "sitemaps" storage, in sections of at most SITEMAP_CHUNK_SIZE
+# recipe ids, with absolute URLs under SITE_URL
+SITE_URL = config("SITE_URL", default="http://localhost:8000")
+SITEMAP_ROOT = config("SITEMAP_ROOT", default=str(BASE_DIR / "sitemaps"))
+SITEMAP_CHUNK_SIZE = config("SITEMAP_CHUNK_SIZE", default=50000, cast=int)
+
 # Whitenoise configuration for serving static files
 # Cloudinary configuration for media storage
 
@@ -178,6 +189,9 @@ if 'test' in sys.argv:
         "staticfiles": {
             "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
         },
+        "sitemaps": {
+            "BACKEND": "django.core.files.storage.InMemoryStorage",
+        },
     }
 else:
     STORAGES = {
@@ -188,8 +202,148 @@ else:
             "BACKEND":
                 "whitenoise.storage.CompressedManifestStaticFilesStorage",
         },
+        "sitemaps": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": SITEMAP_ROOT},
+        },
+    }
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default; set CACHE_BACKEND/CACHE_LOCATION to share one
+# cache (e.g. Redis or Memcached) between workers in production
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="recipe-share"),
+    }
+}
+
+# Seconds each worker keeps its copy of the category and cuisine menus
+# (recipes.navigation) when the cache above is private to the process
+NAVIGATION_TTL = config("NAVIGATION_TTL", default=60, cast=int)
+
+# Full-page cache for anonymous visitors and ETag/304 answers
+# (recipes.page_cache). Off by default: it needs a cache shared by all
+# workers, or an edit would only expire pages in one of them.
+PAGE_CACHE = config("PAGE_CACHE", default=False, cast=bool)
+# Seconds an anonymous page stays cached (writes invalidate it sooner)
+PAGE_CACHE_TIMEOUT = config("PAGE_CACHE_TIMEOUT", default=600, cast=int)
+
+# Pantry index (recipes.pantry): built on the first pantry request, or
+# when a worker starts with PANTRY_PRELOAD, how often (seconds) to pick
+# up recipes changed by other workers, and how far (seconds) each check
+# looks back for transactions that committed late
+PANTRY_PRELOAD = config("PANTRY_PRELOAD", default=False, cast=bool)
+PANTRY_REFRESH_INTERVAL = config(
+    "PANTRY_REFRESH_INTERVAL", default=30, cast=int
+)
+PANTRY_REFRESH_MARGIN = config("PANTRY_REFRESH_MARGIN", default=60, cast=int)
+
+# Trending scores (recipes.trending): how fast likes and comments fade,
+# and the reference date stored scores are scaled from. Scores are kept
+# as logarithms, so the epoch never needs moving; changing either
+# setting requires running the rebuild_trending command.
+TRENDING_HALF_LIFE_HOURS = config(
+    "TRENDING_HALF_LIFE_HOURS", default=48, cast=float
+)
+TRENDING_EPOCH = config("TRENDING_EPOCH", default="2025-01-01")
+
+# Use a dummy cache during tests so cached fragments never leak between
+# test cases (database ids are reused after each rollback)
+if 'test' in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+        },
     }
 
+# Query budgets (recipe_project.middleware.QueryBudgetMiddleware): the
+# most SQL queries each view, by URL name, may run however many items
+# it shows. Counts include the session and user lookups, and assume an
+# empty cache (navigation costs two queries per lookup, as in tests).
+# "log" flags violations (for staging); the test suite runs in "raise"
+# mode so an N+1 regression fails the build.
+QUERY_BUDGET_MODE = config("QUERY_BUDGET_MODE", default="off")
+QUERY_BUDGETS = {
+    "home": 6,
+    "recipe_list": 6,
+    # Writes: measured worst cases, with ingredient names new to the
+    # database (+2: bulk insert and re-select); see recipe_saved
+    "recipe_create": {"GET": 6, "POST": 18},
+    "recipe_detail": 8,
+    "recipe_update": {"GET": 7, "POST": 17},
+    "recipe_delete": {"GET": 5, "POST": 12},
+    "category_recipes": 8,
+    "country_recipes": 8,
+    "trending": 6,
+    "trending_category": 8,
+    "trending_country": 8,
+    "search_recipes": 6,
+    # Includes loading the pantry index on a worker's first query
+    "pantry": 9,
+    "recipe_comments": 4,
+    "add_comment": 9,
+    "delete_comment": 11,
+    "toggle_like": 9,
+    # A missing recipe's 404 page adds the navigation to the failed write
+    "like_state": 9,
+    "like_state_async": 9,
+    "favorites": 7,
+    "api_recipe_list": 3,
+    "api_recipe_detail": 3,
+    "api_category_recipes": 5,
+    "api_country_recipes": 5,
+    "api_search_recipes": 3,
+    # Prebuilt files; only a 404 (not built yet) renders the navigation
+    "sitemap_index": 2,
+    "sitemap_section": 2,
+    "recipe_feed": 2,
+    "user_profile": 8,
+    "register": {"GET": 4, "POST": 4},
+    "login": {"GET": 4, "POST": 10},
+    "logout": 4,
+}
+if 'test' in sys.argv:
+    QUERY_BUDGET_MODE = "raise"
+
+# Request timing (recipe_project.middleware.RequestTimingMiddleware):
+# Server-Timing headers, "recipe_project.timing" log lines and per-view
+# aggregates at /admin/timings/. Off removes the middleware entirely.
+REQUEST_TIMING = config("REQUEST_TIMING", default=False, cast=bool)
+
+# Sampling profiler (recipe_project.profiling): profile this share of
+# requests, and/or keep profiles of requests slower than PROFILING_SLOW_MS
+# (0 disables). Both off removes the middleware. Collapsed stack files go
+# to PROFILING_DIR/<url name>/; summarise them with profile_report.
+PROFILING_SAMPLE_RATE = config(
+    "PROFILING_SAMPLE_RATE", default=0.0, cast=float
+)
+PROFILING_SLOW_MS = config("PROFILING_SLOW_MS", default=0, cast=int)
+PROFILING_INTERVAL_MS = config("PROFILING_INTERVAL_MS", default=5, cast=int)
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+
+# Buffered likes (recipes.like_buffer): like/unlike requests queue an
+# intent in a local SQLite file, coalesced per user and recipe, and are
+# written in batches by flush_likes or after the response of the request
+# that finds the oldest intent LIKE_BUFFER_FLUSH_SECONDS old or
+# LIKE_BUFFER_FLUSH_SIZE intents waiting. For recipes liked faster than
+# one row lock allows.
+LIKE_BUFFER = config("LIKE_BUFFER", default=False, cast=bool)
+LIKE_BUFFER_PATH = config(
+    "LIKE_BUFFER_PATH", default=str(BASE_DIR / "like-buffer.sqlite3")
+)
+LIKE_BUFFER_FLUSH_SECONDS = config(
+    "LIKE_BUFFER_FLUSH_SECONDS", default=5, cast=float
+)
+LIKE_BUFFER_FLUSH_SIZE = config(
+    "LIKE_BUFFER_FLUSH_SIZE", default=500, cast=int
+)
+
 # Crispy Forms settings
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
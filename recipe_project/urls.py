@@ -6,12 +6,19 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from . import views
 
 # Custom error handlers
 handler404 = 'recipe_project.views.custom_404'
 handler500 = 'recipe_project.views.custom_500'
 
 urlpatterns = [
+    path(
+        "admin/timings/", views.request_timings, name="request_timings"
+    ),
+    path(
+        "admin/export/<slug:kind>/", views.export_data, name="export_data"
+    ),
     path("admin/", admin.site.urls),
     path("accounts/", include("users.urls")),
     path("", include("recipes.urls")),
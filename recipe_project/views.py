@@ -1,9 +1,25 @@
 """
-Custom error views for recipe_project.
+Custom error views and instrumentation views for recipe_project.
 """
 
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
 
+from recipes.export import (
+    EXPORTS,
+    export_chunks,
+    export_filename,
+    parse_bound,
+)
+
+from .middleware import timing_stats
+
 
 def custom_404(request, exception):
     """
@@ -30,3 +46,64 @@ def custom_500(request):
         HttpResponse: Rendered 500 template with 500 status code
     """
     return render(request, '500.html', status=500)
+
+
+@staff_member_required
+def request_timings(request):
+    """
+    Request timings aggregated per URL name by this worker process.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        JsonResponse: Count, means and slowest total for each view
+    """
+    return JsonResponse(timing_stats.snapshot())
+
+
+@staff_member_required
+def export_data(request, kind):
+    """
+    Stream recipes, comments or likes as an NDJSON or CSV download.
+
+    Query parameters: ``format`` (ndjson or csv), ``status``, ``since``
+    and ``until`` (dates or datetimes), ``author`` (a username) and
+    ``gzip=1`` to compress on the fly.
+
+    Args:
+        request: The HTTP request object
+        kind (str): "recipes", "comments" or "likes"
+
+    Returns:
+        StreamingHttpResponse: The export, written as rows are read
+    """
+    if kind not in EXPORTS:
+        raise Http404
+    fmt = request.GET.get("format", "ndjson")
+    gzip = request.GET.get("gzip") in ("1", "true")
+    try:
+        since = request.GET.get("since")
+        until = request.GET.get("until")
+        chunks = export_chunks(
+            kind,
+            fmt,
+            gzip=gzip,
+            status=request.GET.get("status"),
+            since=parse_bound(since) if since else None,
+            until=parse_bound(until, end=True) if until else None,
+            author=request.GET.get("author"),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if gzip:
+        content_type = "application/gzip"
+    elif fmt == "csv":
+        content_type = "text/csv; charset=utf-8"
+    else:
+        content_type = "application/x-ndjson"
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export_filename(kind, fmt, gzip)}"'
+    )
+    return response
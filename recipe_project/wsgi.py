@@ -14,3 +14,21 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "recipe_project.settings")
 
 application = get_wsgi_application()
+
+# Optionally build the pantry index as the worker starts instead of on
+# the first pantry request. A database that is not ready (fresh, not
+# migrated) must not stop the worker; the index then loads lazily.
+from django.conf import settings  # noqa: E402
+
+if settings.PANTRY_PRELOAD:
+    import logging
+
+    from django.db import DatabaseError
+    from recipes.pantry import pantry_index
+
+    try:
+        pantry_index.load()
+    except DatabaseError:
+        logging.getLogger(__name__).exception(
+            "Pantry index preload failed; it will load on first use"
+        )
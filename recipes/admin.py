@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import Category, Country, Recipe, Comment, Like
+from .models import (
+    Category,
+    Country,
+    Recipe,
+    Comment,
+    Like,
+    Ingredient,
+    RecipeIngredient,
+    RecommendationRun,
+)
 
 
 @admin.register(Category)
@@ -22,10 +31,25 @@ class CountryAdmin(admin.ModelAdmin):
     list_filter = ("created_at",)
 
 
+class RecipeIngredientInline(admin.TabularInline):
+    """Parsed ingredients, read-only since they follow Recipe.ingredients"""
+
+    model = RecipeIngredient
+    fields = ("position", "quantity", "unit", "ingredient", "raw_text")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Admin interface for Recipe model"""
 
+    inlines = (RecipeIngredientInline,)
+
     list_display = (
         "title",
         "author",
@@ -97,3 +121,20 @@ class LikeAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "recipe__title")
     date_hierarchy = "created_at"
     ordering = ("-created_at",)
+
+
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+    """Admin interface for Ingredient model"""
+
+    list_display = ("name",)
+    search_fields = ("name",)
+
+
+@admin.register(RecommendationRun)
+class RecommendationRunAdmin(admin.ModelAdmin):
+    """Admin interface for RecommendationRun model"""
+
+    list_display = ("finished_at", "full", "recipes_updated", "last_like_id")
+    list_filter = ("full",)
+    ordering = ("-finished_at",)
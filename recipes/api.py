@@ -0,0 +1,217 @@
+"""
+Read-only JSON API for recipes
+
+The endpoints reuse the listing querysets from views.py and serialize
+straight from ``.values()`` rows, so no model instances are built. The
+``fields`` parameter picks which fields each recipe carries, and only
+those columns are selected. The long ingredients and instructions
+texts are left out of listings unless they are asked for. Listings are
+paginated with the same cursors as the HTML pages, via ``?cursor=``
+and ``?limit=``.
+
+Responses are encoded with orjson when it is installed and with the
+standard library otherwise. Like the HTML pages, they are page-cached
+for anonymous clients and answer conditional GETs.
+"""
+
+import datetime
+import json
+
+from django.http import Http404, HttpResponse
+from django.views.generic import View
+
+from .models import Recipe
+from .navigation import navigation
+from .page_cache import (
+    AnonymousPageCacheMixin,
+    LIST_TAG,
+    category_tag,
+    country_tag,
+    recipe_tag,
+)
+from .pagination import CursorPaginator, InvalidCursor
+from .views import (
+    RecipePageMixin,
+    category_recipes,
+    country_recipes,
+    matching_recipes,
+    published_recipes,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# API field name -> queryset lookup
+FIELDS = {
+    "id": "id",
+    "slug": "slug",
+    "title": "title",
+    "description": "description",
+    "ingredients": "ingredients",
+    "instructions": "instructions",
+    "prep_time": "prep_time",
+    "cook_time": "cook_time",
+    "servings": "servings",
+    "difficulty": "difficulty",
+    "image": "image",
+    "author": "author__username",
+    "category": "category__slug",
+    "country": "country__slug",
+    "like_count": "like_count",
+    "comment_count": "comment_count",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+LIST_FIELDS = [
+    name for name in FIELDS if name not in ("ingredients", "instructions")
+]
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    """Encode ``data`` as JSON bytes, with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, separators=(",", ":")).encode()
+
+
+class ApiError(Exception):
+    """A bad request parameter, reported as a 400 JSON response"""
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        dumps(data), content_type="application/json", status=status
+    )
+
+
+class RecipeApiView(RecipePageMixin, AnonymousPageCacheMixin, View):
+    """Base for the API endpoints: field selection and JSON errors"""
+
+    default_fields = LIST_FIELDS
+
+    def get_fields(self):
+        """The requested field names, ``id`` always included"""
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return self.default_fields
+        names = [
+            name.strip() for name in requested.split(",") if name.strip()
+        ]
+        unknown = sorted(set(names) - set(FIELDS))
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+        return ["id", *(name for name in names if name != "id")]
+
+    def serialize(self, rows, fields):
+        results = [
+            {name: row[FIELDS[name]] for name in fields} for row in rows
+        ]
+        if "image" in fields:
+            storage = Recipe._meta.get_field("image").storage
+            for result in results:
+                if result["image"]:
+                    result["image"] = storage.url(result["image"])
+        return results
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return json_response({"error": str(error)}, status=400)
+        except Http404:
+            return json_response({"error": "Not found"}, status=404)
+
+
+class RecipeListApiView(RecipeApiView):
+    """
+    A cursor-paginated list of published recipes as JSON; the filtered
+    listings below override get_queryset and get_cache_tags
+    """
+
+    def get_cache_tags(self):
+        return [LIST_TAG]
+
+    def get_queryset(self):
+        return published_recipes()
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.GET.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise ApiError("limit must be a number")
+        return max(1, min(limit, MAX_LIMIT))
+
+    def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        queryset = self.get_queryset()
+        # The sort keys are selected too, since cursors are built from them
+        ordering = [name.lstrip("-") for name in queryset.query.order_by]
+        lookups = dict.fromkeys([FIELDS[name] for name in fields] + ordering)
+        paginator = CursorPaginator(
+            queryset.values(*lookups), self.get_limit()
+        )
+        try:
+            page = paginator.page(request.GET.get("cursor"))
+        except InvalidCursor:
+            raise ApiError("Invalid cursor")
+        return json_response({
+            "results": self.serialize(page, fields),
+            "next_cursor": page.next_cursor,
+            "previous_cursor": page.previous_cursor,
+        })
+
+
+class CategoryRecipesApiView(RecipeListApiView):
+    def get_cache_tags(self):
+        return [category_tag(self.kwargs["slug"])]
+
+    def get_queryset(self):
+        return category_recipes(navigation.get_category(self.kwargs["slug"]))
+
+
+class CountryRecipesApiView(RecipeListApiView):
+    def get_cache_tags(self):
+        return [country_tag(self.kwargs["slug"])]
+
+    def get_queryset(self):
+        return country_recipes(navigation.get_country(self.kwargs["slug"]))
+
+
+class SearchRecipesApiView(RecipeListApiView):
+    # Any published recipe's change can change the results
+    def get_cache_tags(self):
+        return [LIST_TAG]
+
+    def get_queryset(self):
+        return matching_recipes(self.request.GET.get("q", ""))
+
+
+class RecipeDetailApiView(RecipeApiView):
+    """One published recipe as JSON, with every field by default"""
+
+    default_fields = list(FIELDS)
+
+    def get_cache_tags(self):
+        return [recipe_tag(self.kwargs["slug"])]
+
+    def get(self, request, slug):
+        fields = self.get_fields()
+        row = (
+            published_recipes()
+            .filter(slug=slug)
+            .values(*[FIELDS[name] for name in fields])
+            .first()
+        )
+        if row is None:
+            raise Http404
+        return json_response(self.serialize([row], fields)[0])
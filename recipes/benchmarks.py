@@ -0,0 +1,363 @@
+"""
+View benchmarks
+
+Every URL in recipes.urls and users.urls is requested through the test
+client against a dataset seeded by ScaleDataGenerator. For each view the
+report records:
+
+- ``cold``: the first request after the cache is cleared
+- ``warm``: p50/p95 latency over repeated requests, and the most
+  queries and rows any of them needed
+
+Query and row counts are deterministic for a given seed, so they can
+be diffed exactly between commits; latencies are only comparable on
+the same machine.
+"""
+
+import datetime
+import math
+import platform
+import subprocess
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from users import urls as user_urls
+
+from . import urls as recipe_urls
+from .models import Comment, Like, Recipe
+from .pantry import pantry_index
+from .recommendations import compute_recommendations
+from .scale_data import ScaleDataGenerator
+from .sitemaps import build_sitemaps, recipe_section
+
+REPEAT = 20
+
+
+def url_names():
+    """Names of every URL the suite has to cover"""
+    return sorted(
+        pattern.name
+        for urlconf in (recipe_urls, user_urls)
+        for pattern in urlconf.urlpatterns
+        if pattern.name
+    )
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class RowCountingCursor:
+    """DB-API cursor proxy that counts the rows fetched through it"""
+
+    def __init__(self, cursor, recorder):
+        self._cursor = cursor
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._recorder.rows += 1
+            yield row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._recorder.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._recorder.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._recorder.rows += len(rows)
+        return rows
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting queries and fetched rows.
+
+    Install it with ``connection.execute_wrapper(recorder)``.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        wrapper = context["cursor"]
+        if not isinstance(wrapper.cursor, RowCountingCursor):
+            wrapper.cursor = RowCountingCursor(wrapper.cursor, self)
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class Scenario:
+    """
+    One request to benchmark.
+
+    Args:
+        name (str): URL name
+        kwargs (dict): URL arguments
+        method (str): Test client method: "get", "post", "put"...
+        data (dict): Query string or form data
+        user (User): Logged in user, or None for anonymous requests
+        prepare (callable): Called with the client before every request
+            (untimed); may return extra URL arguments
+    """
+
+    def __init__(
+        self, name, kwargs=None, method="get", data=None, user=None,
+        prepare=None,
+    ):
+        self.name = name
+        self.kwargs = kwargs or {}
+        self.method = method
+        self.data = data or {}
+        self.user = user
+        self.prepare = prepare
+
+
+def dataset_fixtures():
+    """Pick representative objects from the seeded dataset"""
+    recipe = (
+        Recipe.objects.filter(status="published")
+        .select_related("author", "category", "country")
+        .order_by("-like_count", "pk")
+        .first()
+    )
+    member_id = (
+        Like.objects.values_list("user_id", flat=True)
+        .annotate(total=Count("pk"))
+        .order_by("-total", "user_id")
+        .first()
+    )
+    return {
+        "recipe": recipe,
+        "author": recipe.author,
+        "member": User.objects.get(pk=member_id),
+        "pantry": list(
+            recipe.recipe_ingredients.order_by("position").values_list(
+                "ingredient__name", flat=True
+            )
+        )[:-1],
+    }
+
+
+def build_scenarios(fixtures):
+    recipe = fixtures["recipe"]
+    author = fixtures["author"]
+    member = fixtures["member"]
+    slug = {"slug": recipe.slug}
+
+    def new_comment(client):
+        comment = Comment.objects.create(
+            recipe=recipe, user=member, content="Benchmark comment"
+        )
+        return {"pk": comment.pk}
+
+    def log_in(client):
+        client.force_login(member)
+
+    def build(client):
+        build_sitemaps()
+
+    return [
+        Scenario("home"),
+        Scenario("recipe_list"),
+        Scenario("recipe_create", user=author),
+        Scenario("recipe_detail", slug),
+        Scenario("recipe_update", slug, user=author),
+        Scenario("recipe_delete", slug, user=author),
+        Scenario("category_recipes", {"slug": recipe.category.slug}),
+        Scenario("country_recipes", {"slug": recipe.country.slug}),
+        Scenario("trending"),
+        Scenario("trending_category", {"slug": recipe.category.slug}),
+        Scenario("trending_country", {"slug": recipe.country.slug}),
+        Scenario("search_recipes", data={"q": recipe.title.split()[-1]}),
+        Scenario(
+            "pantry", data={"ingredients": ", ".join(fixtures["pantry"])}
+        ),
+        Scenario("recipe_comments", slug),
+        Scenario(
+            "add_comment",
+            slug,
+            method="post",
+            data={"content": "Benchmark comment"},
+            user=member,
+        ),
+        Scenario(
+            "delete_comment", method="post", user=member, prepare=new_comment
+        ),
+        Scenario("toggle_like", slug, method="post", user=member),
+        Scenario("like_state", slug, method="put", user=member),
+        Scenario("like_state_async", slug, method="delete", user=member),
+        Scenario("favorites", user=member),
+        Scenario("api_recipe_list"),
+        Scenario("api_recipe_detail", slug),
+        Scenario("api_category_recipes", {"slug": recipe.category.slug}),
+        Scenario("api_country_recipes", {"slug": recipe.country.slug}),
+        Scenario(
+            "api_search_recipes", data={"q": recipe.title.split()[-1]}
+        ),
+        Scenario("sitemap_index", prepare=build),
+        Scenario(
+            "sitemap_section",
+            {"section": recipe_section(recipe.pk)},
+            prepare=build,
+        ),
+        Scenario("recipe_feed", {"feed_format": "rss"}, prepare=build),
+        Scenario("user_profile", {"username": author.username}),
+        Scenario("register"),
+        Scenario("login"),
+        Scenario("logout", method="post", user=member, prepare=log_in),
+    ]
+
+
+def measure(scenario, repeat=REPEAT):
+    """
+    Request one scenario ``repeat + 1`` times.
+
+    Returns:
+        dict: Status code plus cold and warm timings and counts
+    """
+    client = Client()
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    recorder = QueryRecorder()
+    cache.clear()
+    samples = []
+    for _ in range(repeat + 1):
+        kwargs = dict(scenario.kwargs)
+        if scenario.prepare is not None:
+            kwargs.update(scenario.prepare(client) or {})
+        path = reverse(scenario.name, kwargs=kwargs or None)
+        send = getattr(client, scenario.method)
+        recorder.reset()
+        with connection.execute_wrapper(recorder):
+            started = time.perf_counter()
+            response = send(path, scenario.data)
+            elapsed = (time.perf_counter() - started) * 1000
+        samples.append((elapsed, recorder.queries, recorder.rows))
+
+    cold, warm = samples[0], samples[1:] or samples[:1]
+    timings = [sample[0] for sample in warm]
+    return {
+        "status": response.status_code,
+        "cold": {
+            "ms": round(cold[0], 2),
+            "queries": cold[1],
+            "rows": cold[2],
+        },
+        "warm": {
+            "p50_ms": round(percentile(timings, 0.5), 2),
+            "p95_ms": round(percentile(timings, 0.95), 2),
+            "queries": max(sample[1] for sample in warm),
+            "rows": max(sample[2] for sample in warm),
+        },
+    }
+
+
+def seed_dataset(size, seed=42):
+    """Fill an empty database with ``size`` recipes and their activity"""
+    counts = ScaleDataGenerator(
+        recipes=size, users=max(size // 5, 10), seed=seed
+    ).run()
+    compute_recommendations(full=True)
+    # The index is per process, so drop whatever an earlier dataset left
+    pantry_index.load()
+    return counts
+
+
+def benchmark_dataset(size, repeat=REPEAT, seed=42, log=None):
+    """
+    Seed an empty database and benchmark every view against it.
+
+    Returns:
+        dict: ``size``, row ``counts`` and per URL name ``views``
+    """
+    log = log or (lambda message: None)
+    counts = seed_dataset(size, seed)
+    views = {}
+    for scenario in build_scenarios(dataset_fixtures()):
+        views[scenario.name] = result = measure(scenario, repeat)
+        log(
+            f"{size:>8} {scenario.name:<20} "
+            f"p50 {result['warm']['p50_ms']:>8.2f}ms "
+            f"p95 {result['warm']['p95_ms']:>8.2f}ms "
+            f"{result['warm']['queries']:>4} queries "
+            f"{result['warm']['rows']:>6} rows"
+        )
+    return {"size": size, "counts": counts, "views": views}
+
+
+def environment():
+    """Where a report was produced, so reports can be told apart"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.datetime.now(datetime.timezone.utc)
+        .replace(microsecond=0)
+        .isoformat(),
+        "database": connection.vendor,
+        "django": django.get_version(),
+        "python": platform.python_version(),
+    }
+
+
+def compare_reports(old, new):
+    """
+    Describe how each view changed between two reports.
+
+    Returns:
+        list: One line per view present in both reports
+    """
+    lines = []
+    previous = {dataset["size"]: dataset for dataset in old["datasets"]}
+    for dataset in new["datasets"]:
+        before = previous.get(dataset["size"])
+        if before is None:
+            continue
+        for name, result in sorted(dataset["views"].items()):
+            if name not in before["views"]:
+                continue
+            was, now = before["views"][name]["warm"], result["warm"]
+            change = (
+                (now["p50_ms"] - was["p50_ms"]) / was["p50_ms"] * 100
+                if was["p50_ms"] else 0.0
+            )
+            lines.append(
+                f"{dataset['size']:>8} {name:<20} "
+                f"p50 {was['p50_ms']:.2f} -> {now['p50_ms']:.2f}ms "
+                f"({change:+.0f}%), "
+                f"queries {was['queries']} -> {now['queries']}, "
+                f"rows {was['rows']} -> {now['rows']}"
+            )
+    return lines
@@ -0,0 +1,29 @@
+"""
+System checks for the recipes app
+"""
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .page_cache import shared_cache
+
+
+@register()
+def check_page_cache_backend(app_configs, **kwargs):
+    """PAGE_CACHE needs a cache every worker shares"""
+    if (
+        getattr(settings, "PAGE_CACHE", False)
+        and not settings.DEBUG
+        and not shared_cache()
+    ):
+        return [
+            Error(
+                "PAGE_CACHE is on but the default cache is private to "
+                "each process, so an edit would only expire pages and "
+                "ETags in the worker that made it.",
+                hint="Set CACHE_BACKEND to a shared cache such as Redis "
+                "or Memcached, or turn PAGE_CACHE off.",
+                id="recipes.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,14 @@
+"""
+Context processors for recipes app
+"""
+
+from .navigation import navigation as navigation_cache
+
+
+def navigation(request):
+    """
+    Add categories and countries for the navigation dropdowns
+    to every template context.
+    """
+    categories, countries = navigation_cache.menus()
+    return {"categories": categories, "countries": countries}
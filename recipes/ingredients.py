@@ -0,0 +1,253 @@
+"""
+Ingredient parsing and normalization
+
+``Recipe.ingredients`` is free text, one ingredient per line. This
+module turns each line into a quantity, a unit and a canonical name
+("2 large Eggs, beaten" -> 2, "", "egg") and stores the result in the
+Ingredient/RecipeIngredient tables so ingredients can be queried with
+indexed joins.
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+ParsedIngredient = namedtuple(
+    "ParsedIngredient", ["quantity", "unit", "name", "raw"]
+)
+
+# Canonical unit for each accepted spelling
+UNIT_ALIASES = {
+    "g": "g", "gram": "g", "grams": "g", "gr": "g",
+    "kg": "kg", "kilogram": "kg", "kilograms": "kg",
+    "mg": "mg",
+    "ml": "ml", "millilitre": "ml", "milliliter": "ml",
+    "millilitres": "ml", "milliliters": "ml",
+    "l": "l", "litre": "l", "liter": "l", "litres": "l", "liters": "l",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "tbsp": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "cup": "cup", "cups": "cup",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "pinch": "pinch", "pinches": "pinch",
+    "dash": "dash", "dashes": "dash",
+    "clove": "clove", "cloves": "clove",
+    "can": "can", "cans": "can", "tin": "can", "tins": "can",
+    "slice": "slice", "slices": "slice",
+    "piece": "piece", "pieces": "piece",
+    "bunch": "bunch", "bunches": "bunch",
+    "sprig": "sprig", "sprigs": "sprig",
+    "handful": "handful", "handfuls": "handful",
+    "stick": "stick", "sticks": "stick",
+    "package": "package", "packages": "package", "pack": "package",
+}
+
+# Words that describe size or preparation rather than the ingredient
+DESCRIPTORS = {
+    "fresh", "freshly", "chopped", "diced", "minced", "sliced",
+    "grated", "shredded", "crushed", "finely", "roughly", "thinly",
+    "large", "small", "medium", "whole", "peeled", "beaten", "softened",
+    "melted", "cubed", "canned", "dried", "plain", "extra",
+}
+
+# Trailing phrases that are serving notes, not part of the name
+TRAILING_NOTES = re.compile(
+    r"\b(to taste|for (garnish|serving|frying|dusting|greasing)|"
+    r"as needed|optional)\b.*$"
+)
+
+VULGAR_FRACTIONS = {
+    char: unicodedata.numeric(char) for char in "½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞"
+}
+# A vulgar fraction with the whole number before it: 1½, 1 ½
+VULGAR_RE = re.compile(
+    r"(?:(\d+)\s*)?([%s])" % "".join(VULGAR_FRACTIONS)
+)
+
+QUANTITY_RE = re.compile(
+    r"""^\s*(?P<quantity>
+        \d+\s+\d+/\d+              # mixed number: 1 1/2
+        |\d+/\d+                   # fraction: 1/2
+        |\d+(?:[.,]\d+)?           # integer or decimal: 2, 0.5, 1,5
+    )
+    (?:\s*(?:-|to)\s*\d+(?:[.,]\d+)?)?  # range upper bound, ignored
+    """,
+    re.VERBOSE,
+)
+
+WORD_RE = re.compile(r"[a-z][a-z'-]*")
+
+# RecipeIngredient.quantity holds 10 digits, 3 of them decimals
+MAX_QUANTITY = Decimal(10) ** 7
+
+NAME_MAX_LENGTH = 100
+
+# Words ending in "s" that are already singular
+SINGULAR_WORDS = {
+    "asparagus", "citrus", "couscous", "hibiscus", "hummus", "molasses",
+    "octopus", "swiss", "watercress",
+}
+
+
+def _parse_number(text):
+    text = text.strip().replace(",", ".")
+    try:
+        if " " in text:
+            whole, fraction = text.split()
+            fraction = _parse_number(fraction)
+            if fraction is None:
+                return None
+            return Decimal(whole) + fraction
+        if "/" in text:
+            numerator, denominator = text.split("/")
+            return Decimal(numerator) / Decimal(denominator)
+        return Decimal(text)
+    except (InvalidOperation, ZeroDivisionError, ValueError):
+        return None
+
+
+def _vulgar_to_decimal(match):
+    whole, char = match.groups()
+    value = int(whole or 0) + VULGAR_FRACTIONS[char]
+    return f"{value:.3f}"
+
+
+def _singular(word):
+    if word in SINGULAR_WORDS:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("oes") and len(word) > 4:
+        return word[:-2]
+    if word.endswith(("ss", "us", "is")) or not word.endswith("s"):
+        return word
+    return word[:-1]
+
+
+def canonical_name(text):
+    """
+    Reduce an ingredient description to its canonical name.
+
+    Lowercases, drops parenthesised asides, preparation notes after a
+    comma, serving notes, size/preparation descriptors and alternatives
+    ("pancetta or guanciale" -> "pancetta"), then singularizes the last
+    word.
+
+    Args:
+        text (str): Ingredient text with quantity and unit removed
+
+    Returns:
+        str: Canonical name, empty if nothing is left
+    """
+    text = text.lower()
+    text = re.sub(r"\(.*?\)", " ", text)
+    text = text.split(",")[0]
+    text = text.split(" or ")[0]
+    text = TRAILING_NOTES.sub("", text)
+    words = [
+        word for word in WORD_RE.findall(text) if word not in DESCRIPTORS
+    ]
+    if words and words[0] == "of":
+        words = words[1:]
+    if words:
+        words[-1] = _singular(words[-1])
+    return " ".join(words)[:NAME_MAX_LENGTH]
+
+
+def parse_ingredient(line):
+    """
+    Parse one ingredient line.
+
+    Args:
+        line (str): e.g. "400g spaghetti" or "2 tbsp olive oil"
+
+    Returns:
+        ParsedIngredient or None: None for blank or unparseable lines
+    """
+    raw = line.strip()
+    if not raw:
+        return None
+    rest = raw.lstrip("-•* \t")
+    rest = VULGAR_RE.sub(_vulgar_to_decimal, rest)
+
+    quantity = None
+    match = QUANTITY_RE.match(rest)
+    if match:
+        quantity = _parse_number(match.group("quantity"))
+        rest = rest[match.end():]
+        # Rounding can carry a quantity just under the bound onto it, so
+        # check after quantizing (huge values would not quantize at all)
+        if quantity is not None and quantity < MAX_QUANTITY:
+            quantity = quantity.quantize(Decimal("0.001"))
+        if quantity is not None and quantity >= MAX_QUANTITY:
+            quantity = None
+
+    unit = ""
+    unit_match = re.match(r"\s*([A-Za-z]+)\.?\b", rest)
+    if unit_match and unit_match.group(1).lower() in UNIT_ALIASES:
+        unit = UNIT_ALIASES[unit_match.group(1).lower()]
+        rest = rest[unit_match.end():]
+
+    name = canonical_name(rest)
+    if not name:
+        return None
+    return ParsedIngredient(quantity, unit, name, raw[:255])
+
+
+def parse_ingredients(text):
+    """Parse a Recipe.ingredients blob into ParsedIngredient rows"""
+    parsed = (parse_ingredient(line) for line in text.splitlines())
+    return [item for item in parsed if item is not None]
+
+
+def sync_recipe_ingredients(recipes):
+    """
+    Rebuild the RecipeIngredient rows for ``recipes``.
+
+    Works in batches: one query to resolve existing ingredient names,
+    one bulk insert for new names, one delete and one bulk insert for
+    the recipe rows, however many recipes are passed.
+
+    Args:
+        recipes (iterable): Saved Recipe instances
+    """
+    from .models import Ingredient, RecipeIngredient
+
+    recipes = list(recipes)
+    if not recipes:
+        return
+    parsed = {recipe.pk: parse_ingredients(recipe.ingredients)
+              for recipe in recipes}
+    names = {item.name for items in parsed.values() for item in items}
+
+    ingredient_ids = dict(
+        Ingredient.objects.filter(name__in=names).values_list("name", "id")
+    )
+    missing = names - ingredient_ids.keys()
+    if missing:
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        ingredient_ids.update(
+            Ingredient.objects.filter(name__in=missing).values_list(
+                "name", "id"
+            )
+        )
+
+    RecipeIngredient.objects.filter(recipe_id__in=parsed.keys()).delete()
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_ids[item.name],
+                quantity=item.quantity,
+                unit=item.unit,
+                raw_text=item.raw,
+                position=position,
+            )
+            for recipe_id, items in parsed.items()
+            for position, item in enumerate(items)
+        ]
+    )
@@ -0,0 +1,385 @@
+"""
+Write-buffered likes for hot recipes
+
+With LIKE_BUFFER on, like and unlike requests do not touch the Like
+table. Each one is recorded as an intent in a local SQLite file
+(LIKE_BUFFER_PATH), keyed by (user, recipe), so repeated clicks
+coalesce into the user's latest choice. A flush later applies a batch
+of intents in one transaction: one bulk insert, one delete, and one
+counter and trending update per recipe, however many users liked it.
+A recipe going viral therefore costs a handful of statements per batch
+instead of contending for its counter row on every click.
+
+Intents are committed to the buffer file before the request returns,
+so they survive a worker restart. A flush inserts with ON CONFLICT DO
+NOTHING and deletes with RETURNING (see recipes.likes), counting only
+the likes it actually changed, and recounts like_count for the recipes
+it touched, so applying an intent twice (after a crash between the two
+commits, or by a second flusher) is harmless.
+
+Until its intent is flushed, a user sees their own like through
+pending_state() and pending_deltas(). Everyone else sees the change
+after the flush, which runs from flush_likes or once the response of
+the request that finds the buffer due (LIKE_BUFFER_FLUSH_SECONDS or
+_SIZE) has been sent, so the click itself never waits for a batch.
+
+The buffer is per host; the flush lease keeps concurrent workers from
+applying the same batch twice.
+"""
+
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.db.models import F
+
+from . import trending
+from .models import Like, Recipe
+from .signals import count_of, invalidate_pages_on_commit, recipe_page_tags
+from .slugs import chunked
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS intents (
+    user_id INTEGER NOT NULL,
+    recipe_id INTEGER NOT NULL,
+    liked INTEGER NOT NULL,
+    was_liked INTEGER NOT NULL,
+    queued_at REAL NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, recipe_id)
+);
+CREATE INDEX IF NOT EXISTS intents_recipe ON intents (recipe_id);
+CREATE INDEX IF NOT EXISTS intents_queued ON intents (queued_at);
+CREATE TABLE IF NOT EXISTS lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    expires REAL NOT NULL
+);
+INSERT OR IGNORE INTO lease VALUES (1, 0);
+"""
+
+# A flush that crashes holding the lease blocks others for this long
+LEASE_SECONDS = 60
+
+
+class LikeBuffer:
+    """Durable, coalescing queue of like intents in a SQLite file"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return getattr(settings, "LIKE_BUFFER", False)
+
+    @property
+    def path(self):
+        return str(
+            getattr(settings, "LIKE_BUFFER_PATH", "like-buffer.sqlite3")
+        )
+
+    def _db(self):
+        # One connection per thread and file; autocommit, with explicit
+        # transactions where several statements must agree
+        connections = self._local.__dict__.setdefault("connections", {})
+        db = connections.get(self.path)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            connections[self.path] = db
+        return db
+
+    def put(self, user_id, recipe_id, liked, was_liked):
+        """
+        Record that ``user_id`` wants ``recipe_id`` liked or not.
+
+        ``was_liked`` is the stored state; it is kept from the first
+        pending intent, so the pending delta stays relative to the table.
+        """
+        self._db().execute(
+            "INSERT INTO intents "
+            "(user_id, recipe_id, liked, was_liked, queued_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (user_id, recipe_id) DO UPDATE SET "
+            "liked = excluded.liked, revision = revision + 1",
+            (user_id, recipe_id, liked, was_liked, time.time()),
+        )
+
+    def pending_state(self, user_id, recipe_ids):
+        """
+        The user's unflushed choices among ``recipe_ids``.
+
+        Returns:
+            dict: recipe_id -> (liked, was_liked)
+        """
+        recipe_ids = list(recipe_ids)
+        state = {}
+        for chunk in chunked(recipe_ids):
+            placeholders = ", ".join("?" * len(chunk))
+            for recipe_id, liked, was_liked in self._db().execute(
+                "SELECT recipe_id, liked, was_liked FROM intents "
+                f"WHERE user_id = ? AND recipe_id IN ({placeholders})",
+                [user_id, *chunk],
+            ):
+                state[recipe_id] = (bool(liked), bool(was_liked))
+        return state
+
+    def pending_deltas(self, recipe_ids):
+        """Unflushed change to each recipe's like count"""
+        deltas = {}
+        for chunk in chunked(list(recipe_ids)):
+            placeholders = ", ".join("?" * len(chunk))
+            deltas.update(
+                self._db().execute(
+                    "SELECT recipe_id, SUM(liked - was_liked) FROM intents "
+                    f"WHERE recipe_id IN ({placeholders}) "
+                    "GROUP BY recipe_id",
+                    chunk,
+                )
+            )
+        return deltas
+
+    def liked_ids(self, user_id):
+        """Ids of recipes the user has liked but not yet flushed"""
+        return {
+            recipe_id
+            for recipe_id, in self._db().execute(
+                "SELECT recipe_id FROM intents "
+                "WHERE user_id = ? AND liked AND NOT was_liked",
+                [user_id],
+            )
+        }
+
+    def unliked_ids(self, user_id):
+        """Ids of recipes the user has unliked but not yet flushed"""
+        return {
+            recipe_id
+            for recipe_id, in self._db().execute(
+                "SELECT recipe_id FROM intents "
+                "WHERE user_id = ? AND was_liked AND NOT liked",
+                [user_id],
+            )
+        }
+
+    def user_stamp(self, user_id):
+        """A value that changes with each of the user's pending clicks"""
+        count, revisions, liked = self._db().execute(
+            "SELECT COUNT(*), TOTAL(revision), TOTAL(liked) FROM intents "
+            "WHERE user_id = ?",
+            [user_id],
+        ).fetchone()
+        return f"{count}:{revisions:.0f}:{liked:.0f}"
+
+    def due(self):
+        """Whether the oldest intent or the queue length calls for a flush"""
+        size, oldest = self._db().execute(
+            "SELECT COUNT(*), MIN(queued_at) FROM intents"
+        ).fetchone()
+        if not size:
+            return False
+        max_age = getattr(settings, "LIKE_BUFFER_FLUSH_SECONDS", 5)
+        max_size = getattr(settings, "LIKE_BUFFER_FLUSH_SIZE", 500)
+        return size >= max_size or time.time() - oldest >= max_age
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+
+    def flush(self, batch_size=None):
+        """
+        Apply the oldest ``batch_size`` intents to the database.
+
+        Returns:
+            tuple: (added, removed) likes, or None when another worker
+                holds the flush lease
+        """
+        if batch_size is None:
+            batch_size = getattr(settings, "LIKE_BUFFER_FLUSH_SIZE", 500)
+        db = self._db()
+        now = time.time()
+        acquired = db.execute(
+            "UPDATE lease SET expires = ? WHERE id = 1 AND expires < ?",
+            (now + LEASE_SECONDS, now),
+        ).rowcount
+        if not acquired:
+            return None
+        try:
+            intents = db.execute(
+                "SELECT user_id, recipe_id, liked, revision FROM intents "
+                "ORDER BY queued_at LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+            if not intents:
+                return 0, 0
+            result = apply_intents(
+                [(user_id, recipe_id, bool(liked))
+                 for user_id, recipe_id, liked, _ in intents]
+            )
+            # Intents changed while flushing stay queued, now relative
+            # to the state just written
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "DELETE FROM intents "
+                "WHERE user_id = ? AND recipe_id = ? AND revision = ?",
+                [(user_id, recipe_id, revision)
+                 for user_id, recipe_id, _, revision in intents],
+            )
+            db.executemany(
+                "UPDATE intents SET was_liked = ? "
+                "WHERE user_id = ? AND recipe_id = ?",
+                [(liked, user_id, recipe_id)
+                 for user_id, recipe_id, liked, _ in intents],
+            )
+            db.execute("COMMIT")
+            return result
+        finally:
+            db.execute("UPDATE lease SET expires = 0 WHERE id = 1")
+
+    def clear(self):
+        self._db().execute("DELETE FROM intents")
+
+
+like_buffer = LikeBuffer()
+
+
+def apply_intents(intents):
+    """
+    Make the Like table match a batch of intents.
+
+    Only likes this call actually inserted or deleted are counted, so a
+    batch replayed by a second flusher (after the lease expired) never
+    applies its trending changes twice.
+
+    Args:
+        intents (list): (user_id, recipe_id, liked) tuples, at most one
+            per (user_id, recipe_id)
+
+    Returns:
+        tuple: (added, removed) likes
+    """
+    # Deferred: recipes.likes imports this module
+    from .likes import delete_likes, insert_likes, supports_upsert
+
+    recipe_ids = {recipe_id for _, recipe_id, _ in intents}
+    with transaction.atomic():
+        # Recipes deleted since the click have nothing left to like
+        live = set(
+            Recipe.objects.filter(pk__in=recipe_ids).values_list(
+                "pk", flat=True
+            )
+        )
+        to_add = [
+            (user_id, recipe_id)
+            for user_id, recipe_id, liked in intents
+            if liked and recipe_id in live
+        ]
+        to_remove = [
+            (user_id, recipe_id)
+            for user_id, recipe_id, liked in intents
+            if not liked and recipe_id in live
+        ]
+
+        # Both skip the per-like signals; their effects are applied once
+        # per recipe below
+        if supports_upsert():
+            with connection.cursor() as cursor:
+                added = insert_likes(cursor, to_add)
+                removed = delete_likes(cursor, to_remove)
+        else:
+            added, removed = _apply_with_orm(to_add, to_remove)
+
+        touched = {recipe_id for recipe_id, _ in added}
+        touched.update(recipe_id for recipe_id, _ in removed)
+        if not touched:
+            return 0, 0
+        Recipe.objects.filter(pk__in=touched).update(
+            like_count=count_of(Like.objects.all()),
+            version=F("version") + 1,
+        )
+        trending.record_events(
+            [(recipe_id, trending.LIKE_WEIGHT, created_at, 1)
+             for recipe_id, created_at in added]
+            + [(recipe_id, trending.LIKE_WEIGHT, created_at, -1)
+               for recipe_id, created_at in removed]
+        )
+        for recipe_id in touched:
+            invalidate_pages_on_commit(
+                *recipe_page_tags(recipe_id, include_lists=True)
+            )
+    return len(added), len(removed)
+
+
+def _apply_with_orm(to_add, to_remove):
+    """
+    apply_intents() without RETURNING: reads which likes exist first,
+    so unlike the upsert it can miscount a batch applied concurrently.
+    """
+    pairs = to_add + to_remove
+    existing = {
+        (user_id, recipe_id): (pk, created_at)
+        for pk, user_id, recipe_id, created_at in Like.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            recipe_id__in={recipe_id for _, recipe_id in pairs},
+        ).values_list("pk", "user_id", "recipe_id", "created_at")
+    }
+    likes = [
+        Like(user_id=user_id, recipe_id=recipe_id)
+        for user_id, recipe_id in to_add
+        if (user_id, recipe_id) not in existing
+    ]
+    Like.objects.bulk_create(likes, ignore_conflicts=True)
+    removed = [
+        (pair[1], *existing[pair]) for pair in to_remove if pair in existing
+    ]
+    with connection.cursor() as cursor:
+        for chunk in chunked([pk for _, pk, _ in removed]):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"DELETE FROM recipes_like WHERE id IN ({placeholders})",
+                chunk,
+            )
+    return (
+        [(like.recipe_id, like.created_at) for like in likes],
+        [(recipe_id, created_at) for recipe_id, _, created_at in removed],
+    )
+
+
+def buffered_like(user, recipe, liked=None):
+    """
+    Queue a like (``liked=True``), unlike (False) or toggle (None).
+
+    Returns:
+        tuple: (changed, liked, like_count) as the user will see them,
+            counting every pending intent for the recipe
+    """
+    pending = like_buffer.pending_state(user.pk, [recipe.pk])
+    if recipe.pk in pending:
+        current, was_liked = pending[recipe.pk]
+    else:
+        current = was_liked = Like.objects.filter(
+            user=user, recipe=recipe
+        ).exists()
+    if liked is None:
+        liked = not current
+    like_buffer.put(user.pk, recipe.pk, liked, was_liked)
+    if like_buffer.due():
+        _flush_due.pending = True
+    like_count = recipe.like_count + like_buffer.pending_deltas(
+        [recipe.pk]
+    ).get(recipe.pk, 0)
+    return liked != current, liked, like_count
+
+
+# Set by a request that found the buffer due
+_flush_due = threading.local()
+
+
+@receiver(request_finished)
+def flush_after_request(**kwargs):
+    """Flush a due buffer once the response has gone out"""
+    if getattr(_flush_due, "pending", False):
+        _flush_due.pending = False
+        like_buffer.flush()
@@ -0,0 +1,268 @@
+"""
+Idempotent like and unlike
+
+set_like() and unset_like() put a user's like on a recipe into a given
+state, whatever state it was in, and return the recipe's new like count.
+Where the database supports INSERT ... ON CONFLICT and RETURNING
+(PostgreSQL, SQLite 3.35+), the like is written by one statement that
+looks the recipe up by slug, skips an existing row and reports whether
+it changed anything, and the count comes back from the counter UPDATE
+itself, so neither needs a COUNT(*) or a read before the write.
+Repeating a request, or two tabs sending the same one at once, changes
+nothing the second time. flip_like(), behind the like button, is the
+same DELETE ... RETURNING followed by the INSERT when nothing was liked.
+insert_likes() and delete_likes() do the same for a batch of likes.
+
+These statements bypass the Like model's signals, so the counter,
+trending and page cache effects are applied here, as the signal
+receivers do for ORM saves. Other databases fall back to the ORM, and
+with LIKE_BUFFER on the change is queued in recipes.like_buffer instead.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .like_buffer import buffered_like, like_buffer
+from .models import Like, Recipe
+from .signals import like_recorded
+from .slugs import chunked
+
+
+def supports_upsert():
+    features = connection.features
+    return (
+        features.supports_update_conflicts_with_target
+        and features.can_return_rows_from_bulk_insert
+    )
+
+
+def _as_datetime(value):
+    # SQLite returns datetimes as text
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def _count_changed(cursor, recipe_id, delta):
+    cursor.execute(
+        "UPDATE recipes_recipe "
+        "SET like_count = like_count + %s, version = version + 1 "
+        "WHERE id = %s RETURNING like_count",
+        [delta, recipe_id],
+    )
+    return cursor.fetchone()[0]
+
+
+def _current_count(cursor, slug):
+    cursor.execute(
+        "SELECT like_count FROM recipes_recipe WHERE slug = %s", [slug]
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise Http404("No recipe found matching the query")
+    return row[0]
+
+
+def _insert_like(cursor, user, slug):
+    """Add the like; the new like count, or None if nothing was added"""
+    now = timezone.now()
+    cursor.execute(
+        "INSERT INTO recipes_like (recipe_id, user_id, created_at) "
+        "SELECT id, %s, %s FROM recipes_recipe WHERE slug = %s "
+        "ON CONFLICT (recipe_id, user_id) DO NOTHING "
+        "RETURNING recipe_id",
+        [user.pk, connection.ops.adapt_datetimefield_value(now), slug],
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    like_count = _count_changed(cursor, row[0], 1)
+    like_recorded(row[0], now)
+    return like_count
+
+
+def _delete_like(cursor, user, slug):
+    """Remove the like; the new like count, or None if there was none"""
+    cursor.execute(
+        "DELETE FROM recipes_like WHERE user_id = %s AND recipe_id = "
+        "(SELECT id FROM recipes_recipe WHERE slug = %s) "
+        "RETURNING recipe_id, created_at",
+        [user.pk, slug],
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    recipe_id, created_at = row
+    like_count = _count_changed(cursor, recipe_id, -1)
+    like_recorded(recipe_id, _as_datetime(created_at), sign=-1)
+    return like_count
+
+
+def insert_likes(cursor, pairs):
+    """
+    Add many likes, skipping the ones that already exist.
+
+    Args:
+        pairs (list): (user_id, recipe_id) tuples
+
+    Returns:
+        list: (recipe_id, created_at) of each like actually added
+    """
+    now = timezone.now()
+    created_at = connection.ops.adapt_datetimefield_value(now)
+    added = []
+    for chunk in chunked(pairs):
+        rows = ", ".join(["(%s, %s, %s)"] * len(chunk))
+        cursor.execute(
+            "INSERT INTO recipes_like (recipe_id, user_id, created_at) "
+            f"VALUES {rows} "
+            "ON CONFLICT (recipe_id, user_id) DO NOTHING "
+            "RETURNING recipe_id",
+            [value for user_id, recipe_id in chunk
+             for value in (recipe_id, user_id, created_at)],
+        )
+        added.extend((row[0], now) for row in cursor.fetchall())
+    return added
+
+
+def delete_likes(cursor, pairs):
+    """
+    Remove many likes, ignoring the ones that don't exist.
+
+    Args:
+        pairs (list): (user_id, recipe_id) tuples
+
+    Returns:
+        list: (recipe_id, created_at) of each like actually removed
+    """
+    removed = []
+    for chunk in chunked(pairs):
+        rows = ", ".join(["(%s, %s)"] * len(chunk))
+        cursor.execute(
+            "DELETE FROM recipes_like "
+            f"WHERE (user_id, recipe_id) IN (VALUES {rows}) "
+            "RETURNING recipe_id, created_at",
+            [value for pair in chunk for value in pair],
+        )
+        removed.extend(
+            (recipe_id, _as_datetime(created_at))
+            for recipe_id, created_at in cursor.fetchall()
+        )
+    return removed
+
+
+def set_like(user, slug):
+    """
+    Make ``user`` like the recipe with ``slug``.
+
+    Returns:
+        tuple: (changed, like_count) - whether a like was added, and
+            the recipe's like count afterwards
+
+    Raises:
+        Http404: If no recipe has ``slug``
+    """
+    if like_buffer.enabled:
+        recipe = get_object_or_404(
+            Recipe.objects.only("id", "like_count"), slug=slug
+        )
+        changed, _, like_count = buffered_like(user, recipe, True)
+        return changed, like_count
+
+    if not supports_upsert():
+        recipe = get_object_or_404(
+            Recipe.objects.only("id", "like_count"), slug=slug
+        )
+        with transaction.atomic():
+            _, changed = Like.objects.get_or_create(recipe=recipe, user=user)
+        recipe.refresh_from_db(fields=["like_count"])
+        return changed, recipe.like_count
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        like_count = _insert_like(cursor, user, slug)
+        if like_count is None:
+            return False, _current_count(cursor, slug)
+    return True, like_count
+
+
+def unset_like(user, slug):
+    """
+    Make ``user`` not like the recipe with ``slug``.
+
+    Returns:
+        tuple: (changed, like_count) - whether a like was removed, and
+            the recipe's like count afterwards
+
+    Raises:
+        Http404: If no recipe has ``slug``
+    """
+    if like_buffer.enabled:
+        recipe = get_object_or_404(
+            Recipe.objects.only("id", "like_count"), slug=slug
+        )
+        changed, _, like_count = buffered_like(user, recipe, False)
+        return changed, like_count
+
+    if not supports_upsert():
+        recipe = get_object_or_404(
+            Recipe.objects.only("id", "like_count"), slug=slug
+        )
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(
+                recipe=recipe, user=user
+            ).delete()
+        recipe.refresh_from_db(fields=["like_count"])
+        return bool(deleted), recipe.like_count
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        like_count = _delete_like(cursor, user, slug)
+        if like_count is None:
+            return False, _current_count(cursor, slug)
+    return True, like_count
+
+
+def flip_like(user, slug):
+    """
+    Flip whether ``user`` likes the recipe with ``slug``.
+
+    With upserts this is a DELETE ... RETURNING and, when there was
+    nothing to delete, an INSERT, without reading the like first.
+
+    Returns:
+        tuple: (liked, like_count) after the change
+
+    Raises:
+        Http404: If no recipe has ``slug``
+    """
+    if like_buffer.enabled or not supports_upsert():
+        recipe = get_object_or_404(
+            Recipe.objects.only("id", "like_count"), slug=slug
+        )
+        if like_buffer.enabled:
+            _, liked, like_count = buffered_like(user, recipe)
+            return liked, like_count
+        with transaction.atomic():
+            like, liked = Like.objects.get_or_create(recipe=recipe, user=user)
+            if not liked:
+                like.delete()
+        recipe.refresh_from_db(fields=["like_count"])
+        return liked, recipe.like_count
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        like_count = _delete_like(cursor, user, slug)
+        if like_count is not None:
+            return False, like_count
+        like_count = _insert_like(cursor, user, slug)
+        if like_count is None:
+            # A concurrent click added the like between the two
+            # statements; a missing recipe still raises Http404
+            return True, _current_count(cursor, slug)
+    return True, like_count
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.ingredients import sync_recipe_ingredients
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Parse Recipe.ingredients into the Ingredient tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of recipes parsed per transaction",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        synced = 0
+        last_id = 0
+
+        while True:
+            batch = list(
+                Recipe.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .only("pk", "ingredients")[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                sync_recipe_ingredients(batch)
+            synced += len(batch)
+            last_id = batch[-1].pk
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Parsed ingredients for {synced} recipes")
+        )
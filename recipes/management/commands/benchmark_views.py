@@ -0,0 +1,110 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from recipes.benchmarks import (
+    REPEAT,
+    benchmark_dataset,
+    compare_reports,
+    environment,
+    url_names,
+)
+
+# Plain storages, so pages render without collectstatic or Cloudinary
+BENCHMARK_STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed throwaway databases of several sizes, benchmark every view "
+        "and write latency percentiles, query and row counts as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000",
+            help="Comma-separated dataset sizes, in recipes",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=REPEAT,
+            help="Warm requests per view",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Dataset random seed"
+        )
+        parser.add_argument(
+            "--output",
+            default="benchmark-report.json",
+            help="Where to write the JSON report",
+        )
+        parser.add_argument(
+            "--compare",
+            metavar="REPORT",
+            help="Print changes against an earlier report",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(
+                {int(size) for size in options["sizes"].split(",") if size}
+            )
+        except ValueError:
+            raise CommandError("--sizes must be a list of integers")
+        if not sizes or min(sizes) < 1:
+            raise CommandError("--sizes must be positive")
+        previous = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as handle:
+                    previous = json.load(handle)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read report: {error}")
+
+        report = dict(environment(), repeat=options["repeat"],
+                      seed=options["seed"], urls=url_names(), datasets=[])
+        # Never touch the configured database: work in a test database
+        # that is created here and destroyed afterwards
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=["testserver"], STORAGES=BENCHMARK_STORAGES
+            ):
+                for index, size in enumerate(sizes):
+                    if index:
+                        call_command("flush", interactive=False, verbosity=0)
+                    self.stdout.write(f"Seeding {size} recipes...")
+                    report["datasets"].append(
+                        benchmark_dataset(
+                            size,
+                            repeat=options["repeat"],
+                            seed=options["seed"],
+                            log=self.stdout.write,
+                        )
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        with open(options["output"], "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        if previous is not None:
+            for line in compare_reports(previous, report):
+                self.stdout.write(line)
+        self.stdout.write(
+            self.style.SUCCESS(f"Report written to {options['output']}")
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.sitemaps import build_sitemaps
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the stored sitemaps and recipe feeds, rewriting only the "
+        "sections whose recipes changed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rewrite every file, changed or not",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=0,
+            help="Keep running, rebuilding every N seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = build_sitemaps(force=options["force"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote {len(result['written'])} and removed "
+                    f"{len(result['removed'])} sitemap and feed files"
+                )
+            )
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
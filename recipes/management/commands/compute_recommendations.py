@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from recipes.recommendations import TOP_N, compute_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute 'people who liked this also liked' recommendations "
+        "for recipes affected by likes since the last run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every recipe, also picking up removed likes",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=TOP_N,
+            help="Number of recommendations stored per recipe",
+        )
+
+    def handle(self, *args, **options):
+        run = compute_recommendations(
+            full=options["full"], top_n=options["top"]
+        )
+        mode = "full" if run.full else "incremental"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated recommendations for {run.recipes_updated} "
+                f"recipes ({mode} run, up to like {run.last_like_id})"
+            )
+        )
@@ -0,0 +1,86 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.export import (
+    CHUNK_SIZE,
+    EXPORTS,
+    FORMATS,
+    export_chunks,
+    parse_bound,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream recipes, comments or likes to an NDJSON or CSV file, "
+        "optionally gzipped, in constant memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument(
+            "--format", choices=FORMATS, default="ndjson",
+            help="Output format (default: ndjson)",
+        )
+        parser.add_argument(
+            "--output", default="-",
+            help="File to write (default: standard output)",
+        )
+        parser.add_argument(
+            "--gzip", action="store_true", help="Gzip the output"
+        )
+        parser.add_argument(
+            "--status", help="Only rows of recipes with this status"
+        )
+        parser.add_argument(
+            "--since", help="Only rows created on or after this date/time"
+        )
+        parser.add_argument(
+            "--until", help="Only rows created up to this date/time"
+        )
+        parser.add_argument(
+            "--author", help="Only rows written or liked by this username"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Rows fetched from the database at a time",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export_chunks(
+                options["kind"],
+                options["format"],
+                gzip=options["gzip"],
+                status=options["status"],
+                since=options["since"] and parse_bound(options["since"]),
+                until=options["until"]
+                and parse_bound(options["until"], end=True),
+                author=options["author"],
+                chunk_size=options["chunk_size"],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options["output"] != "-":
+            with open(options["output"], "wb") as out:
+                size = self._write(chunks, out)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote {size} bytes to {options['output']}"
+                )
+            )
+        elif options["gzip"]:
+            self._write(chunks, sys.stdout.buffer)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending="")
+
+    def _write(self, chunks, out):
+        size = 0
+        for chunk in chunks:
+            out.write(chunk)
+            size += len(chunk)
+        return size
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.like_buffer import like_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Write buffered like and unlike intents (LIKE_BUFFER) to the "
+        "database, in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Intents per batch (default: LIKE_BUFFER_FLUSH_SIZE)",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=0,
+            help="Keep running, flushing every N seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            added = removed = 0
+            while len(like_buffer):
+                result = like_buffer.flush(options["batch_size"])
+                if result is None:
+                    self.stdout.write("Another worker is flushing")
+                    break
+                added += result[0]
+                removed += result[1]
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Flushed {added} new and {removed} removed likes"
+                )
+            )
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
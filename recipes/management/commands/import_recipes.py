@@ -0,0 +1,288 @@
+import csv
+import json
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from recipes.models import Category, Country, ImportCheckpoint, Recipe
+from recipes.signals import recipes_bulk_created
+from recipes.slugs import SlugAllocator, chunked
+
+# Tries per batch before a slug collision is reported
+SLUG_ATTEMPTS = 3
+
+DIFFICULTIES = {value for value, _ in Recipe.DIFFICULTY_CHOICES}
+STATUSES = {value for value, _ in Recipe.STATUS_CHOICES}
+# Fields that must be strings when given; rows with anything else in
+# them (a numeric title, a list of categories) are skipped
+TEXT_FIELDS = (
+    "title", "description", "ingredients", "instructions", "author",
+    "category", "country", "difficulty", "status", "created_at",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream recipes from an NDJSON or CSV file into the database in "
+        "batches, resuming where an interrupted import stopped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON (.ndjson/.jsonl) or CSV file")
+        parser.add_argument(
+            "--format",
+            choices=["ndjson", "csv"],
+            help="Input format (default: guessed from the file extension)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of recipes inserted per transaction",
+        )
+        parser.add_argument(
+            "--default-author",
+            default="admin",
+            help="Username for rows without an author",
+        )
+        parser.add_argument(
+            "--create-authors",
+            action="store_true",
+            help="Create missing authors (with unusable passwords) "
+            "instead of using --default-author",
+        )
+        parser.add_argument(
+            "--status",
+            choices=sorted(STATUSES),
+            default="published",
+            help="Status for rows that do not give one",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore any saved progress and start from the first row",
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options["path"])
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+        input_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "ndjson"
+        )
+        self.batch_size = options["batch_size"]
+        self.default_status = options["status"]
+        self.create_authors = options["create_authors"]
+        try:
+            self.default_author_id = User.objects.get(
+                username=options["default_author"]
+            ).pk
+        except User.DoesNotExist:
+            raise CommandError(
+                f"Default author '{options['default_author']}' not found"
+            )
+
+        if options["restart"]:
+            ImportCheckpoint.objects.filter(source=path).delete()
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=path)
+        if checkpoint.position:
+            self.stdout.write(
+                f"Resuming after row {checkpoint.position} "
+                f"({checkpoint.imported} recipes already imported)"
+            )
+
+        self.categories = dict(Category.objects.values_list("name", "pk"))
+        self.countries = dict(Country.objects.values_list("name", "pk"))
+        self.authors = {}
+        self.slugs = SlugAllocator(Recipe)
+        self.skipped = 0
+
+        started = time.monotonic()
+        imported = 0
+        batch = []
+        position = checkpoint.position
+        for row, offset in self.read_rows(path, input_format, checkpoint):
+            position += 1
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                imported += self.import_batch(
+                    batch, checkpoint, position, offset
+                )
+                self.report(imported, started)
+                batch = []
+        if batch:
+            imported += self.import_batch(batch, checkpoint, position, offset)
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} recipes in {elapsed:.1f}s "
+                f"({imported / elapsed:.0f} rows/sec), "
+                f"skipped {self.skipped} invalid rows"
+            )
+        )
+
+    def read_rows(self, path, input_format, checkpoint):
+        """
+        Yield ``(row, offset)`` for each input row after the checkpoint:
+        the row as a dict and, for NDJSON, the byte offset just past it
+        (0 for CSV, which is skipped row by row instead).
+        """
+        if input_format == "csv":
+            with open(path, newline="", encoding="utf-8") as handle:
+                for index, row in enumerate(csv.DictReader(handle)):
+                    if index >= checkpoint.position:
+                        yield row, 0
+            return
+        with open(path, "rb") as handle:
+            offset = checkpoint.offset
+            # Checkpoints saved without an offset fall back to counting
+            skip = 0 if offset else checkpoint.position
+            handle.seek(offset)
+            index = 0
+            for line in handle:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                index += 1
+                if index <= skip:
+                    continue
+                try:
+                    yield json.loads(line), offset
+                except ValueError:
+                    yield None, offset
+
+    def report(self, imported, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f"{imported} recipes imported ({imported / elapsed:.0f} rows/sec)"
+        )
+
+    def resolve_names(self, names, mapping, model):
+        """Add ids for new category/country names to ``mapping``"""
+        for name in sorted({name for name in names if name} - mapping.keys()):
+            # Saved one by one so their signals refresh the navigation
+            mapping[name] = model.objects.get_or_create(name=name)[0].pk
+
+    def resolve_authors(self, usernames):
+        """Add ids for usernames not seen yet to ``self.authors``"""
+        missing = {name for name in usernames if name} - self.authors.keys()
+        for chunk in chunked(missing):
+            self.authors.update(
+                User.objects.filter(username__in=chunk).values_list(
+                    "username", "pk"
+                )
+            )
+        missing -= self.authors.keys()
+        if missing and self.create_authors:
+            users = [User(username=name) for name in sorted(missing)]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            for chunk in chunked(missing):
+                self.authors.update(
+                    User.objects.filter(username__in=chunk).values_list(
+                        "username", "pk"
+                    )
+                )
+
+    def build_recipe(self, row):
+        """Turn an input row into an unsaved Recipe, or None if invalid"""
+        if not isinstance(row, dict) or not (row.get("title") or "").strip():
+            return None
+        try:
+            prep_time = int(row.get("prep_time") or 0)
+            cook_time = int(row.get("cook_time") or 0)
+            servings = int(row.get("servings") or 4)
+        except (TypeError, ValueError):
+            return None
+        difficulty = row.get("difficulty") or "medium"
+        status = row.get("status") or self.default_status
+        recipe = Recipe(
+            title=row["title"].strip()[:200],
+            description=row.get("description") or "",
+            ingredients=row.get("ingredients") or "",
+            instructions=row.get("instructions") or "",
+            prep_time=max(prep_time, 0),
+            cook_time=max(cook_time, 0),
+            servings=max(servings, 1),
+            difficulty=difficulty if difficulty in DIFFICULTIES else "medium",
+            status=status if status in STATUSES else self.default_status,
+            author_id=self.authors.get(
+                row.get("author"), self.default_author_id
+            ),
+            category_id=self.categories.get(row.get("category")),
+            country_id=self.countries.get(row.get("country")),
+        )
+        try:
+            created_at = parse_datetime(row.get("created_at") or "")
+        except ValueError:
+            created_at = None
+        if created_at is not None and timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        recipe._imported_created_at = created_at
+        return recipe
+
+    def well_typed(self, row):
+        """Whether ``row`` is a dict with strings in its text fields"""
+        return isinstance(row, dict) and all(
+            isinstance(row.get(field), (str, type(None)))
+            for field in TEXT_FIELDS
+        )
+
+    def import_batch(self, rows, checkpoint, position, offset):
+        """Insert one batch and advance the checkpoint atomically"""
+        total = len(rows)
+        rows = [row for row in rows if self.well_typed(row)]
+        self.resolve_names(
+            [row.get("category") for row in rows],
+            self.categories,
+            Category,
+        )
+        self.resolve_names(
+            [row.get("country") for row in rows], self.countries, Country
+        )
+        self.resolve_authors([row.get("author") for row in rows])
+
+        recipes = [self.build_recipe(row) for row in rows]
+        recipes = [recipe for recipe in recipes if recipe is not None]
+        self.skipped += total - len(recipes)
+
+        titles = [recipe.title for recipe in recipes]
+        for attempt in range(SLUG_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    self.insert(recipes, self.slugs.allocate(titles))
+                    checkpoint.position = position
+                    checkpoint.offset = offset
+                    checkpoint.imported += len(recipes)
+                    checkpoint.save(
+                        update_fields=[
+                            "position", "offset", "imported", "updated_at"
+                        ]
+                    )
+                break
+            except IntegrityError:
+                # Slug numbering cached from earlier batches went stale
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+                self.slugs.forget(titles)
+                for recipe in recipes:
+                    recipe.pk = None
+        return len(recipes)
+
+    def insert(self, recipes, slugs):
+        for recipe, slug in zip(recipes, slugs):
+            recipe.slug = slug
+        Recipe.objects.bulk_create(recipes)
+        # auto_now_add overrode any timestamps from the file
+        dated = [r for r in recipes if r._imported_created_at]
+        for recipe in dated:
+            recipe.created_at = recipe._imported_created_at
+        if dated:
+            Recipe.objects.bulk_update(dated, ["created_at"])
+        recipes_bulk_created(recipes)
@@ -1,13 +1,59 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
 from recipes.models import Category, Country, Recipe
-from django.utils.text import slugify
+from recipes.scale_data import ScaleDataGenerator
 
 
 class Command(BaseCommand):
-    help = "Populate database with sample recipes"
+    help = (
+        "Populate database with sample recipes, or with --scale N a "
+        "reproducible synthetic dataset of N recipes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=int,
+            help="Generate this many synthetic recipes instead of samples",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            help="Synthetic users to create (default: a fifth of --scale)",
+        )
+        parser.add_argument(
+            "--likes-per-recipe",
+            type=float,
+            default=20.0,
+            help="Mean likes per synthetic recipe (power-law distributed)",
+        )
+        parser.add_argument(
+            "--comments-per-recipe",
+            type=float,
+            default=3.0,
+            help="Mean comments per synthetic recipe",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Spread synthetic recipes over this many past days",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Random seed"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Synthetic recipes written per transaction",
+        )
 
     def handle(self, *args, **kwargs):
+        if kwargs.get("scale"):
+            self.populate_scale(kwargs)
+            return
+
         # Get or create admin user
         admin_user, created = User.objects.get_or_create(
             username="admin",
@@ -257,20 +303,18 @@ Dark chocolate shavings (optional)""",
 
         # Create recipes
         for recipe_data in recipes_data:
+            # Slugs are left to the models, which number duplicates
             category, _ = Category.objects.get_or_create(
-                name=recipe_data["category"],
-                defaults={"slug": slugify(recipe_data["category"])},
+                name=recipe_data["category"]
             )
 
             country, _ = Country.objects.get_or_create(
-                name=recipe_data["country"],
-                defaults={"slug": slugify(recipe_data["country"])},
+                name=recipe_data["country"]
             )
 
             recipe, created = Recipe.objects.get_or_create(
                 title=recipe_data["title"],
                 defaults={
-                    "slug": slugify(recipe_data["title"]),
                     "author": admin_user,
                     "category": category,
                     "country": country,
@@ -293,3 +337,27 @@ Dark chocolate shavings (optional)""",
                 )
 
         self.stdout.write(self.style.SUCCESS("Successfully populated recipes!"))
+
+    def populate_scale(self, options):
+        """Generate a synthetic dataset with ScaleDataGenerator"""
+        scale = options["scale"]
+        generator = ScaleDataGenerator(
+            recipes=scale,
+            users=options["users"] or max(scale // 5, 10),
+            likes_per_recipe=options["likes_per_recipe"],
+            comments_per_recipe=options["comments_per_recipe"],
+            days=options["days"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+        try:
+            counts = generator.run()
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated {users} users, {recipes} recipes, {likes} likes "
+                "and {comments} comments".format(**counts)
+            )
+        )
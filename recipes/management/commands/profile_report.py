@@ -0,0 +1,86 @@
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipe_project.profiling import FILENAME_RE, read_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge the sampling profiler's collapsed stack files per URL name "
+        "and report the functions requests spent the most time in"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            help="Profile directory (default: settings.PROFILING_DIR)",
+        )
+        parser.add_argument(
+            "--url", action="append", help="Only report these URL names"
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Functions listed per URL name",
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(
+            options["dir"] or getattr(settings, "PROFILING_DIR", "profiles")
+        )
+        if not directory.is_dir():
+            raise CommandError(f"No profiles in {directory}")
+        folders = sorted(path for path in directory.iterdir() if path.is_dir())
+        if options["url"]:
+            folders = [path for path in folders if path.name in options["url"]]
+
+        for folder in folders:
+            durations = []
+            samples = Counter()
+            for path in sorted(folder.glob("*.folded")):
+                match = FILENAME_RE.match(path.name)
+                if match is None:
+                    continue
+                durations.append(int(match["ms"]))
+                samples.update(read_profile(path))
+            if not durations:
+                continue
+
+            merged = directory / f"{folder.name}.folded"
+            with open(merged, "w", encoding="utf-8") as handle:
+                for stack, count in sorted(samples.items()):
+                    handle.write(f"{stack} {count}\n")
+            self.report(folder.name, durations, samples, options["top"])
+            self.stdout.write(f"  flamegraph input: {merged}\n")
+
+    def report(self, url_name, durations, samples, top):
+        total = sum(samples.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{url_name}: {len(durations)} requests, "
+                f"mean {sum(durations) / len(durations):.0f}ms, "
+                f"max {max(durations)}ms, {total} samples"
+            )
+        )
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            # Recursive functions count once per sample
+            for frame in set(frames):
+                inclusive[frame] += count
+        self.stdout.write("  self time:")
+        for frame, count in own.most_common(top):
+            self.stdout.write(f"  {count / total:6.1%}  {frame}")
+        # Frames on every stack (the middleware chain) say nothing
+        self.stdout.write("  total time:")
+        shown = [
+            (frame, count) for frame, count in inclusive.most_common()
+            if count < total
+        ]
+        for frame, count in shown[:top]:
+            self.stdout.write(f"  {count / total:6.1%}  {frame}")
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from recipes.models import Recipe, Comment, Like
+from recipes.signals import (
+    count_of,
+    invalidate_pages_on_commit,
+    recipe_page_tags,
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized like and comment counters on recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of recipes updated per statement",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        updated = 0
+        last_id = 0
+        tags = set()
+
+        # Walk the table in primary key ranges so a large catalogue
+        # is never locked by a single long-running UPDATE
+        while True:
+            ids = list(
+                Recipe.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            counters = {
+                "like_count": count_of(Like.objects.all()),
+                "comment_count": count_of(
+                    Comment.objects.filter(approved=True)
+                ),
+            }
+            # Only drifted recipes get a new version, so every other
+            # cached card and page stays valid
+            drifted = list(
+                Recipe.objects.filter(pk__gte=ids[0], pk__lte=ids[-1])
+                .alias(
+                    counted_likes=counters["like_count"],
+                    counted_comments=counters["comment_count"],
+                )
+                .exclude(
+                    like_count=F("counted_likes"),
+                    comment_count=F("counted_comments"),
+                )
+                .values_list("pk", flat=True)
+            )
+            if drifted:
+                updated += Recipe.objects.filter(pk__in=drifted).update(
+                    version=F("version") + 1, **counters
+                )
+                for pk in drifted:
+                    tags.update(recipe_page_tags(pk, include_lists=True))
+            last_id = ids[-1]
+
+        invalidate_pages_on_commit(*tags)
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired counters on {updated} recipes")
+        )
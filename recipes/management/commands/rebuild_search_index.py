@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for all recipes"
+
+    def handle(self, *args, **kwargs):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt search index ({type(backend).__name__})"
+            )
+        )
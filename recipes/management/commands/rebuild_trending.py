@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from recipes.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute trending scores from all likes and comments "
+        "(after deploying, or after changing the trending settings)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of score rows written per statement",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_scores(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt trending scores for {written} recipes"
+            )
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-18 03:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Like = apps.get_model('recipes', 'Like')
+    Comment = apps.get_model('recipes', 'Comment')
+
+    def count_of(queryset):
+        return Coalesce(
+            Subquery(
+                queryset.filter(recipe=OuterRef('pk'))
+                .values('recipe')
+                .annotate(total=Count('pk'))
+                .values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    Recipe.objects.update(
+        like_count=count_of(Like.objects.all()),
+        comment_count=count_of(Comment.objects.filter(approved=True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 03:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_like_id', models.PositiveBigIntegerField(default=0)),
+                ('full', models.BooleanField(default=False)),
+                ('recipes_updated', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-finished_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('position', models.PositiveSmallIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='recipes.recipe')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ['recipe', 'position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reciperecommendation',
+            constraint=models.UniqueConstraint(fields=('recipe', 'position'), name='unique_recommendation_position'),
+        ),
+    ]
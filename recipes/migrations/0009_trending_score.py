@@ -0,0 +1,63 @@
+# Generated by Django 4.2 on 2026-10-18 03:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_trending_rows(apps, schema_editor):
+    # Scores start at zero; rebuild_trending fills them from history
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TrendingScore = apps.get_model('recipes', 'TrendingScore')
+    TrendingScore.objects.bulk_create(
+        [
+            TrendingScore(
+                recipe_id=pk,
+                published=status == 'published',
+                category_id=category_id,
+                country_id=country_id,
+            )
+            for pk, status, category_id, country_id in
+            Recipe.objects.values_list(
+                'pk', 'status', 'category_id', 'country_id'
+            ).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='recipes.recipe')),
+                ('score', models.FloatField(default=0.0)),
+                ('published', models.BooleanField(default=False)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recipes.category')),
+                ('country', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recipes.country')),
+            ],
+            options={
+                'ordering': ['-score', '-recipe'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(condition=models.Q(('published', True)), fields=['-score', '-recipe'], name='trending_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(condition=models.Q(('published', True)), fields=['category', '-score', '-recipe'], name='trending_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(condition=models.Q(('published', True)), fields=['country', '-score', '-recipe'], name='trending_country_idx'),
+        ),
+        migrations.RunPython(
+            create_trending_rows, migrations.RunPython.noop
+        ),
+    ]
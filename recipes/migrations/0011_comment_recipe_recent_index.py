@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['recipe', 'approved', '-created_at', '-id'], name='comment_recipe_recent_idx'),
+        ),
+    ]
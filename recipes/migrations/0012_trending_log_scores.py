@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 04:45
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Log, Power
+
+EMPTY = -1e6
+
+
+def to_log_scores(apps, schema_editor):
+    # Empty (or rounding-negative) scores first, so that converted
+    # scores below one aren't mistaken for them
+    TrendingScore = apps.get_model('recipes', 'TrendingScore')
+    TrendingScore.objects.filter(score__lte=0).update(score=EMPTY)
+    TrendingScore.objects.filter(score__gt=0).update(score=Log(2, F('score')))
+
+
+def from_log_scores(apps, schema_editor):
+    TrendingScore = apps.get_model('recipes', 'TrendingScore')
+    TrendingScore.objects.exclude(score=EMPTY).update(
+        score=Power(2, F('score'))
+    )
+    TrendingScore.objects.filter(score=EMPTY).update(score=0.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_comment_recipe_recent_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trendingscore',
+            name='score',
+            field=models.FloatField(default=-1000000.0),
+        ),
+        migrations.RunPython(to_log_scores, from_log_scores),
+    ]
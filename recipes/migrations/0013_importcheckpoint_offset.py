@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_trending_log_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='offset',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
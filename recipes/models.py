@@ -1,8 +1,10 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
-from django.utils.text import slugify
 from django.urls import reverse
 
+from .slugs import save_with_unique_slug
+
 
 class Category(models.Model):
     """
@@ -19,9 +21,13 @@ class Category(models.Model):
         ordering = ["name"]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+        parent_save = super().save
+        save_with_unique_slug(
+            self, self.name, lambda: parent_save(*args, **kwargs)
+        )
 
     def __str__(self):
         return self.name
@@ -45,9 +51,13 @@ class Country(models.Model):
         ordering = ["name"]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+        parent_save = super().save
+        save_with_unique_slug(
+            self, self.name, lambda: parent_save(*args, **kwargs)
+        )
 
     def __str__(self):
         return self.name
@@ -120,17 +130,67 @@ class Recipe(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized counters, maintained by recipes.signals
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Bumped on every change that alters how the recipe renders; used
+    # to key cached fragments of it
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    # Counters are only ever written with F() updates, never by save()
+    COUNTER_FIELDS = ("like_count", "comment_count")
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["-created_at"]),
             models.Index(fields=["status"]),
+            # Keyset pagination walks these in (created_at, id) order
+            models.Index(fields=["status", "-created_at", "-id"]),
+            models.Index(fields=["category", "-created_at", "-id"]),
+            models.Index(fields=["country", "-created_at", "-id"]),
+            models.Index(fields=["author", "-created_at", "-id"]),
+            # Lets the pantry index poll for recently changed recipes
+            models.Index(fields=["updated_at"]),
         ]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+        bump_version = not self._state.adding
+        if bump_version:
+            self.version = F("version") + 1
+            if kwargs.get("update_fields") is None:
+                # Don't overwrite counters with values that may have gone
+                # stale since this instance was loaded
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.name not in self.COUNTER_FIELDS
+                ]
+            else:
+                kwargs["update_fields"] = {
+                    *kwargs["update_fields"], "version"
+                }
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            parent_save = super().save
+            save_with_unique_slug(
+                self, self.title, lambda: parent_save(*args, **kwargs)
+            )
+        if bump_version:
+            # Leave the new version deferred: it is read back from the
+            # database only if something uses it after the save
+            del self.__dict__["version"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so signal handlers can tell what
+        # a save changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return self.title
@@ -144,11 +204,14 @@ class Recipe(models.Model):
         return self.prep_time + self.cook_time
 
     def total_likes(self):
-        """Return total number of likes"""
+        """Return total number of likes (counted live, see like_count)"""
         return self.likes.count()
 
     def total_comments(self):
-        """Return total number of approved comments"""
+        """
+        Return total number of approved comments
+        (counted live, see comment_count)
+        """
         return self.comments.filter(approved=True).count()
 
 
@@ -174,6 +237,11 @@ class Comment(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["-created_at"]),
+            # A recipe's approved comments, newest first, page by page
+            models.Index(
+                fields=["recipe", "approved", "-created_at", "-id"],
+                name="comment_recipe_recent_idx",
+            ),
         ]
 
     def __str__(self):
@@ -199,3 +267,166 @@ class Like(models.Model):
 
     def __str__(self):
         return f"{self.user.username} likes {self.recipe.title}"
+
+
+class Ingredient(models.Model):
+    """
+    Model representing a canonical ingredient name shared across recipes
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """
+    Model representing one parsed line of a recipe's ingredient list,
+    maintained from Recipe.ingredients by recipes.ingredients
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="recipe_ingredients"
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name="recipe_ingredients"
+    )
+    quantity = models.DecimalField(
+        max_digits=10, decimal_places=3, null=True, blank=True
+    )
+    unit = models.CharField(max_length=20, blank=True)
+    raw_text = models.CharField(max_length=255)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ["recipe", "position"]
+        indexes = [
+            # "Which recipes use X" is answered from this index alone
+            models.Index(fields=["ingredient", "recipe"]),
+        ]
+
+    def __str__(self):
+        return self.raw_text
+
+
+class RecipeRecommendation(models.Model):
+    """
+    Model representing a precomputed "people who liked this also liked"
+    neighbour of a recipe, written by the compute_recommendations command
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="recommendations"
+    )
+    recommended = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="+"
+    )
+    score = models.FloatField()
+    position = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ["recipe", "position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "position"],
+                name="unique_recommendation_position",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} -> {self.recommended_id} ({self.score:.3f})"
+
+
+class RecommendationRun(models.Model):
+    """
+    Model recording how far the recommendations have been computed, so
+    the next run only revisits recipes touched by newer likes
+    """
+
+    last_like_id = models.PositiveBigIntegerField(default=0)
+    full = models.BooleanField(default=False)
+    recipes_updated = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-finished_at", "-id"]
+
+    def __str__(self):
+        return f"Recommendations up to like {self.last_like_id}"
+
+
+class TrendingScore(models.Model):
+    """
+    Model holding a recipe's time-decayed popularity, maintained by
+    recipes.trending as likes and comments arrive. Category, country
+    and status are copied from the recipe so each trending listing is
+    a single index range scan.
+
+    ``score`` is a base 2 logarithm (see recipes.trending), so a recipe
+    with no activity holds EMPTY rather than zero.
+    """
+
+    EMPTY = -1e6
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="trending",
+    )
+    score = models.FloatField(default=EMPTY)
+    published = models.BooleanField(default=False)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    country = models.ForeignKey(
+        Country, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+
+    class Meta:
+        ordering = ["-score", "-recipe"]
+        # Partial indexes: only published rows are ever listed, and a
+        # boolean filter can't seek into a composite index on SQLite
+        indexes = [
+            models.Index(
+                fields=["-score", "-recipe"],
+                condition=models.Q(published=True),
+                name="trending_published_idx",
+            ),
+            models.Index(
+                fields=["category", "-score", "-recipe"],
+                condition=models.Q(published=True),
+                name="trending_category_idx",
+            ),
+            models.Index(
+                fields=["country", "-score", "-recipe"],
+                condition=models.Q(published=True),
+                name="trending_country_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.score:.3f}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Model recording how far the import_recipes command has read an
+    input file. It is saved in the same transaction as each batch, so
+    an interrupted import resumes exactly after the last committed row.
+    For NDJSON, ``offset`` is that row's end in bytes, so a resumed
+    import seeks there instead of re-reading the file.
+    """
+
+    source = models.CharField(max_length=500, unique=True)
+    position = models.PositiveBigIntegerField(default=0)
+    offset = models.PositiveBigIntegerField(default=0)
+    imported = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.position}"
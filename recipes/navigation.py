@@ -0,0 +1,105 @@
+"""
+In-process cache of categories and countries
+
+Every page renders the Categories and Cuisines dropdowns, and the
+category/cuisine listings resolve their slug on every hit. Both change
+rarely, so each worker keeps them in memory and reloads only when the
+shared ``nav`` page cache tag moves, which Category/Country writes bump.
+Checking the tag is one cache lookup instead of two table scans.
+
+With a cache private to each process the tag only moves for the
+worker that made the write, so there the copy is also reloaded every
+NAVIGATION_TTL seconds. A slug missing from the copy is looked up in
+the database before giving a 404, so a new category or cuisine is
+reachable on every worker straight away.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.http import Http404
+
+from . import page_cache
+from .models import Category, Country
+
+
+class NavigationCache:
+    """Categories and countries with slug lookups, cached per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._data = None
+        self._loaded_at = 0.0
+
+    def _load(self):
+        categories = list(Category.objects.all())
+        countries = list(Country.objects.all())
+        return {
+            "categories": categories,
+            "countries": countries,
+            "category_slugs": {item.slug: item for item in categories},
+            "country_slugs": {item.slug: item for item in countries},
+        }
+
+    def _stale(self, generation):
+        if self._data is None or generation != self._generation:
+            return True
+        if page_cache.shared_cache():
+            return False
+        ttl = getattr(settings, "NAVIGATION_TTL", 60)
+        return time.monotonic() - self._loaded_at >= ttl
+
+    def _get(self):
+        (generation,) = page_cache.tag_generations([page_cache.NAV_TAG])
+        data = self._data
+        if self._stale(generation):
+            with self._lock:
+                if self._stale(generation):
+                    self._data = self._load()
+                    self._generation = generation
+                    self._loaded_at = time.monotonic()
+                data = self._data
+        return data
+
+    def _lookup(self, key, model, slug):
+        try:
+            return self._get()[key][slug]
+        except KeyError:
+            pass
+        # Possibly added by another worker since this copy was loaded
+        item = model.objects.filter(slug=slug).first()
+        if item is None:
+            raise Http404(
+                f"No {model._meta.verbose_name} matches the given query."
+            )
+        self.invalidate()
+        return item
+
+    def invalidate(self):
+        """Drop this process's copy; the next access reloads it"""
+        with self._lock:
+            self._data = None
+
+    def categories(self):
+        return self._get()["categories"]
+
+    def countries(self):
+        return self._get()["countries"]
+
+    def menus(self):
+        """Categories and countries from a single freshness check"""
+        data = self._get()
+        return data["categories"], data["countries"]
+
+    def get_category(self, slug):
+        """Return the category for ``slug`` or raise Http404"""
+        return self._lookup("category_slugs", Category, slug)
+
+    def get_country(self, slug):
+        """Return the country for ``slug`` or raise Http404"""
+        return self._lookup("country_slugs", Country, slug)
+
+
+navigation = NavigationCache()
@@ -0,0 +1,271 @@
+"""
+Full-page cache for anonymous visitors
+
+Each cached page is stored under a key that includes the current
+generation of every tag the page depends on, e.g. ``recipe:<slug>``
+for a detail page or ``category:<slug>`` for a category listing.
+Invalidating a tag just bumps its generation, so exactly the pages
+built from it miss on their next request and everything else keeps
+being served from cache.
+
+Generations are nanosecond timestamps of the tag's last change, so the
+same lookup also gives every page (cached or not, anonymous or not) an
+ETag and a Last-Modified date: ConditionalPageMixin answers a
+revalidating browser with 304 Not Modified before running any query.
+
+Both rely on every worker seeing the same generations, so they are off
+unless PAGE_CACHE is set, and the recipes.E001 check refuses PAGE_CACHE
+with a per-process cache backend outside DEBUG.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+TAG_PREFIX = "pagecache:tag:"
+PAGE_PREFIX = "pagecache:page:"
+
+# Shown on every page through the navigation dropdowns
+NAV_TAG = "nav"
+# The home page and full recipe list
+LIST_TAG = "recipes"
+# The trending listings, reordered by every like and comment
+TRENDING_TAG = "trending"
+
+
+# Backends whose entries are private to one process
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def enabled():
+    return getattr(settings, "PAGE_CACHE", False)
+
+
+def shared_cache():
+    """Whether the default cache is one every worker sees"""
+    return settings.CACHES["default"]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+
+
+def recipe_tag(slug):
+    return f"recipe:{slug}"
+
+
+def category_tag(slug):
+    return f"category:{slug}"
+
+
+def country_tag(slug):
+    return f"country:{slug}"
+
+
+def author_tag(user_id):
+    return f"author:{user_id}"
+
+
+def _new_generation():
+    # Start from the clock so a tag that was evicted and recreated can
+    # never reuse a generation that old pages were stored under
+    return time.time_ns()
+
+
+def tag_generations(tags):
+    """
+    Return the current generation of each tag, creating missing ones.
+
+    Args:
+        tags (list): Tag names
+
+    Returns:
+        list: Generations, in the same order as ``tags``
+    """
+    keys = [TAG_PREFIX + tag for tag in tags]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        if key not in found:
+            generation = _new_generation()
+            if not cache.add(key, generation, None):
+                generation = cache.get(key, generation)
+            found[key] = generation
+        generations.append(found[key])
+    return generations
+
+
+def invalidate(*tags):
+    """Expire every cached page that depends on any of ``tags``"""
+    for tag in tags:
+        key = TAG_PREFIX + tag
+        generation = cache.get(key)
+        if generation is None:
+            # Never generated, so no page was cached under it
+            continue
+        try:
+            # Move to the current time; incr keeps concurrent
+            # invalidations from landing on the same generation
+            cache.incr(key, max(1, _new_generation() - generation))
+        except ValueError:
+            pass
+
+
+def page_key(request, tags, generations=None):
+    """Build the cache key for ``request`` given its page's tags"""
+    if generations is None:
+        generations = tag_generations(tags)
+    signature = "|".join(
+        [request.get_full_path()]
+        + [f"{tag}={gen}" for tag, gen in zip(tags, generations)]
+    )
+    return PAGE_PREFIX + hashlib.sha1(signature.encode()).hexdigest()
+
+
+def has_pending_messages(request):
+    """Whether a flash message waits, in the cookie or the session"""
+    return len(get_messages(request)) > 0
+
+
+def is_cacheable_request(request):
+    """Only plain anonymous GETs without pending messages are cached"""
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not has_pending_messages(request)
+    )
+
+
+class TaggedPageMixin:
+    """
+    Views declare the tags their output depends on by overriding
+    ``get_cache_tags``; the navigation tag is always included. Their
+    generations are looked up once per request.
+    """
+
+    def get_cache_tags(self):
+        return []
+
+    def page_generations(self):
+        if not hasattr(self, "_page_generations"):
+            tags = [NAV_TAG, *self.get_cache_tags()]
+            self._page_generations = (tags, tag_generations(tags))
+        return self._page_generations
+
+
+def page_validators(request, tags, generations, extra=""):
+    """
+    ETag and Last-Modified timestamp for a page built from ``tags``.
+
+    ``extra`` carries anything else the page shows that the tags do
+    not cover, such as pending likes. The CSRF secret and session key
+    are mixed in too, since pages embed the CSRF token: after a login
+    rotates it, a stale copy would make the next POST fail.
+    """
+    signature = "|".join(
+        [
+            request.get_full_path(),
+            str(request.user.pk or ""),
+            request.META.get("CSRF_COOKIE", ""),
+            request.session.session_key or "",
+            extra,
+        ]
+        + [f"{tag}={gen}" for tag, gen in zip(tags, generations)]
+    )
+    etag = f'"{hashlib.sha1(signature.encode()).hexdigest()}"'
+    # A generation recreated after eviction starts at "now", which at
+    # worst costs a revalidating client one full response
+    last_modified = min(max(generations) / 1e9, time.time())
+    return etag, last_modified
+
+
+class ConditionalPageMixin(TaggedPageMixin):
+    """
+    View mixin answering conditional GETs (If-None-Match or
+    If-Modified-Since) with 304 Not Modified when none of the page's
+    tags changed, and sending ETag and Last-Modified otherwise.
+
+    Responses are marked ``no-cache`` so browsers revalidate each time
+    instead of guessing a freshness lifetime from Last-Modified, and
+    ``private`` for logged in users, who get no Last-Modified: only the
+    ETag covers their CSRF token. Pages with a pending flash message
+    are always rendered in full.
+    """
+
+    def get_validator_extra(self):
+        return ""
+
+    def dispatch(self, request, *args, **kwargs):
+        if (
+            not enabled()
+            or request.method not in ("GET", "HEAD")
+            or has_pending_messages(request)
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+        if request.user.is_authenticated:
+            # Issue the CSRF cookie now rather than while rendering, so
+            # this ETag already covers the token the page will embed
+            get_token(request)
+        tags, generations = self.page_generations()
+        etag, last_modified = page_validators(
+            request, tags, generations, self.get_validator_extra()
+        )
+        if request.user.is_authenticated:
+            last_modified = None
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified and int(last_modified),
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(
+            response,
+            no_cache=True,
+            private=request.user.is_authenticated,
+        )
+        return response
+
+
+class AnonymousPageCacheMixin(TaggedPageMixin):
+    """
+    View mixin serving anonymous requests from the page cache.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not enabled() or not is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        tags, generations = self.page_generations()
+        key = page_key(request, tags, generations)
+        response = cache.get(key)
+        if response is not None:
+            response["X-Page-Cache"] = "hit"
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+
+        timeout = getattr(settings, "PAGE_CACHE_TIMEOUT", 600)
+
+        def store(rendered):
+            cache.set(key, rendered, timeout)
+
+        if hasattr(response, "render") and callable(response.render):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        response["X-Page-Cache"] = "miss"
+        return response
@@ -0,0 +1,216 @@
+"""
+Keyset (cursor) pagination for recipe listings
+
+Pages are addressed by an opaque token holding the sort key of the
+row at the page boundary rather than an OFFSET, so every page is an
+index range scan that costs the same no matter how deep it is.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def _row_value(row, field):
+    """Read a sort key from a model instance or a ``.values()`` dict"""
+    value = row[field] if isinstance(row, dict) else getattr(row, field)
+    if isinstance(value, datetime.datetime):
+        # Keep full microsecond precision; DjangoJSONEncoder truncates
+        # to milliseconds, which would break equality on ties
+        return value.isoformat()
+    return value
+
+
+class CursorPage:
+    """
+    One page of results, exposing the parts of Django's Page API that
+    the templates use plus next/previous cursor tokens
+    """
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset by its ordering columns.
+
+    The queryset must be ordered, and the last ordering column must be
+    unique (normally ``id``) so that every row has a distinct position.
+    """
+
+    def __init__(self, queryset, per_page):
+        ordering = tuple(queryset.query.order_by)
+        if not ordering:
+            raise ValueError("CursorPaginator requires an ordered queryset")
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [field.lstrip("-") for field in ordering]
+
+    def encode_cursor(self, row, direction):
+        """Build the opaque token pointing just past ``row``"""
+        payload = {
+            "d": direction,
+            "v": [_row_value(row, field) for field in self.fields],
+        }
+        raw = json.dumps(
+            payload, cls=DjangoJSONEncoder, separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, token):
+        """Return ``(direction, values)`` from a token"""
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+            direction = payload["d"]
+            values = payload["v"]
+        except (
+            binascii.Error, ValueError, TypeError, KeyError, AttributeError
+        ):
+            raise InvalidCursor(token)
+        if direction not in (NEXT, PREVIOUS) or not isinstance(
+            values, list
+        ) or len(values) != len(self.fields):
+            raise InvalidCursor(token)
+        return direction, [
+            self._to_python(field, value)
+            for field, value in zip(self.fields, values)
+        ]
+
+    def _to_python(self, name, value):
+        """Convert a JSON cursor value back to the column's type"""
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations such as search_rank travel as plain JSON
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise InvalidCursor(value)
+
+    def _seek(self, values, forward):
+        """
+        Build the filter selecting rows after (or before) ``values``
+        in this paginator's ordering
+        """
+        condition = Q()
+        for index, ordering in enumerate(self.ordering):
+            descending = ordering.startswith("-")
+            lookup = "lt" if descending == forward else "gt"
+            term = Q(**{f"{self.fields[index]}__{lookup}": values[index]})
+            for previous in range(index):
+                term &= Q(**{self.fields[previous]: values[previous]})
+            condition |= term
+        # A redundant bound on the leading column lets the planner turn
+        # the OR chain into a single index range scan
+        lead = "lte" if self.ordering[0].startswith("-") == forward else "gte"
+        return Q(**{f"{self.fields[0]}__{lead}": values[0]}) & condition
+
+    def page(self, token=None):
+        """
+        Return the page identified by ``token`` (the first page if None).
+
+        Raises:
+            InvalidCursor: If the token is malformed
+        """
+        if not token:
+            rows = list(self.queryset[: self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            return CursorPage(
+                rows,
+                self,
+                self.encode_cursor(rows[-1], NEXT) if has_more else None,
+                None,
+            )
+
+        direction, values = self.decode_cursor(token)
+        if direction == NEXT:
+            rows = list(
+                self.queryset.filter(self._seek(values, forward=True))[
+                    : self.per_page + 1
+                ]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            next_cursor = (
+                self.encode_cursor(rows[-1], NEXT) if has_more else None
+            )
+            previous_cursor = (
+                self.encode_cursor(rows[0], PREVIOUS) if rows else None
+            )
+        else:
+            reverse_ordering = [
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in self.ordering
+            ]
+            rows = list(
+                self.queryset.filter(self._seek(values, forward=False))
+                .order_by(*reverse_ordering)[: self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[: self.per_page][::-1]
+            next_cursor = (
+                self.encode_cursor(rows[-1], NEXT) if rows else None
+            )
+            previous_cursor = (
+                self.encode_cursor(rows[0], PREVIOUS) if has_more else None
+            )
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin replacing OFFSET pagination with cursor pagination.
+
+    The page is selected with ``?cursor=<token>``; templates link to
+    other pages through ``page_obj.next_cursor`` and
+    ``page_obj.previous_cursor``.
+    """
+
+    cursor_kwarg = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,330 @@
+"""
+In-memory pantry index: "what can I cook with what I have?"
+
+Every published recipe gets a slot (a bit position). For each
+ingredient the index keeps the set of slots using it, and each
+recipe's ingredient count is stored bit-sliced: plane ``i`` is a
+bitmask of the recipes whose count has bit ``i`` set. A pantry query
+ORs nothing per recipe; it adds the pantry ingredients' bitmasks into
+bit-sliced counters, subtracts them from the count planes and reads
+off "missing exactly k" masks, so the work is a few dozen big-integer
+operations however many recipes there are.
+
+The index is built once per process (at worker start from wsgi.py, or
+lazily on the first query), kept current in-process by the recipe
+signals, and polls ``Recipe.updated_at`` for writes made by other
+processes. A transaction can commit after one with a later timestamp,
+so each poll re-reads PANTRY_REFRESH_MARGIN seconds behind the latest
+timestamp seen; re-applying a recipe is harmless. Recipes deleted
+elsewhere linger until the next load, so callers fetch results through
+a published-only queryset.
+"""
+
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Max
+
+from .ingredients import canonical_name
+from .models import Ingredient, Recipe, RecipeIngredient
+
+# Ingredients used by at least this share of recipes keep a ready-made
+# bitmask; rarer ones are turned into one when a query needs them
+DENSE_FRACTION = 1 / 256
+
+DEFAULT_STAPLES = ("salt", "pepper", "black pepper", "water")
+
+
+def _mask_from_slots(slots, size):
+    """Build a bitmask with the given bit positions set"""
+    buffer = bytearray((size + 7) // 8)
+    for slot in slots:
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _add(planes, mask):
+    """Add one to every bit-sliced counter selected by ``mask``"""
+    carry = mask
+    for index, plane in enumerate(planes):
+        if not carry:
+            return
+        planes[index], carry = plane ^ carry, plane & carry
+    if carry:
+        planes.append(carry)
+
+
+def _subtract(left, right):
+    """Bit-sliced ``left - right`` for lanes where left >= right"""
+    planes = []
+    borrow = 0
+    for index in range(max(len(left), len(right))):
+        x = left[index] if index < len(left) else 0
+        y = right[index] if index < len(right) else 0
+        planes.append(x ^ y ^ borrow)
+        borrow = (~x & y) | (~(x ^ y) & borrow)
+    return planes
+
+
+def _equal(planes, value, mask):
+    """Narrow ``mask`` to the lanes whose counter equals ``value``"""
+    if value >> len(planes):
+        return 0
+    for index, plane in enumerate(planes):
+        mask &= plane if (value >> index) & 1 else ~plane
+    return mask
+
+
+def _top_slots(mask, limit):
+    """Highest set bits of ``mask`` first, i.e. newest recipes first"""
+    slots = []
+    while mask and len(slots) < limit:
+        slot = mask.bit_length() - 1
+        slots.append(slot)
+        mask ^= 1 << slot
+    return slots
+
+
+class PantryIndex:
+    """Bitset index over the ingredients of published recipes"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _reset(self):
+        self._slots = {}
+        self._recipe_ids = []
+        self._items = []
+        self._postings = {}
+        self._masks = {}
+        self._count_planes = []
+        self._names = {}
+        self._labels = {}
+        self._last_ingredient_id = 0
+        self._watermark = None
+        self._checked_at = time.monotonic()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self):
+        """(Re)build the whole index from the database"""
+        with self._lock:
+            self._reset()
+            # Taken first so writes racing the load are replayed later
+            self._watermark = Recipe.objects.aggregate(
+                latest=Max("updated_at")
+            )["latest"]
+            self._load_ingredient_names()
+
+            items = {}
+            rows = (
+                RecipeIngredient.objects.filter(recipe__status="published")
+                .order_by("recipe_id")
+                .values_list("recipe_id", "ingredient_id")
+            )
+            for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+                items.setdefault(recipe_id, set()).add(ingredient_id)
+
+            for recipe_id, ingredient_ids in items.items():
+                slot = len(self._recipe_ids)
+                self._slots[recipe_id] = slot
+                self._recipe_ids.append(recipe_id)
+                self._items.append(frozenset(ingredient_ids))
+                for ingredient_id in ingredient_ids:
+                    self._postings.setdefault(ingredient_id, set()).add(slot)
+
+            size = len(self._recipe_ids)
+            width = max((len(item) for item in self._items), default=0)
+            self._count_planes = [
+                _mask_from_slots(
+                    (
+                        slot
+                        for slot, item in enumerate(self._items)
+                        if (len(item) >> bit) & 1
+                    ),
+                    size,
+                )
+                for bit in range(width.bit_length())
+            ]
+            dense = size * DENSE_FRACTION
+            for ingredient_id, slots in self._postings.items():
+                if len(slots) >= dense:
+                    self._masks[ingredient_id] = _mask_from_slots(slots, size)
+            self._loaded = True
+
+    def _load_ingredient_names(self):
+        rows = Ingredient.objects.filter(
+            pk__gt=self._last_ingredient_id
+        ).values_list("pk", "name")
+        for pk, name in rows:
+            self._names[name] = pk
+            self._labels[pk] = name
+            self._last_ingredient_id = max(self._last_ingredient_id, pk)
+
+    def _set_count(self, slot, count):
+        bit = 1 << slot
+        while count.bit_length() > len(self._count_planes):
+            self._count_planes.append(0)
+        for index, plane in enumerate(self._count_planes):
+            if (count >> index) & 1:
+                self._count_planes[index] = plane | bit
+            elif plane & bit:
+                self._count_planes[index] = plane & ~bit
+
+    def _set_recipe(self, recipe_id, ingredient_ids):
+        """Replace one recipe's entry; empty ``ingredient_ids`` drops it"""
+        slot = self._slots.get(recipe_id)
+        if slot is None:
+            if not ingredient_ids:
+                return
+            slot = len(self._recipe_ids)
+            self._slots[recipe_id] = slot
+            self._recipe_ids.append(recipe_id)
+            self._items.append(frozenset())
+
+        old, new = self._items[slot], frozenset(ingredient_ids)
+        for ingredient_id in old - new:
+            self._postings[ingredient_id].discard(slot)
+            self._masks.pop(ingredient_id, None)
+        for ingredient_id in new - old:
+            self._postings.setdefault(ingredient_id, set()).add(slot)
+            self._masks.pop(ingredient_id, None)
+        self._items[slot] = new
+        self._set_count(slot, len(new))
+        if not new:
+            # Leave the slot empty rather than renumbering every bitmask
+            del self._slots[recipe_id]
+            self._recipe_ids[slot] = None
+
+    def update(self, recipe_ids):
+        """
+        Re-read the given recipes into the index, dropping those that
+        were deleted or unpublished. A no-op until the index is loaded.
+        """
+        recipe_ids = set(recipe_ids)
+        if not self._loaded or not recipe_ids:
+            return
+        with self._lock:
+            self._load_ingredient_names()
+            items = {recipe_id: set() for recipe_id in recipe_ids}
+            rows = RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids, recipe__status="published"
+            ).values_list("recipe_id", "ingredient_id")
+            for recipe_id, ingredient_id in rows:
+                items[recipe_id].add(ingredient_id)
+            for recipe_id, ingredient_ids in items.items():
+                self._set_recipe(recipe_id, ingredient_ids)
+
+    def refresh(self):
+        """Apply recipes changed by other processes since the last check"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            changed = Recipe.objects.all()
+            if self._watermark is not None:
+                margin = datetime.timedelta(
+                    seconds=getattr(settings, "PANTRY_REFRESH_MARGIN", 60)
+                )
+                changed = changed.filter(
+                    updated_at__gte=self._watermark - margin
+                )
+            rows = list(changed.values_list("pk", "updated_at"))
+            if rows:
+                latest = max(updated for _, updated in rows)
+                if self._watermark is None or latest > self._watermark:
+                    self._watermark = latest
+                self.update(pk for pk, _ in rows)
+
+    def _ensure_fresh(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+            return
+        interval = getattr(settings, "PANTRY_REFRESH_INTERVAL", 30)
+        if time.monotonic() - self._checked_at >= interval:
+            self.refresh()
+
+    def resolve(self, names):
+        """
+        Map free-text pantry entries to ingredient ids.
+
+        Returns:
+            tuple: (ingredient ids, entries that matched no ingredient)
+        """
+        self._ensure_fresh()
+        found, unknown = set(), []
+        for name in names:
+            canonical = canonical_name(name)
+            if not canonical:
+                continue
+            if canonical in self._names:
+                found.add(self._names[canonical])
+            else:
+                unknown.append(name.strip())
+        return found, unknown
+
+    def _mask(self, ingredient_id):
+        mask = self._masks.get(ingredient_id)
+        if mask is None:
+            slots = self._postings.get(ingredient_id, ())
+            mask = _mask_from_slots(slots, len(self._recipe_ids))
+            if len(slots) >= len(self._recipe_ids) * DENSE_FRACTION:
+                self._masks[ingredient_id] = mask
+        return mask
+
+    def match(self, ingredient_ids, max_missing=2, limit=12):
+        """
+        Rank recipes by how few ingredients they need beyond the pantry.
+
+        Args:
+            ingredient_ids (set): Ingredient ids the user has
+            max_missing (int): Largest number of missing ingredients to
+                report a group for
+            limit (int): Most recipe ids returned per group
+
+        Returns:
+            list: One dict per missing count from 0 to ``max_missing``
+                with ``missing``, ``total`` and ``recipes``, the latter
+                a list of ``(recipe_id, missing ingredient names)``
+        """
+        self._ensure_fresh()
+        with self._lock:
+            matched = []
+            candidates = 0
+            for ingredient_id in ingredient_ids:
+                mask = self._mask(ingredient_id)
+                candidates |= mask
+                _add(matched, mask)
+            missing = _subtract(self._count_planes, matched)
+
+            groups = []
+            for count in range(max_missing + 1):
+                mask = _equal(missing, count, candidates)
+                groups.append({
+                    "missing": count,
+                    "total": mask.bit_count(),
+                    "recipes": [
+                        (
+                            self._recipe_ids[slot],
+                            sorted(
+                                self._labels.get(pk, "")
+                                for pk in self._items[slot] - ingredient_ids
+                            ),
+                        )
+                        for slot in _top_slots(mask, limit)
+                    ],
+                })
+            return groups
+
+    def staple_ids(self):
+        """Ingredient ids assumed to be in every pantry"""
+        staples = getattr(settings, "PANTRY_STAPLES", DEFAULT_STAPLES)
+        return {self._names[name] for name in staples if name in self._names}
+
+
+pantry_index = PantryIndex()
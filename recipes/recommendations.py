@@ -0,0 +1,221 @@
+"""
+Item-to-item recommendations from co-likes
+
+Two recipes are similar when the same people like both. Similarity is
+the cosine of their binary "liked by" vectors:
+
+    sim(a, b) = likers(a & b) / sqrt(likers(a) * likers(b))
+
+The like matrix is sparse, so it is held as adjacency lists (user ->
+recipes, recipe -> users) and only co-liked pairs are ever counted.
+The top neighbours of each recipe are stored in RecipeRecommendation
+so the detail page reads them with a single indexed query.
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from . import page_cache
+from .models import Like, Recipe, RecipeRecommendation, RecommendationRun
+
+# Neighbours stored per recipe
+TOP_N = 6
+
+# Users who like almost everything say little about any pair and cost
+# quadratically in their like count, so they are left out
+MAX_USER_LIKES = 1000
+
+# Ids per IN (...) clause, well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class LikeGraph:
+    """
+    Sparse user/recipe like matrix as two adjacency lists.
+
+    A full graph holds every like. An incremental run instead loads the
+    likes of only the users who liked the recipes it looks at
+    (load_likers_of), which is all that neighbours() and similar() need
+    for those recipes, plus each reachable recipe's total liker count.
+    """
+
+    def __init__(self, max_like_id, full=True):
+        self.max_like_id = max_like_id
+        self.by_user = defaultdict(list)
+        self.by_recipe = defaultdict(list)
+        # Total likers per recipe; None while every like is loaded
+        self.liker_counts = None if full else {}
+        self._loaded_users = set()
+        if full:
+            self._add(self._likes().values_list("user_id", "recipe_id"))
+
+    def _likes(self):
+        return Like.objects.filter(
+            pk__lte=self.max_like_id, recipe__status="published"
+        ).order_by()
+
+    def _add(self, rows):
+        for user_id, recipe_id in rows.iterator(chunk_size=10000):
+            self.by_user[user_id].append(recipe_id)
+            self.by_recipe[recipe_id].append(user_id)
+
+    def load_likers_of(self, recipe_ids):
+        """Load every like of the users who liked any of ``recipe_ids``"""
+        user_ids = set()
+        for chunk in _chunks(recipe_ids):
+            user_ids.update(
+                self._likes()
+                .filter(recipe_id__in=chunk)
+                .values_list("user_id", flat=True)
+            )
+        user_ids -= self._loaded_users
+        for chunk in _chunks(user_ids):
+            self._add(
+                self._likes()
+                .filter(user_id__in=chunk)
+                .values_list("user_id", "recipe_id")
+            )
+        self._loaded_users |= user_ids
+
+        # Recipes reached through those users may have other likers
+        counted = set(self.by_recipe) - self.liker_counts.keys()
+        for chunk in _chunks(counted):
+            self.liker_counts.update(
+                self._likes()
+                .filter(recipe_id__in=chunk)
+                .values("recipe_id")
+                .annotate(total=Count("pk"))
+                .values_list("recipe_id", "total")
+            )
+
+    def liker_count(self, recipe_id):
+        if self.liker_counts is None:
+            return len(self.by_recipe[recipe_id])
+        return self.liker_counts.get(recipe_id, 0)
+
+    def neighbours(self, recipe_id):
+        """Recipes sharing at least one liker with ``recipe_id``"""
+        found = set()
+        for user_id in self.by_recipe.get(recipe_id, ()):
+            found.update(self.by_user[user_id])
+        found.discard(recipe_id)
+        return found
+
+    def similar(self, recipe_id, top_n=TOP_N):
+        """
+        Return the ``top_n`` most similar recipes.
+
+        Returns:
+            list: ``(score, recipe_id)`` pairs, best first
+        """
+        likers = self.by_recipe.get(recipe_id, ())
+        co_likes = Counter()
+        for user_id in likers:
+            liked = self.by_user[user_id]
+            if len(liked) <= MAX_USER_LIKES:
+                co_likes.update(liked)
+        co_likes.pop(recipe_id, None)
+        scored = (
+            (
+                count / math.sqrt(len(likers) * self.liker_count(other)),
+                other,
+            )
+            for other, count in co_likes.items()
+        )
+        return heapq.nlargest(top_n, scored)
+
+
+def compute_recommendations(full=False, top_n=TOP_N):
+    """
+    Refresh stored recommendations.
+
+    An incremental run only recomputes recipes whose scores can have
+    changed since the previous run: those liked since then and every
+    recipe sharing a liker with them. Removed likes and unpublished
+    recipes are only accounted for by a full run.
+
+    Args:
+        full (bool): Recompute every recipe from scratch
+        top_n (int): Neighbours stored per recipe
+
+    Returns:
+        RecommendationRun: The run that was recorded
+    """
+    previous = RecommendationRun.objects.order_by("-pk").first()
+    if previous is None:
+        full = True
+    max_like_id = Like.objects.aggregate(latest=Max("pk"))["latest"] or 0
+    graph = LikeGraph(max_like_id, full=full)
+
+    if full:
+        targets = set(graph.by_recipe)
+    else:
+        liked = set(
+            Like.objects.filter(
+                pk__gt=previous.last_like_id, pk__lte=max_like_id
+            ).values_list("recipe_id", flat=True)
+        )
+        graph.load_likers_of(liked)
+        targets = set(liked)
+        for recipe_id in liked:
+            targets |= graph.neighbours(recipe_id)
+        # similar() needs every liker of each target, with their likes
+        graph.load_likers_of(targets)
+
+    rows = [
+        RecipeRecommendation(
+            recipe_id=recipe_id,
+            recommended_id=other,
+            score=score,
+            position=position,
+        )
+        for recipe_id in targets
+        for position, (score, other) in enumerate(
+            graph.similar(recipe_id, top_n)
+        )
+    ]
+
+    with transaction.atomic():
+        if full:
+            # Recipes that lose all their neighbours need their cached
+            # pages expired too
+            stale = set(
+                RecipeRecommendation.objects.values_list(
+                    "recipe_id", flat=True
+                ).distinct()
+            )
+            RecipeRecommendation.objects.all().delete()
+        else:
+            stale = set()
+            for chunk in _chunks(targets):
+                RecipeRecommendation.objects.filter(
+                    recipe_id__in=chunk
+                ).delete()
+        RecipeRecommendation.objects.bulk_create(rows, batch_size=1000)
+        run = RecommendationRun.objects.create(
+            last_like_id=max_like_id,
+            full=full,
+            recipes_updated=len(targets),
+        )
+
+    # Detail pages embed the list, so expire the cached copies
+    for chunk in _chunks(targets | stale):
+        page_cache.invalidate(
+            *(
+                page_cache.recipe_tag(slug)
+                for slug in Recipe.objects.filter(pk__in=chunk).values_list(
+                    "slug", flat=True
+                )
+            )
+        )
+    return run
@@ -0,0 +1,300 @@
+"""
+Deterministic synthetic data for load tests and benchmarks
+
+ScaleDataGenerator builds users, recipes, likes and comments from a
+seeded random.Random, so the same arguments always produce the same
+dataset (timestamps aside, which are relative to the current time).
+Likes and comments per recipe follow a Pareto (power-law) distribution
+and users are picked with Zipf-like weights, so a few recipes and a few
+users account for most of the activity, as in production. Every table
+is written with bulk_create in batches.
+"""
+
+import contextlib
+import datetime
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Category, Comment, Country, Like, Recipe
+from .signals import recipes_bulk_created
+from .slugs import SlugAllocator
+from .trending import rebuild_scores
+
+USERNAME_PREFIX = "scaleuser"
+PASSWORD = "scale-password"
+
+# Pareto shape: lower means a heavier tail (more viral recipes)
+POPULARITY_SHAPE = 1.2
+# Share of generated comments left unapproved
+UNAPPROVED_RATE = 0.05
+
+CATEGORIES = ["Breakfast", "Lunch", "Dinner", "Dessert", "Snack", "Drinks"]
+COUNTRIES = [
+    "Italian", "Mexican", "Indian", "Chinese", "French", "Japanese",
+    "Thai", "Greek", "Spanish", "American",
+]
+ADJECTIVES = [
+    "Classic", "Spicy", "Creamy", "Smoky", "Crispy", "Easy", "Rustic",
+    "Zesty", "Hearty", "Sweet", "Garlicky", "Roasted", "Quick", "Herby",
+]
+DISHES = [
+    "Pasta", "Curry", "Tacos", "Stir Fry", "Soup", "Salad", "Risotto",
+    "Pancakes", "Burger", "Stew", "Noodles", "Pie", "Omelette", "Bake",
+    "Dumplings", "Flatbread", "Chili", "Tart", "Casserole", "Skewers",
+]
+INGREDIENTS = [
+    ("g", "spaghetti"), ("g", "rice"), ("", "eggs"), ("g", "flour"),
+    ("g", "butter"), ("ml", "milk"), ("tbsp", "olive oil"),
+    ("cloves", "garlic"), ("", "onions"), ("g", "tomatoes"),
+    ("g", "chicken breast"), ("g", "beef mince"), ("g", "tofu"),
+    ("tsp", "cumin"), ("tsp", "paprika"), ("g", "parmesan"),
+    ("ml", "coconut milk"), ("tbsp", "soy sauce"), ("g", "spinach"),
+    ("", "lemons"), ("g", "sugar"), ("g", "mushrooms"), ("g", "potatoes"),
+    ("", "carrots"), ("g", "chickpeas"), ("tbsp", "honey"),
+    ("g", "cheddar"), ("", "bell peppers"), ("tsp", "chilli flakes"),
+    ("g", "prawns"),
+]
+COMMENTS = [
+    "Made this tonight, delicious!", "Family loved it.",
+    "A bit too salty for me.", "Will definitely make again.",
+    "Great weeknight recipe.", "I added extra garlic.",
+    "Easy to follow, thanks!", "Took longer than stated.",
+]
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the created_at values set on instances instead
+    of stamping every row with the current time.
+    """
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def zipf_cum_weights(count, exponent=1.0):
+    """Cumulative weights giving item ``i`` weight ``1 / (i + 1)**s``"""
+    return list(
+        itertools.accumulate(
+            1.0 / (index + 1) ** exponent for index in range(count)
+        )
+    )
+
+
+class ScaleDataGenerator:
+    """
+    Generate a reproducible dataset.
+
+    Args:
+        recipes (int): Number of recipes
+        users (int): Number of users
+        likes_per_recipe (float): Mean likes per recipe
+        comments_per_recipe (float): Mean comments per recipe
+        days (int): Recipes are spread over this many days up to now
+        seed (int): Random seed
+        batch_size (int): Recipes written per transaction
+        log (callable): Receives progress messages
+    """
+
+    def __init__(
+        self,
+        recipes,
+        users,
+        likes_per_recipe=20.0,
+        comments_per_recipe=3.0,
+        days=365,
+        seed=42,
+        batch_size=2000,
+        log=None,
+    ):
+        self.recipe_total = recipes
+        self.user_total = max(users, 1)
+        self.likes_per_recipe = likes_per_recipe
+        self.comments_per_recipe = comments_per_recipe
+        self.days = days
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.rng = random.Random(seed)
+        self.now = timezone.now()
+        self.slugs = SlugAllocator(Recipe)
+
+    def heavy_tailed(self, mean, limit):
+        """A Pareto-distributed count with the given mean"""
+        excess = self.rng.paretovariate(POPULARITY_SHAPE) - 1
+        return min(int(excess * (POPULARITY_SHAPE - 1) * mean), limit)
+
+    def run(self):
+        """Write the dataset; returns a dict of row counts"""
+        if User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).exists():
+            raise ValueError(
+                "Scale data already exists; use a fresh database"
+            )
+        categories = [
+            Category.objects.get_or_create(name=name)[0].pk
+            for name in CATEGORIES
+        ]
+        countries = [
+            Country.objects.get_or_create(name=name)[0].pk
+            for name in COUNTRIES
+        ]
+        user_ids = self.create_users()
+        # Shuffle so the most active users are not simply the oldest
+        activity = user_ids[:]
+        self.rng.shuffle(activity)
+        self.user_cum_weights = zipf_cum_weights(len(activity))
+        self.active_users = activity
+
+        counts = {"users": len(user_ids), "recipes": 0, "likes": 0,
+                  "comments": 0}
+        start = self.now - datetime.timedelta(days=self.days)
+        step = (self.now - start) / max(self.recipe_total, 1)
+        for offset in range(0, self.recipe_total, self.batch_size):
+            size = min(self.batch_size, self.recipe_total - offset)
+            with transaction.atomic(), explicit_timestamps(
+                Recipe, Like, Comment
+            ):
+                batch = self.create_recipes(
+                    offset, size, start, step, user_ids, categories,
+                    countries,
+                )
+                counts["recipes"] += len(batch)
+                counts["likes"] += self.create_likes(batch)
+                counts["comments"] += self.create_comments(batch)
+                recipes_bulk_created(batch)
+            self.log(
+                f"{counts['recipes']} recipes, {counts['likes']} likes, "
+                f"{counts['comments']} comments"
+            )
+        rebuild_scores()
+        return counts
+
+    def create_users(self):
+        # Hashing is deliberately slow, so every user shares one hash
+        password = make_password(PASSWORD)
+        users = [
+            User(
+                username=f"{USERNAME_PREFIX}{index:07d}",
+                email=f"{USERNAME_PREFIX}{index:07d}@example.com",
+                password=password,
+            )
+            for index in range(self.user_total)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by("username")
+            .values_list("pk", flat=True)
+        )
+
+    def pick_users(self, count):
+        """Up to ``count`` distinct users, favouring the most active"""
+        return set(
+            self.rng.choices(
+                self.active_users, cum_weights=self.user_cum_weights,
+                k=count,
+            )
+        )
+
+    def quantity(self, unit):
+        if unit in ("g", "ml"):
+            return str(self.rng.randint(1, 8) * 50)
+        return str(self.rng.randint(1, 4))
+
+    def create_recipes(
+        self, offset, size, start, step, user_ids, categories, countries
+    ):
+        rng = self.rng
+        recipes = []
+        for index in range(offset, offset + size):
+            title = f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}"
+            lines = [
+                " ".join(filter(None, [self.quantity(unit), unit, name]))
+                for unit, name in rng.sample(INGREDIENTS, rng.randint(4, 10))
+            ]
+            recipe = Recipe(
+                title=title,
+                description=f"A {title.lower()} for every day.",
+                ingredients="\n".join(lines),
+                instructions="1. Prep the ingredients.\n2. Cook.\n3. Serve.",
+                prep_time=rng.randint(5, 60),
+                cook_time=rng.randint(0, 120),
+                servings=rng.randint(1, 8),
+                difficulty=rng.choice(["easy", "medium", "hard"]),
+                status="published" if rng.random() < 0.95 else "draft",
+                author_id=rng.choice(user_ids),
+                category_id=rng.choice(categories),
+                country_id=rng.choice(countries),
+                created_at=start + step * index,
+            )
+            recipe._likers = self.pick_users(
+                self.heavy_tailed(self.likes_per_recipe, self.user_total)
+            )
+            recipe._commenters = [
+                rng.choice(self.active_users)
+                for _ in range(
+                    self.heavy_tailed(self.comments_per_recipe, 1000)
+                )
+            ]
+            recipe._approved = [
+                rng.random() >= UNAPPROVED_RATE for _ in recipe._commenters
+            ]
+            # Counters are known up front, so no recount is needed
+            recipe.like_count = len(recipe._likers)
+            recipe.comment_count = sum(recipe._approved)
+            recipes.append(recipe)
+        for recipe, slug in zip(
+            recipes, self.slugs.allocate(recipe.title for recipe in recipes)
+        ):
+            recipe.slug = slug
+        Recipe.objects.bulk_create(recipes)
+        return recipes
+
+    def activity_time(self, recipe):
+        """A moment between a recipe's creation and now"""
+        span = (self.now - recipe.created_at).total_seconds()
+        return recipe.created_at + datetime.timedelta(
+            seconds=self.rng.random() * span
+        )
+
+    def create_likes(self, recipes):
+        likes = [
+            Like(
+                recipe_id=recipe.pk,
+                user_id=user_id,
+                created_at=self.activity_time(recipe),
+            )
+            for recipe in recipes
+            for user_id in sorted(recipe._likers)
+        ]
+        Like.objects.bulk_create(likes, batch_size=self.batch_size)
+        return len(likes)
+
+    def create_comments(self, recipes):
+        comments = [
+            Comment(
+                recipe_id=recipe.pk,
+                user_id=user_id,
+                content=self.rng.choice(COMMENTS),
+                approved=approved,
+                created_at=self.activity_time(recipe),
+            )
+            for recipe in recipes
+            for user_id, approved in zip(
+                recipe._commenters, recipe._approved
+            )
+        ]
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        return len(comments)
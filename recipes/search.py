@@ -0,0 +1,196 @@
+"""
+Full-text search backends for recipes
+
+The backend is picked from the database vendor unless the
+RECIPE_SEARCH_BACKEND setting names one explicitly:
+
+- SQLite uses an FTS5 table ranked with bm25()
+- PostgreSQL uses a generated, GIN-indexed tsvector column ranked with
+  ts_rank_cd()
+- Anything else falls back to unranked substring matching
+"""
+
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "recipes_recipe_fts"
+
+# Relative column weights; the title counts most
+TITLE_WEIGHT = 10.0
+INGREDIENTS_WEIGHT = 4.0
+DESCRIPTION_WEIGHT = 2.0
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query):
+    """Split a user query into lowercase word tokens"""
+    return TOKEN_RE.findall(query.lower())
+
+
+class SimpleSearchBackend:
+    """Unranked substring search, used when no index is available"""
+
+    def search(self, queryset, query):
+        """
+        Filter ``queryset`` down to recipes matching ``query``.
+
+        Args:
+            queryset (QuerySet): Recipe queryset to search within
+            query (str): Raw user search string
+
+        Returns:
+            QuerySet: Matching recipes annotated with ``search_rank``
+                and ordered best match first
+        """
+        if not query.strip():
+            return queryset.none()
+        return (
+            queryset.filter(
+                Q(title__icontains=query)
+                | Q(ingredients__icontains=query)
+                | Q(description__icontains=query)
+            )
+            .annotate(search_rank=Value(0.0, output_field=FloatField()))
+            .order_by("-created_at", "-id")
+        )
+
+    def index(self, recipe_ids):
+        """Refresh the index entries for the given recipe ids"""
+
+    def remove(self, recipe_ids):
+        """Drop the index entries for the given recipe ids"""
+
+    def rebuild(self):
+        """Re-index every recipe from scratch"""
+
+
+class SQLiteSearchBackend(SimpleSearchBackend):
+    """SQLite FTS5 search ranked with bm25()"""
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        # Quote every token so FTS5 operators in user input are inert,
+        # and prefix-match so "tomato" also finds "tomatoes"
+        match = " ".join(f'"{token}"*' for token in tokens)
+        # bm25() is lower-is-better, flip it so higher ranks first
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, %s, %s, %s) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s "
+            f"AND {FTS_TABLE}.rowid = recipes_recipe.id",
+            (TITLE_WEIGHT, DESCRIPTION_WEIGHT, INGREDIENTS_WEIGHT, match),
+            output_field=FloatField(),
+        )
+        return (
+            queryset.filter(
+                id__in=RawSQL(
+                    f"SELECT rowid FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s",
+                    (match,),
+                )
+            )
+            .annotate(search_rank=rank)
+            .order_by("-search_rank", "-id")
+        )
+
+    def index(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        self.remove(recipe_ids)
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} "
+                "(rowid, title, description, ingredients) "
+                "SELECT id, title, description, ingredients "
+                f"FROM recipes_recipe WHERE id IN ({placeholders})",
+                recipe_ids,
+            )
+
+    def remove(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+                recipe_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} "
+                "(rowid, title, description, ingredients) "
+                "SELECT id, title, description, ingredients "
+                "FROM recipes_recipe"
+            )
+
+
+class PostgresSearchBackend(SimpleSearchBackend):
+    """
+    PostgreSQL search over the generated ``search_vector`` column.
+
+    The column is computed by the database on every write, so the
+    index hooks have nothing to do.
+    """
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        # ts_rank_cd weight order is {D, C, B, A}; normalization 1
+        # divides by document length like BM25's length penalty
+        rank = RawSQL(
+            "ts_rank_cd(%s::float4[], recipes_recipe.search_vector, "
+            "to_tsquery('english', %s), 1)",
+            (
+                [0.0, DESCRIPTION_WEIGHT / TITLE_WEIGHT,
+                 INGREDIENTS_WEIGHT / TITLE_WEIGHT, 1.0],
+                tsquery,
+            ),
+            output_field=FloatField(),
+        )
+        return (
+            queryset.filter(
+                id__in=RawSQL(
+                    "SELECT id FROM recipes_recipe "
+                    "WHERE search_vector @@ to_tsquery('english', %s)",
+                    (tsquery,),
+                )
+            )
+            .annotate(search_rank=rank)
+            .order_by("-search_rank", "-id")
+        )
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """Return the search backend for the default database"""
+    backend_path = getattr(settings, "RECIPE_SEARCH_BACKEND", None)
+    if backend_path:
+        return import_string(backend_path)()
+    return BACKENDS.get(connection.vendor, SimpleSearchBackend)()
+
+
+def search_recipes(queryset, query):
+    """Search ``queryset`` with the configured backend"""
+    return get_search_backend().search(queryset, query)
@@ -0,0 +1,315 @@
+"""
+Signal handlers for recipes app
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from .models import Category, Country, Recipe, Comment, Like, TrendingScore
+from . import page_cache, trending
+from .ingredients import sync_recipe_ingredients
+from .navigation import navigation
+from .pantry import pantry_index
+from .search import get_search_backend
+
+
+def adjust_counters(recipe_id, **deltas):
+    """
+    Atomically add deltas to a recipe's denormalized counters and bump
+    its version so cached renderings are refreshed.
+
+    Args:
+        recipe_id (int): Primary key of the recipe to update
+        **deltas: Counter field names mapped to the amount to add,
+            e.g. ``like_count=1``
+    """
+    Recipe.objects.filter(pk=recipe_id).update(
+        version=F("version") + 1,
+        **{field: F(field) + delta for field, delta in deltas.items()},
+    )
+
+
+def count_of(queryset):
+    """Correlated COUNT of ``queryset`` rows per outer recipe"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(recipe=OuterRef("pk"))
+            .values("recipe")
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def bump_recipe_versions(**filters):
+    """Bump the version of every recipe matching ``filters``"""
+    Recipe.objects.filter(**filters).update(version=F("version") + 1)
+
+
+def invalidate_pages_on_commit(*tags):
+    """Expire cached pages once the current transaction commits"""
+    if tags:
+        transaction.on_commit(lambda: page_cache.invalidate(*tags))
+
+
+def update_pantry_on_commit(recipe_id):
+    """Re-read a recipe into this process's pantry index after commit"""
+    transaction.on_commit(lambda: pantry_index.update([recipe_id]))
+
+
+def recipe_page_tags(recipe_id, include_lists=False):
+    """
+    Page cache tags for the detail page of a recipe and, optionally,
+    the listings its card appears on.
+    """
+    row = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values_list("slug", "category__slug", "country__slug", "author_id")
+        .first()
+    )
+    if row is None:
+        return []
+    slug, category_slug, country_slug, author_id = row
+    tags = [page_cache.recipe_tag(slug)]
+    if include_lists:
+        tags += [
+            page_cache.LIST_TAG,
+            page_cache.TRENDING_TAG,
+            page_cache.author_tag(author_id),
+        ]
+        if category_slug:
+            tags.append(page_cache.category_tag(category_slug))
+        if country_slug:
+            tags.append(page_cache.country_tag(country_slug))
+    return tags
+
+
+def recipe_listing_tags(instance):
+    """
+    Page cache tags for every page showing ``instance``, before and
+    after its latest save.
+    """
+    loaded = getattr(instance, "_loaded_values", {})
+    slugs = {instance.slug, loaded.get("slug")}
+    category_ids = {instance.category_id, loaded.get("category_id")}
+    country_ids = {instance.country_id, loaded.get("country_id")}
+    author_ids = {instance.author_id, loaded.get("author_id")}
+    tags = [page_cache.LIST_TAG, page_cache.TRENDING_TAG]
+    tags += [page_cache.recipe_tag(slug) for slug in slugs if slug]
+    tags += [page_cache.author_tag(pk) for pk in author_ids if pk]
+    tags += [
+        page_cache.category_tag(slug)
+        for slug in _related_slugs(instance, "category", category_ids)
+    ]
+    tags += [
+        page_cache.country_tag(slug)
+        for slug in _related_slugs(instance, "country", country_ids)
+    ]
+    return tags
+
+
+def _related_slugs(instance, field_name, ids):
+    """
+    Slugs of the categories or countries with ``ids``, taking the one
+    already loaded on ``instance`` (by a form or select_related) from
+    there instead of the database.
+    """
+    field = Recipe._meta.get_field(field_name)
+    ids = {pk for pk in ids if pk}
+    slugs = []
+    if field.is_cached(instance):
+        related = getattr(instance, field_name)
+        if related is not None and related.pk in ids:
+            slugs.append(related.slug)
+            ids.discard(related.pk)
+    if ids:
+        slugs += field.related_model.objects.filter(pk__in=ids).values_list(
+            "slug", flat=True
+        )
+    return slugs
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """
+    Refresh the recipe's search index entry, parsed ingredients,
+    trending row and cached pages
+    """
+    get_search_backend().index([instance.pk])
+    loaded = getattr(instance, "_loaded_values", {})
+    if created or loaded.get("ingredients") != instance.ingredients:
+        sync_recipe_ingredients([instance])
+    trending.sync_recipe(instance, created)
+    update_pantry_on_commit(instance.pk)
+    invalidate_pages_on_commit(*recipe_listing_tags(instance))
+
+
+def recipes_bulk_created(recipes):
+    """
+    Do for recipes inserted with bulk_create what ``recipe_saved``
+    does for a single save, in a handful of batched statements.
+
+    Args:
+        recipes (list): Newly inserted Recipe instances with their pks
+    """
+    recipe_ids = [recipe.pk for recipe in recipes]
+    get_search_backend().index(recipe_ids)
+    sync_recipe_ingredients(recipes)
+    TrendingScore.objects.bulk_create(
+        [
+            TrendingScore(
+                recipe_id=recipe.pk,
+                published=recipe.status == "published",
+                category_id=recipe.category_id,
+                country_id=recipe.country_id,
+            )
+            for recipe in recipes
+        ]
+    )
+    transaction.on_commit(lambda: pantry_index.update(recipe_ids))
+    tags = {page_cache.LIST_TAG, page_cache.TRENDING_TAG}
+    tags.update(page_cache.author_tag(recipe.author_id) for recipe in recipes)
+    tags.update(
+        page_cache.category_tag(slug)
+        for slug in Category.objects.filter(
+            pk__in={recipe.category_id for recipe in recipes}
+        ).values_list("slug", flat=True)
+    )
+    tags.update(
+        page_cache.country_tag(slug)
+        for slug in Country.objects.filter(
+            pk__in={recipe.country_id for recipe in recipes}
+        ).values_list("slug", flat=True)
+    )
+    invalidate_pages_on_commit(*tags)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Drop the recipe's search index entry and cached pages"""
+    get_search_backend().remove([instance.pk])
+    update_pantry_on_commit(instance.pk)
+    invalidate_pages_on_commit(*recipe_listing_tags(instance))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Country)
+def classification_saved(sender, instance, created, **kwargs):
+    """Refresh cards showing a renamed category or country"""
+    if not created:
+        field = "category" if sender is Category else "country"
+        bump_recipe_versions(**{field: instance})
+    transaction.on_commit(navigation.invalidate)
+    invalidate_pages_on_commit(page_cache.NAV_TAG)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields, **kwargs):
+    """
+    Refresh cards and pages showing the author's username. Saves that
+    can't change it, such as the last_login update, are skipped.
+    """
+    if created or (update_fields and "username" not in update_fields):
+        return
+    bump_recipe_versions(author=instance)
+    invalidate_pages_on_commit(
+        page_cache.LIST_TAG,
+        page_cache.TRENDING_TAG,
+        page_cache.author_tag(instance.pk),
+    )
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Country)
+def classification_deleted(sender, instance, **kwargs):
+    """Refresh cards whose category or country is about to be unset"""
+    field = "category" if sender is Category else "country"
+    bump_recipe_versions(**{field: instance})
+    transaction.on_commit(navigation.invalidate)
+    invalidate_pages_on_commit(page_cache.NAV_TAG)
+
+
+def like_recorded(recipe_id, created_at, sign=1):
+    """
+    Update a recipe's trending score and cached pages for a like added
+    (or with ``sign=-1`` removed). Its like_count is adjusted by the
+    caller, which may want the new value back.
+    """
+    trending.record_event(recipe_id, trending.LIKE_WEIGHT, created_at, sign)
+    invalidate_pages_on_commit(
+        *recipe_page_tags(recipe_id, include_lists=True)
+    )
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    """Count a new like"""
+    if created:
+        adjust_counters(instance.recipe_id, like_count=1)
+        like_recorded(instance.recipe_id, instance.created_at)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    """Uncount a removed like"""
+    adjust_counters(instance.recipe_id, like_count=-1)
+    like_recorded(instance.recipe_id, instance.created_at, sign=-1)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_approval(sender, instance, **kwargs):
+    """Remember the stored approval state so post_save can diff it"""
+    instance._was_approved = None
+    if instance.pk:
+        instance._was_approved = (
+            Comment.objects.filter(pk=instance.pk)
+            .values_list("approved", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Count new approved comments and approval changes"""
+    was_approved = getattr(instance, "_was_approved", None)
+    delta = 0
+    if created or was_approved is None:
+        if instance.approved:
+            delta = 1
+    elif was_approved != instance.approved:
+        delta = 1 if instance.approved else -1
+    if delta:
+        adjust_counters(instance.recipe_id, comment_count=delta)
+        trending.record_event(
+            instance.recipe_id,
+            trending.COMMENT_WEIGHT,
+            instance.created_at,
+            sign=delta,
+        )
+        invalidate_pages_on_commit(page_cache.TRENDING_TAG)
+    invalidate_pages_on_commit(*recipe_page_tags(instance.recipe_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Uncount a removed approved comment"""
+    if instance.approved:
+        adjust_counters(instance.recipe_id, comment_count=-1)
+        trending.record_event(
+            instance.recipe_id,
+            trending.COMMENT_WEIGHT,
+            instance.created_at,
+            sign=-1,
+        )
+        invalidate_pages_on_commit(page_cache.TRENDING_TAG)
+    invalidate_pages_on_commit(*recipe_page_tags(instance.recipe_id))
@@ -0,0 +1,363 @@
+"""
+Precomputed sitemaps and recipe feeds
+
+Building sitemap.xml or a feed from every published recipe on each
+crawler hit would be expensive, so build_sitemaps writes them to the
+"sitemaps" storage (settings.STORAGES) as gzipped files, and the views
+here only read those files back: serving costs no SQL at all.
+
+Recipes are split into sitemap sections by primary key range,
+SITEMAP_CHUNK_SIZE ids each, so a section never exceeds the 50,000 URL
+limit and a recipe always stays in the same section. One aggregate
+query gives each section's fingerprint (count, id sum and latest
+update); a build rewrites only the sections whose fingerprint moved,
+and the index, the pages section and the feeds only when their content
+changed. Fingerprints are kept in manifest.json next to the files.
+
+Files are gzipped with a fixed mtime, so unchanged content gives
+identical bytes. They are sent as stored to clients accepting gzip
+(and decompressed for the rest), with a weak ETag of their content and
+public caching for a day (an hour for the feeds).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, storages
+from django.db.models import Count, F, Max, Sum
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from xml.sax.saxutils import escape
+
+from .models import Category, Country, Recipe
+from .views import published_recipes
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+INDEX = "sitemap.xml.gz"
+MANIFEST = "manifest.json"
+FEED_SIZE = 50
+# Feed name -> (generator class, content type)
+FEEDS = {
+    "rss": (Rss201rev2Feed, "application/rss+xml; charset=utf-8"),
+    "atom": (Atom1Feed, "application/atom+xml; charset=utf-8"),
+}
+SITEMAP_MAX_AGE = 24 * 60 * 60
+FEED_MAX_AGE = 60 * 60
+SECTION_RE = re.compile(r"pages|recipes-\d+")
+ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b")
+
+
+def sitemap_storage():
+    return storages["sitemaps"]
+
+
+def chunk_size():
+    return getattr(settings, "SITEMAP_CHUNK_SIZE", 50000)
+
+
+def recipe_section(recipe_id):
+    """Name of the sitemap section listing ``recipe_id``"""
+    return f"recipes-{(recipe_id - 1) // chunk_size()}"
+
+
+def section_file(section):
+    return f"sitemap-{section}.xml.gz"
+
+
+def feed_file(feed_format):
+    return f"latest.{feed_format}.gz"
+
+
+def absolute(path):
+    return settings.SITE_URL.rstrip("/") + path
+
+
+def render_urlset(entries):
+    """A <urlset> of ``(path, lastmod)`` pairs, lastmod optional"""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        f'<urlset xmlns="{SITEMAP_NS}">\n',
+    ]
+    for path, lastmod in entries:
+        parts.append(f"<url><loc>{escape(absolute(path))}</loc>")
+        if lastmod is not None:
+            parts.append(
+                f"<lastmod>{lastmod.isoformat(timespec='seconds')}</lastmod>"
+            )
+        parts.append("</url>\n")
+    parts.append("</urlset>\n")
+    return "".join(parts).encode()
+
+
+def render_index(sections):
+    """A <sitemapindex> of ``(section, lastmod)`` pairs"""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        f'<sitemapindex xmlns="{SITEMAP_NS}">\n',
+    ]
+    for section, lastmod in sections:
+        path = reverse("sitemap_section", kwargs={"section": section})
+        parts.append(f"<sitemap><loc>{escape(absolute(path))}</loc>")
+        if lastmod is not None:
+            parts.append(
+                f"<lastmod>{lastmod.isoformat(timespec='seconds')}</lastmod>"
+            )
+        parts.append("</sitemap>\n")
+    parts.append("</sitemapindex>\n")
+    return "".join(parts).encode()
+
+
+def render_pages():
+    """The pages section: listings, categories and cuisines"""
+    paths = [reverse("home"), reverse("recipe_list"), reverse("trending")]
+    for model in (Category, Country):
+        paths.extend(
+            item.get_absolute_url()
+            for item in model.objects.only("slug").order_by("slug")
+        )
+    return render_urlset((path, None) for path in paths)
+
+
+def render_recipe_section(number):
+    """The section of published recipes with ids in chunk ``number``"""
+    size = chunk_size()
+    rows = (
+        Recipe.objects.filter(
+            status="published",
+            pk__gt=number * size,
+            pk__lte=(number + 1) * size,
+        )
+        .order_by("pk")
+        .values_list("slug", "updated_at")
+        .iterator(chunk_size=2000)
+    )
+    # One reverse() for the whole section instead of one per recipe
+    template = reverse("recipe_detail", kwargs={"slug": "__slug__"})
+    return render_urlset(
+        (template.replace("__slug__", slug), updated_at)
+        for slug, updated_at in rows
+    )
+
+
+def recipe_sections():
+    """
+    Current state of each recipe section.
+
+    Returns:
+        dict: section name -> (fingerprint, latest update)
+    """
+    rows = (
+        Recipe.objects.filter(status="published")
+        .annotate(section=(F("pk") - 1) / chunk_size())
+        .values("section")
+        .annotate(count=Count("pk"), ids=Sum("pk"), latest=Max("updated_at"))
+        .order_by("section")
+    )
+    return {
+        f"recipes-{row['section']}": (
+            f"{row['count']}:{row['ids']}:{row['latest'].isoformat()}",
+            row["latest"],
+        )
+        for row in rows
+    }
+
+
+def render_feeds():
+    """The latest recipes as RSS and Atom documents, by feed format"""
+    recipes = list(
+        published_recipes().select_related("author", "category")[:FEED_SIZE]
+    )
+    documents = {}
+    for feed_format, (generator, _) in FEEDS.items():
+        feed = generator(
+            title="Recipe Share: latest recipes",
+            link=absolute(reverse("recipe_list")),
+            description="The newest recipes shared on Recipe Share",
+            language=settings.LANGUAGE_CODE,
+            feed_url=absolute(
+                reverse("recipe_feed", kwargs={"feed_format": feed_format})
+            ),
+        )
+        for recipe in recipes:
+            link = absolute(recipe.get_absolute_url())
+            feed.add_item(
+                title=recipe.title,
+                link=link,
+                description=recipe.description,
+                unique_id=link,
+                author_name=recipe.author.username,
+                pubdate=recipe.created_at,
+                updateddate=recipe.updated_at,
+                categories=[recipe.category.name] if recipe.category else (),
+            )
+        documents[feed_format] = feed.writeString("utf-8").encode()
+    return documents
+
+
+def digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_manifest(storage):
+    if not storage.exists(MANIFEST):
+        return {}
+    with storage.open(MANIFEST) as manifest:
+        return json.loads(manifest.read())
+
+
+def temporary_name(name):
+    return f"{name}.tmp"
+
+
+def save(storage, name, data):
+    """
+    Replace ``name`` in ``storage`` with ``data``, never leaving a
+    window where a request finds no file.
+
+    Storages that overwrite on save (e.g. S3 with file_overwrite) are
+    written in place, and local ones get a temporary file renamed over
+    the old one. Others, such as Cloudinary or the in-memory storage
+    used in tests, can't replace a file without deleting it first, so
+    a complete copy is saved under ``<name>.tmp`` beforehand and serve()
+    falls back to it while ``name`` is missing. A failed save leaves
+    the old file or the copy in place.
+    """
+    if storage.exists(name) and storage.get_available_name(name) == name:
+        storage.save(name, ContentFile(data))
+        return
+    if isinstance(storage, FileSystemStorage):
+        path = storage.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=".")
+        try:
+            with os.fdopen(descriptor, "wb") as stored:
+                stored.write(data)
+            if storage.file_permissions_mode is not None:
+                os.chmod(temporary, storage.file_permissions_mode)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return
+    temporary = temporary_name(name)
+    if storage.exists(temporary):
+        storage.delete(temporary)
+    temporary = storage.save(temporary, ContentFile(data))
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+    storage.delete(temporary)
+
+
+def build_sitemaps(force=False):
+    """
+    Bring the stored sitemaps and feeds up to date.
+
+    Args:
+        force (bool): Rewrite every file, changed or not
+
+    Returns:
+        dict: Names of the files "written" and "removed"
+    """
+    storage = sitemap_storage()
+    manifest = {} if force else read_manifest(storage)
+    result = {"written": [], "removed": []}
+
+    def publish(name, fingerprint, render):
+        if manifest.get(name) == fingerprint and storage.exists(name):
+            return
+        save(storage, name, gzip.compress(render(), mtime=0))
+        manifest[name] = fingerprint
+        result["written"].append(name)
+
+    sections = recipe_sections()
+    for section, (fingerprint, _) in sections.items():
+        number = int(section.split("-")[1])
+        publish(
+            section_file(section),
+            fingerprint,
+            lambda: render_recipe_section(number),
+        )
+    current = {section_file(section) for section in sections}
+    for name in sorted(manifest):
+        if name.startswith("sitemap-recipes-") and name not in current:
+            if storage.exists(name):
+                storage.delete(name)
+            del manifest[name]
+            result["removed"].append(name)
+
+    # Small enough to render every time; written only when they differ
+    pages = render_pages()
+    publish(section_file("pages"), digest(pages), lambda: pages)
+    for feed_format, document in render_feeds().items():
+        publish(feed_file(feed_format), digest(document), lambda: document)
+    index = render_index(
+        [("pages", None)]
+        + [(section, latest) for section, (_, latest) in sections.items()]
+    )
+    publish(INDEX, digest(index), lambda: index)
+
+    if result["written"] or result["removed"]:
+        save(storage, MANIFEST, json.dumps(manifest, sort_keys=True).encode())
+    return result
+
+
+def serve(request, name, content_type, max_age):
+    """Send a stored gzipped file, answering conditional GETs"""
+    storage = sitemap_storage()
+    if not storage.exists(name):
+        # Mid-swap in save(): the new copy is complete
+        name = temporary_name(name)
+        if not storage.exists(name):
+            raise Http404
+    with storage.open(name) as stored:
+        data = stored.read()
+    # Weak, since the gzipped and plain bodies are the same document
+    etag = f'W/"{digest(data)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        accept = request.headers.get("Accept-Encoding", "")
+        if ACCEPTS_GZIP_RE.search(accept):
+            response = HttpResponse(data, content_type=content_type)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(
+                gzip.decompress(data), content_type=content_type
+            )
+        response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=max_age)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def sitemap_index(request):
+    return serve(request, INDEX, "application/xml", SITEMAP_MAX_AGE)
+
+
+def sitemap_section(request, section):
+    if not SECTION_RE.fullmatch(section):
+        raise Http404
+    return serve(
+        request, section_file(section), "application/xml", SITEMAP_MAX_AGE
+    )
+
+
+def recipe_feed(request, feed_format):
+    if feed_format not in FEEDS:
+        raise Http404
+    return serve(
+        request, feed_file(feed_format), FEEDS[feed_format][1], FEED_MAX_AGE
+    )
@@ -0,0 +1,163 @@
+"""
+Unique slugs for Recipe, Category and Country
+
+Duplicate names get numbered slugs: "chocolate-cake", "chocolate-cake-2",
+"chocolate-cake-3"... The next free number for a base slug is found
+with a single query that reads the base and its "-<n>" variants as one
+range scan on the unique slug index, instead of probing candidates with
+one exists() query each. SlugAllocator does the same for thousands of
+bases at a time, with one query per chunk of bases.
+
+Two concurrent creators can still pick the same number. The loser's
+insert fails inside a savepoint, re-reads the numbering once, and then
+falls back to a random suffix, so a burst of identical titles costs each
+creator at most a few queries rather than a retry loop.
+"""
+
+from string import ascii_lowercase
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.crypto import get_random_string
+from django.utils.text import slugify
+
+# Room kept at the end of a slug for a "-<n>" suffix
+SUFFIX_ROOM = 10
+# Bases per lookup query; each binds three parameters, which keeps the
+# query under SQLite's default limit of 999
+LOOKUP_CHUNK = 300
+# Inserts tried with a numbered slug before a random suffix is used
+SLUG_ATTEMPTS = 2
+
+
+def chunked(values, size=LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def base_slug(model, text, field="slug"):
+    """Slugify ``text`` to fit ``field`` with room for a suffix"""
+    max_length = model._meta.get_field(field).max_length
+    fallback = model._meta.model_name
+    return slugify(text)[:max_length - SUFFIX_ROOM].strip("-") or fallback
+
+
+def next_suffixes(model, bases, field="slug"):
+    """
+    Find the first free number for each base slug.
+
+    Args:
+        model: Model class whose ``field`` holds unique slugs
+        bases (iterable): Base slugs
+        field (str): Slug field name
+
+    Returns:
+        dict: base -> 1 if the base itself is free, otherwise the number
+            after the highest "-<n>" variant in use
+    """
+    suffixes = {}
+    for chunk in chunked(set(bases)):
+        condition = Q()
+        for base in chunk:
+            condition |= Q(**{field: base}) | Q(
+                **{f"{field}__gt": f"{base}-", f"{field}__lt": f"{base}."}
+            )
+        taken = set()
+        highest = {}
+        for slug in (
+            model._base_manager.filter(condition)
+            .order_by()
+            .values_list(field, flat=True)
+        ):
+            taken.add(slug)
+            base, _, suffix = slug.rpartition("-")
+            if suffix.isdigit():
+                highest[base] = max(highest.get(base, 1), int(suffix))
+        for base in chunk:
+            if base in highest:
+                suffixes[base] = highest[base] + 1
+            else:
+                suffixes[base] = 2 if base in taken else 1
+    return suffixes
+
+
+def numbered(base, suffix):
+    return base if suffix == 1 else f"{base}-{suffix}"
+
+
+def save_with_unique_slug(instance, text, save, field="slug"):
+    """
+    Give ``instance`` a free slug derived from ``text`` and save it.
+
+    ``save`` performs the actual save. It runs in a savepoint, so a
+    slug taken by a concurrent creator rolls back cleanly and is
+    replaced: first by re-reading the numbering, then by a random
+    suffix, which cannot realistically collide.
+    """
+    model = type(instance)
+    base = base_slug(model, text, field)
+    for attempt in range(SLUG_ATTEMPTS + 1):
+        if attempt < SLUG_ATTEMPTS:
+            slug = numbered(base, next_suffixes(model, [base], field)[base])
+        else:
+            slug = f"{base}-{get_random_string(6, ascii_lowercase)}"
+        setattr(instance, field, slug)
+        try:
+            with transaction.atomic(using=instance._state.db):
+                save()
+            return
+        except IntegrityError:
+            clash = model._base_manager.filter(**{field: slug})
+            if instance.pk is not None:
+                clash = clash.exclude(pk=instance.pk)
+            if attempt == SLUG_ATTEMPTS or not clash.exists():
+                raise
+
+
+class SlugAllocator:
+    """
+    Hands out unique slugs for whole batches of names at a time.
+
+    Numbering for each base not seen before is read with
+    next_suffixes(); later duplicates are numbered from memory, so a
+    long import only queries for titles it has not met yet.
+    """
+
+    def __init__(self, model, field="slug"):
+        self.model = model
+        self.field = field
+        self.next_suffix = {}
+
+    def bases(self, names):
+        return [base_slug(self.model, name, self.field) for name in names]
+
+    def allocate(self, names):
+        """Return one unique slug per name, in order"""
+        bases = self.bases(names)
+        self.next_suffix.update(
+            next_suffixes(
+                self.model,
+                {base for base in bases if base not in self.next_suffix},
+                self.field,
+            )
+        )
+        slugs = []
+        issued = set()
+        for base in bases:
+            # A plain slug such as "pasta-2" in this batch can take the
+            # number another name's duplicates would have used next
+            while True:
+                suffix = self.next_suffix[base]
+                slug = numbered(base, suffix)
+                self.next_suffix[base] = suffix + 1
+                if slug not in issued:
+                    break
+            issued.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def forget(self, names):
+        """Drop cached numbering so the next allocation re-reads it"""
+        for base in self.bases(names):
+            self.next_suffix.pop(base, None)
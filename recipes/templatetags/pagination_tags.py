@@ -0,0 +1,25 @@
+"""Template tags for cursor pagination links"""
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor=None):
+    """
+    Build a link to the current page with the cursor replaced
+
+    Args:
+        context: Template context holding the request
+        cursor: Cursor token to link to, or None for the first page
+
+    Returns:
+        Query string keeping every other GET parameter (e.g. ``q``)
+    """
+    params = context["request"].GET.copy()
+    params.pop("cursor", None)
+    params.pop("page", None)
+    if cursor:
+        params["cursor"] = cursor
+    query = params.urlencode()
+    return f"?{query}" if query else "?"
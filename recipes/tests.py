@@ -2,10 +2,68 @@
 Comprehensive tests for recipes app
 """
 
+import random
+from decimal import Decimal
+import datetime
+import gzip
+import json
+import math
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.messages import constants as message_constants
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import MessageEncoder
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template import Context, Template
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
-from .models import Recipe, Category, Country, Comment, Like
+from recipe_project.middleware import (
+    QueryBudgetExceeded,
+    QueryLog,
+    fingerprint,
+    timing_stats,
+)
+from .benchmarks import benchmark_dataset, compare_reports, url_names
+from .checks import check_page_cache_backend
+from .ingredients import parse_ingredient
+from .like_buffer import apply_intents, like_buffer
+from .models import (
+    Recipe,
+    Category,
+    Country,
+    Comment,
+    Like,
+    Ingredient,
+    RecipeIngredient,
+    RecipeRecommendation,
+    RecommendationRun,
+    TrendingScore,
+    ImportCheckpoint,
+)
+from .navigation import navigation
+from .page_cache import recipe_tag
+from .pantry import PantryIndex, pantry_index
+from .recommendations import LikeGraph
+from .scale_data import ScaleDataGenerator
+from .search import search_recipes
+from .sitemaps import (
+    build_sitemaps,
+    recipe_section,
+    section_file,
+    sitemap_storage,
+)
+from .slugs import SlugAllocator, next_suffixes
 
 
 class RecipeModelTest(TestCase):
@@ -443,6 +501,57 @@ class CommentViewTest(TestCase):
         )
         self.assertEqual(Comment.objects.count(), 1)
 
+    def add_comments(self, count):
+        Comment.objects.bulk_create(
+            Comment(
+                recipe=self.recipe, user=self.user, content=f"Comment {n}"
+            )
+            for n in range(count)
+        )
+
+    def test_detail_inlines_first_comment_page(self):
+        """Test the detail page shows one page of comments and a link"""
+        self.add_comments(25)
+        response = self.client.get(
+            reverse("recipe_detail", kwargs={"slug": self.recipe.slug})
+        )
+        self.assertEqual(len(response.context["comments"]), 20)
+        self.assertContains(response, "Load more comments")
+
+    def test_comment_pages(self):
+        """Test later pages load as HTML or JSON without overlap"""
+        self.add_comments(25)
+        url = reverse("recipe_comments", kwargs={"slug": self.recipe.slug})
+        first = self.client.get(url, {"format": "json"}).json()
+        self.assertEqual(len(first["comments"]), 20)
+        second = self.client.get(
+            url, {"format": "json", "cursor": first["next_cursor"]}
+        ).json()
+        self.assertIsNone(second["next_cursor"])
+        contents = {
+            comment["content"]
+            for comment in first["comments"] + second["comments"]
+        }
+        self.assertEqual(len(contents), 25)
+
+        response = self.client.get(url, {"cursor": first["next_cursor"]})
+        self.assertContains(response, 'class="comment ', count=5)
+        self.assertNotContains(response, "Load more comments")
+        self.assertEqual(
+            self.client.get(url, {"cursor": "bogus"}).status_code, 404
+        )
+
+    def test_detail_queries_independent_of_comments(self):
+        """Test the detail page costs the same for 1 or 50 comments"""
+        url = reverse("recipe_detail", kwargs={"slug": self.recipe.slug})
+        self.add_comments(1)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        self.add_comments(49)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(few), len(many))
+
     def test_delete_comment_admin_can_delete(self):
         """Test admin can delete any comment"""
         comment = Comment.objects.create(
@@ -514,6 +623,77 @@ class LikeViewTest(TestCase):
         self.assertEqual(Like.objects.count(), 0)
         self.assertEqual(self.recipe.total_likes(), 0)
 
+    def test_toggle_like_concurrent_insert(self):
+        """Test a like committed between the DELETE and INSERT is kept"""
+        self.client.login(username="testuser", password="testpass123")
+        # The other click's like lands after this one's DELETE ran
+        Like.objects.create(recipe=self.recipe, user=self.user)
+        with mock.patch("recipes.likes._delete_like", return_value=None):
+            response = self.client.post(
+                reverse("toggle_like", kwargs={"slug": self.recipe.slug}),
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["liked"])
+        self.assertEqual(response.json()["total_likes"], 1)
+        self.assertEqual(Like.objects.count(), 1)
+
+    def set_like_state(self, method, name="like_state", slug=None):
+        url = reverse(name, kwargs={"slug": slug or self.recipe.slug})
+        return getattr(self.client, method)(url)
+
+    def test_like_state_put_is_idempotent(self):
+        """Test repeated PUTs add one like and report the count"""
+        self.client.login(username="testuser", password="testpass123")
+        first = self.set_like_state("put").json()
+        second = self.set_like_state("put").json()
+        self.assertEqual(
+            first, {"success": True, "liked": True, "changed": True,
+                    "total_likes": 1}
+        )
+        self.assertFalse(second["changed"])
+        self.assertEqual(second["total_likes"], 1)
+        self.assertEqual(Like.objects.count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 1)
+        self.assertGreater(TrendingScore.objects.get().score, 0)
+
+    def test_like_state_delete_is_idempotent(self):
+        """Test repeated DELETEs remove the like and its effects once"""
+        self.client.login(username="testuser", password="testpass123")
+        self.set_like_state("put")
+        first = self.set_like_state("delete").json()
+        second = self.set_like_state("delete").json()
+        self.assertTrue(first["changed"])
+        self.assertFalse(first["liked"])
+        self.assertFalse(second["changed"])
+        self.assertEqual(second["total_likes"], 0)
+        self.assertEqual(Like.objects.count(), 0)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 0)
+        self.assertEqual(
+            TrendingScore.objects.get().score, TrendingScore.EMPTY
+        )
+
+    def test_like_state_rejects_anonymous_and_other_methods(self):
+        """Test like_state needs a login and PUT or DELETE"""
+        self.assertEqual(self.set_like_state("put").status_code, 401)
+        self.client.login(username="testuser", password="testpass123")
+        self.assertEqual(self.set_like_state("post").status_code, 405)
+        self.assertEqual(
+            self.set_like_state("put", slug="missing").status_code, 404
+        )
+        self.assertEqual(Like.objects.count(), 0)
+
+    def test_like_state_async(self):
+        """Test the async variant behaves like the sync view"""
+        self.client.login(username="testuser", password="testpass123")
+        response = self.set_like_state("put", "like_state_async")
+        self.assertEqual(response.json()["total_likes"], 1)
+        response = self.set_like_state("delete", "like_state_async")
+        self.assertEqual(response.json()["total_likes"], 0)
+        self.assertEqual(Like.objects.count(), 0)
+
     def test_favorites_view_requires_login(self):
         """Test favorites page requires authentication"""
         self.client.get(reverse("favorites"))
@@ -563,3 +743,2167 @@ class UserProfileViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "testuser")
         self.assertContains(response, "Pasta")
+
+
+class RecipeCounterTest(TestCase):
+    """Test denormalized like and comment counters"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        self.recipe = Recipe.objects.create(
+            title="Pasta",
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            servings=2,
+            author=self.user,
+            status="published",
+        )
+
+    def test_like_count_follows_likes(self):
+        """Test like_count is bumped on like and unlike"""
+        like = Like.objects.create(recipe=self.recipe, user=self.user)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 1)
+        like.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 0)
+
+    def test_comment_count_follows_approval(self):
+        """Test comment_count only counts approved comments"""
+        comment = Comment.objects.create(
+            recipe=self.recipe, user=self.user, content="Nice"
+        )
+        Comment.objects.create(
+            recipe=self.recipe,
+            user=self.user,
+            content="Hidden",
+            approved=False
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 1)
+
+        comment.approved = False
+        comment.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 0)
+
+        comment.approved = True
+        comment.save()
+        comment.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 0)
+
+    def test_recipe_save_keeps_counters(self):
+        """Test saving a stale recipe instance does not reset counters"""
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Like.objects.create(recipe=self.recipe, user=self.user)
+        stale.title = "Pasta Bake"
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 1)
+        self.assertEqual(self.recipe.title, "Pasta Bake")
+
+    def test_rebuild_counters_command(self):
+        """Test rebuild command repairs drifted counters"""
+        Like.objects.create(recipe=self.recipe, user=self.user)
+        Recipe.objects.update(like_count=42, comment_count=7)
+        call_command("rebuild_recipe_counters", stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 1)
+        self.assertEqual(self.recipe.comment_count, 0)
+
+    def test_rebuild_counters_refreshes_caches(self):
+        """Test repaired recipes get a new version and expired pages"""
+        Recipe.objects.update(like_count=42)
+        version = Recipe.objects.get().version
+        with mock.patch("recipes.page_cache.invalidate") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command("rebuild_recipe_counters", stdout=StringIO())
+        self.assertEqual(Recipe.objects.get().version, version + 1)
+        self.assertIn(recipe_tag(self.recipe.slug), invalidate.call_args[0])
+
+        with mock.patch("recipes.page_cache.invalidate") as invalidate:
+            call_command("rebuild_recipe_counters", stdout=StringIO())
+        self.assertEqual(Recipe.objects.get().version, version + 1)
+        invalidate.assert_not_called()
+
+
+class RecipeSearchTest(TestCase):
+    """Test ranked full-text recipe search"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+
+    def make_recipe(self, title, ingredients="Salt", description="Tasty"):
+        """Create a published recipe"""
+        return Recipe.objects.create(
+            title=title,
+            description=description,
+            ingredients=ingredients,
+            instructions="Cook",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            status="published",
+        )
+
+    def search(self, query):
+        """Return matching recipe titles in rank order"""
+        return [
+            recipe.title
+            for recipe in search_recipes(Recipe.objects.all(), query)
+        ]
+
+    def test_title_match_ranks_first(self):
+        """Test a title hit outranks an ingredient hit"""
+        self.make_recipe("Garlic Bread", ingredients="Tomato\nBasil")
+        self.make_recipe("Tomato Soup")
+        self.assertEqual(
+            self.search("tomato"), ["Tomato Soup", "Garlic Bread"]
+        )
+
+    def test_prefix_and_all_terms(self):
+        """Test tokens are prefix matched and all must be present"""
+        self.make_recipe("Tomatoes on Toast")
+        self.make_recipe("Tomato Pasta")
+        self.assertEqual(self.search("toma toast"), ["Tomatoes on Toast"])
+
+    def test_index_follows_save_and_delete(self):
+        """Test the index is refreshed on save and delete"""
+        recipe = self.make_recipe("Lemon Tart")
+        recipe.title = "Lime Tart"
+        recipe.save()
+        self.assertEqual(self.search("lemon"), [])
+        self.assertEqual(self.search("lime"), ["Lime Tart"])
+        recipe.delete()
+        self.assertEqual(self.search("lime"), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Test search operators in user input do not raise"""
+        self.make_recipe("Fish Pie")
+        self.assertEqual(self.search('"fish* (pie'), ["Fish Pie"])
+        self.assertEqual(self.search("  ---  "), [])
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class CursorPaginationTest(TestCase):
+    """Test keyset pagination of recipe listings"""
+
+    def setUp(self):
+        """Set up 30 recipes, half of them sharing a timestamp"""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        for number in range(30):
+            Recipe.objects.create(
+                title=f"Soup {number}",
+                description="Test",
+                ingredients="Test",
+                instructions="Test",
+                prep_time=5,
+                cook_time=10,
+                author=self.user,
+                status="published",
+            )
+        # Force ties on created_at so the id tie-breaker is exercised
+        first = Recipe.objects.order_by("id").first()
+        Recipe.objects.filter(id__lt=first.id + 15).update(
+            created_at=first.created_at
+        )
+
+    def walk(self, url, params=None):
+        """Follow next links from the first page, collecting pages"""
+        params = dict(params or {})
+        pages = []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            params["cursor"] = page.next_cursor
+
+    def test_pages_cover_every_recipe_once(self):
+        """Test walking next cursors visits each recipe exactly once"""
+        pages = self.walk(reverse("home"))
+        self.assertEqual([len(page) for page in pages], [12, 12, 6])
+        seen = [recipe.id for page in pages for recipe in page]
+        expected = list(
+            Recipe.objects.order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_same_page(self):
+        """Test previous cursor from page 3 returns page 2"""
+        pages = self.walk(reverse("home"))
+        response = self.client.get(
+            reverse("home"), {"cursor": pages[2].previous_cursor}
+        )
+        self.assertEqual(
+            [recipe.id for recipe in response.context["page_obj"]],
+            [recipe.id for recipe in pages[1]],
+        )
+        self.assertTrue(response.context["page_obj"].has_previous())
+
+    def test_search_keeps_query(self):
+        """Test cursor links keep the search query"""
+        response = self.client.get(reverse("search_recipes"), {"q": "soup"})
+        self.assertContains(response, "?q=soup&amp;cursor=")
+        pages = self.walk(reverse("search_recipes"), {"q": "soup"})
+        self.assertEqual(sum(len(page) for page in pages), 30)
+
+    def test_liked_ids_scoped_to_page(self):
+        """Test liked state is only looked up for recipes on the page"""
+        newest = Recipe.objects.order_by("-created_at", "-id")
+        on_page, off_page = newest[0], newest.last()
+        Like.objects.create(recipe=on_page, user=self.user)
+        Like.objects.create(recipe=off_page, user=self.user)
+        self.client.login(username="testuser", password="testpass123")
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.context["user_liked_ids"], {on_page.id})
+
+    def test_invalid_cursor_is_404(self):
+        """Test a garbled cursor returns 404"""
+        response = self.client.get(reverse("home"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+
+@override_settings(
+    STATICFILES_STORAGE=(
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    ),
+    CACHES=LOCMEM_CACHES,
+)
+class RecipeCardCacheTest(TestCase):
+    """Test the versioned recipe card fragment cache"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        self.category = Category.objects.create(name="Dinner")
+        self.recipe = Recipe.objects.create(
+            title="Pasta",
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            category=self.category,
+            status="published",
+        )
+        # Logged in, so pages come from the fragment cache only
+        self.client.login(username="testuser", password="testpass123")
+
+    def test_version_bumps(self):
+        """Test save, likes and comments bump the recipe version"""
+        self.recipe.save()
+        self.assertEqual(self.recipe.version, 2)
+        Like.objects.create(recipe=self.recipe, user=self.user)
+        Comment.objects.create(
+            recipe=self.recipe, user=self.user, content="Yum"
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.version, 4)
+
+    def test_cached_card_refreshed_on_change(self):
+        """Test a cached card is re-rendered after the recipe changes"""
+        self.client.get(reverse("home"))
+        # Bypass save() so the version is not bumped: the stale
+        # cached card must still be served
+        Recipe.objects.filter(pk=self.recipe.pk).update(title="Risotto")
+        self.assertContains(self.client.get(reverse("home")), "Pasta")
+
+        self.recipe.refresh_from_db()
+        self.recipe.save()
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Risotto")
+        self.assertNotContains(response, "Pasta")
+
+    def test_category_rename_refreshes_cards(self):
+        """Test renaming a category refreshes cards showing it"""
+        self.client.get(reverse("home"))
+        self.category.name = "Supper"
+        self.category.save()
+        self.assertContains(self.client.get(reverse("home")), "Supper")
+
+    def test_author_rename_refreshes_cards(self):
+        """Test renaming the author refreshes their cards, logins don't"""
+        self.client.get(reverse("home"))
+        self.client.logout()
+        self.client.login(username="testuser", password="testpass123")
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.version, 1)
+        self.user.username = "chef"
+        self.user.save()
+        self.assertContains(self.client.get(reverse("home")), "by chef")
+
+
+@override_settings(
+    STATICFILES_STORAGE=(
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    ),
+    CACHES=LOCMEM_CACHES,
+    PAGE_CACHE=True,
+)
+class AnonymousPageCacheTest(TestCase):
+    """Test the anonymous full-page cache and its invalidation"""
+
+    def setUp(self):
+        """Set up two recipes in different categories"""
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        self.dinner = Category.objects.create(name="Dinner")
+        self.dessert = Category.objects.create(name="Dessert")
+        self.pasta = Recipe.objects.create(
+            title="Pasta",
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            category=self.dinner,
+            status="published",
+        )
+        self.cake = Recipe.objects.create(
+            title="Cake",
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            category=self.dessert,
+            status="published",
+        )
+        self.urls = {
+            "home": reverse("home"),
+            "pasta": reverse("recipe_detail", args=[self.pasta.slug]),
+            "cake": reverse("recipe_detail", args=[self.cake.slug]),
+            "dinner": reverse("category_recipes", args=[self.dinner.slug]),
+            "dessert": reverse("category_recipes", args=[self.dessert.slug]),
+        }
+
+    def cache_status(self):
+        """Request every page, returning each X-Page-Cache header"""
+        return {
+            name: self.client.get(url)["X-Page-Cache"]
+            for name, url in self.urls.items()
+        }
+
+    def test_second_anonymous_request_is_hit(self):
+        """Test anonymous pages are served from cache"""
+        self.cache_status()
+        self.assertEqual(set(self.cache_status().values()), {"hit"})
+
+    def test_authenticated_requests_bypass_cache(self):
+        """Test logged-in users always get a fresh page"""
+        self.client.login(username="testuser", password="testpass123")
+        self.client.get(self.urls["home"])
+        response = self.client.get(self.urls["home"])
+        self.assertFalse(response.has_header("X-Page-Cache"))
+
+    def test_comment_purges_only_its_detail_page(self):
+        """Test a new comment only expires the commented recipe's page"""
+        self.cache_status()
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                recipe=self.pasta, user=self.user, content="Lovely"
+            )
+        status = self.cache_status()
+        self.assertEqual(status.pop("pasta"), "miss")
+        self.assertEqual(set(status.values()), {"hit"})
+        self.assertContains(self.client.get(self.urls["pasta"]), "Lovely")
+
+    def test_like_purges_pages_showing_the_card(self):
+        """Test a like expires the detail page and listings of the recipe"""
+        self.cache_status()
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(recipe=self.cake, user=self.user)
+        self.assertEqual(
+            self.cache_status(),
+            {
+                "home": "miss",
+                "pasta": "hit",
+                "cake": "miss",
+                "dinner": "hit",
+                "dessert": "miss",
+            },
+        )
+
+    def test_category_change_purges_everything(self):
+        """Test a category write expires every page via the nav tag"""
+        self.cache_status()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Breakfast")
+        self.assertEqual(set(self.cache_status().values()), {"miss"})
+
+    def test_shared_cache_required(self):
+        """Test PAGE_CACHE with a per-process cache fails the checks"""
+        with override_settings(DEBUG=False):
+            self.assertEqual(
+                [error.id for error in check_page_cache_backend(None)],
+                ["recipes.E001"],
+            )
+        with override_settings(DEBUG=False, PAGE_CACHE=False):
+            self.assertEqual(check_page_cache_backend(None), [])
+
+    def test_off_by_default(self):
+        """Test pages are neither cached nor tagged without PAGE_CACHE"""
+        with override_settings(PAGE_CACHE=False):
+            response = self.client.get(reverse("home"))
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertNotIn("ETag", response)
+
+
+@override_settings(
+    STATICFILES_STORAGE=(
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    ),
+    CACHES=LOCMEM_CACHES,
+    PAGE_CACHE=True,
+)
+class ConditionalGetTest(TestCase):
+    """Test ETag and Last-Modified revalidation of recipe pages"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.recipe = Recipe.objects.create(
+            title="Pasta",
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            status="published",
+        )
+        self.detail = reverse("recipe_detail", args=[self.recipe.slug])
+        self.profile = reverse("user_profile", args=["testuser"])
+
+    def test_unchanged_page_is_not_modified(self):
+        """Test a matching ETag gets a 304 without touching the database"""
+        response = self.client.get(self.detail)
+        self.assertIn("no-cache", response["Cache-Control"])
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.detail, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        """Test Last-Modified is honoured"""
+        response = self.client.get(reverse("home"))
+        response = self.client.get(
+            reverse("home"),
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_validators(self):
+        """Test a like changes the detail and profile ETags"""
+        etags = [
+            self.client.get(url)["ETag"] for url in (self.detail, self.profile)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(recipe=self.recipe, user=self.user)
+        for url, etag in zip((self.detail, self.profile), etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_validators_are_per_user(self):
+        """Test logged-in pages get their own private validators"""
+        anonymous = self.client.get(self.detail)["ETag"]
+        self.client.login(username="testuser", password="testpass123")
+        response = self.client.get(self.detail)
+        self.assertNotEqual(response["ETag"], anonymous)
+        self.assertIn("private", response["Cache-Control"])
+        response = self.client.get(
+            self.detail, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_csrf_token_changes_validators(self):
+        """Test a rotated CSRF token gets the page, not a stale 304"""
+        self.client.login(username="testuser", password="testpass123")
+        response = self.client.get(self.detail)
+        self.assertNotIn("Last-Modified", response)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "a" * 32
+        response = self.client.get(
+            self.detail, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 200)
+
+    # Showing the message writes the session, outside the page budget
+    @override_settings(
+        MESSAGE_STORAGE=(
+            "django.contrib.messages.storage.session.SessionStorage"
+        ),
+        QUERY_BUDGET_MODE="log",
+    )
+    def test_session_messages_skip_revalidation(self):
+        """Test a flash message kept in the session is not skipped"""
+        self.client.login(username="testuser", password="testpass123")
+        etag = self.client.get(self.detail)["ETag"]
+        session = self.client.session
+        session[SessionStorage.session_key] = MessageEncoder().encode(
+            [Message(message_constants.INFO, "Recipe saved")]
+        )
+        session.save()
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Recipe saved")
+
+
+@override_settings(
+    STATICFILES_STORAGE=(
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    ),
+    CACHES=LOCMEM_CACHES,
+)
+class NavigationCacheTest(TestCase):
+    """Test the cached navigation context processor"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        navigation.invalidate()
+        self.client = Client()
+        self.category = Category.objects.create(name="Dinner")
+        self.country = Country.objects.create(name="Italian")
+
+    def test_nav_on_every_page(self):
+        """Test the dropdowns are filled on pages that never set them"""
+        response = self.client.get(reverse("login"))
+        self.assertContains(response, "Dinner")
+        self.assertContains(response, "Italian")
+
+    def test_lookups_served_from_memory(self):
+        """Test repeated slug lookups do not hit the database"""
+        navigation.get_category("dinner")
+        with self.assertNumQueries(0):
+            self.assertEqual(navigation.get_category("dinner"), self.category)
+            self.assertEqual(navigation.get_country("italian"), self.country)
+            navigation.categories()
+
+    def test_write_invalidates(self):
+        """Test a category write is visible on the next lookup"""
+        navigation.categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Brunch")
+        self.assertIn(
+            "Brunch", [item.name for item in navigation.categories()]
+        )
+
+    def test_slug_added_elsewhere_found(self):
+        """Test a category another worker added resolves, not 404s"""
+        navigation.categories()
+        # bulk_create skips the signal, as a write in another process
+        # leaves this one's copy and tag alone
+        Category.objects.bulk_create([Category(name="Brunch", slug="brunch")])
+        self.assertEqual(navigation.get_category("brunch").name, "Brunch")
+        self.assertIn(
+            "Brunch", [item.name for item in navigation.categories()]
+        )
+
+    def test_private_cache_copy_expires(self):
+        """Test a per-process cache reloads the menus after the TTL"""
+        navigation.categories()
+        Category.objects.bulk_create([Category(name="Brunch", slug="brunch")])
+        with self.settings(NAVIGATION_TTL=0):
+            self.assertIn(
+                "Brunch", [item.name for item in navigation.categories()]
+            )
+
+    def test_unknown_slug_is_404(self):
+        """Test an unknown category slug returns 404"""
+        response = self.client.get(
+            reverse("category_recipes", args=["nope"])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class IngredientParsingTest(TestCase):
+    """Test structured ingredients parsed from Recipe.ingredients"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        self.recipe = Recipe.objects.create(
+            title="Carbonara",
+            description="Test",
+            ingredients="400g spaghetti\n2 large Eggs, beaten\n"
+                        "1 1/2 cups grated Parmesan\nSalt to taste",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            status="published",
+        )
+
+    def test_parse_line(self):
+        """Test quantity, unit and canonical name are extracted"""
+        parsed = parse_ingredient("1 1/2 Tablespoons olive oil (extra)")
+        self.assertEqual(parsed.quantity, Decimal("1.5"))
+        self.assertEqual(parsed.unit, "tbsp")
+        self.assertEqual(parsed.name, "olive oil")
+        parsed = parse_ingredient("½ tsp chilli flakes")
+        self.assertEqual(parsed.quantity, Decimal("0.5"))
+        self.assertEqual(parsed.name, "chilli flake")
+        for line in ("1½ cups flour", "1 ½ cups flour"):
+            parsed = parse_ingredient(line)
+            self.assertEqual(parsed.quantity, Decimal("1.5"))
+            self.assertEqual(parsed.unit, "cup")
+            self.assertEqual(parsed.name, "flour")
+        for word in ("molasses", "asparagus", "hummus", "glass"):
+            self.assertEqual(parse_ingredient(f"1 cup {word}").name, word)
+        parsed = parse_ingredient("3 ripe tomatoes, diced")
+        self.assertEqual(parsed.name, "ripe tomato")
+        self.assertIsNone(parse_ingredient("   "))
+
+    def test_rows_created_on_save(self):
+        """Test saving a recipe populates its parsed ingredients"""
+        rows = list(self.recipe.recipe_ingredients.select_related(
+            "ingredient"
+        ))
+        self.assertEqual(
+            [row.ingredient.name for row in rows],
+            ["spaghetti", "egg", "parmesan", "salt"],
+        )
+        self.assertEqual(rows[0].quantity, Decimal("400"))
+        self.assertEqual(rows[0].unit, "g")
+        self.assertEqual(rows[2].unit, "cup")
+
+    def test_oversized_quantity_dropped(self):
+        """Test a quantity too large for the column does not break saves"""
+        recipe = Recipe.objects.create(
+            title="Rice",
+            description="Test",
+            ingredients="12345678 g rice",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+        )
+        row = recipe.recipe_ingredients.select_related("ingredient").get()
+        self.assertIsNone(row.quantity)
+        self.assertEqual(row.unit, "g")
+        self.assertEqual(row.ingredient.name, "rice")
+
+    def test_quantity_rounding_onto_bound_dropped(self):
+        """Test a quantity rounding up to the column limit is dropped"""
+        parsed = parse_ingredient("9999999.9999 g flour")
+        self.assertIsNone(parsed.quantity)
+        self.assertEqual(parsed.name, "flour")
+        self.assertEqual(
+            parse_ingredient("9999999.9994 g flour").quantity,
+            Decimal("9999999.999"),
+        )
+
+    def test_zero_denominator_dropped(self):
+        """Test a mixed number over zero does not break saves"""
+        recipe = Recipe.objects.create(
+            title="Rice",
+            description="Test",
+            ingredients="1 1/0 cups rice",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+        )
+        row = recipe.recipe_ingredients.select_related("ingredient").get()
+        self.assertIsNone(row.quantity)
+        self.assertEqual(row.ingredient.name, "rice")
+
+    def test_unchanged_ingredients_not_reparsed(self):
+        """Test saves that leave ingredients alone skip the sync"""
+        first_id = self.recipe.recipe_ingredients.first().pk
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.title = "Carbonara Classica"
+        recipe.save()
+        self.assertTrue(
+            RecipeIngredient.objects.filter(pk=first_id).exists()
+        )
+        recipe.ingredients = "200g guanciale or pancetta\n400g spaghetti"
+        recipe.save()
+        self.assertEqual(
+            list(Recipe.objects.filter(
+                recipe_ingredients__ingredient__name="guanciale"
+            )),
+            [recipe],
+        )
+        self.assertFalse(
+            RecipeIngredient.objects.filter(pk=first_id).exists()
+        )
+
+    def test_ingredients_shared_between_recipes(self):
+        """Test equal canonical names resolve to one Ingredient"""
+        Recipe.objects.create(
+            title="Frittata",
+            description="Test",
+            ingredients="6 eggs",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+        )
+        self.assertEqual(Ingredient.objects.filter(name="egg").count(), 1)
+        self.assertEqual(
+            Ingredient.objects.get(name="egg").recipe_ingredients.count(), 2
+        )
+
+    def test_backfill_command(self):
+        """Test backfill rebuilds rows for existing recipes"""
+        RecipeIngredient.objects.all().delete()
+        call_command("backfill_ingredients", stdout=StringIO())
+        self.assertEqual(self.recipe.recipe_ingredients.count(), 4)
+
+
+@override_settings(
+    STATICFILES_STORAGE=(
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    ),
+    PANTRY_REFRESH_INTERVAL=3600,
+)
+class PantryIndexTest(TestCase):
+    """Test pantry matching over the in-memory bitset index"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        self.carbonara = self.make_recipe(
+            "Carbonara", "400g spaghetti\n3 eggs\n50g parmesan\nSalt"
+        )
+        self.amatriciana = self.make_recipe(
+            "Amatriciana",
+            "400g spaghetti\n3 eggs\n50g parmesan\n100g guanciale",
+        )
+        self.cake = self.make_recipe("Cake", "200g flour\n100g sugar")
+        pantry_index.load()
+
+    def make_recipe(self, title, ingredients, status="published"):
+        """Create a recipe with the given ingredients"""
+        return Recipe.objects.create(
+            title=title,
+            description="Test",
+            ingredients=ingredients,
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            status=status,
+        )
+
+    def match(self, *names, max_missing=2):
+        """Run a pantry query, returning recipe ids per missing count"""
+        have, _ = pantry_index.resolve(names)
+        groups = pantry_index.match(
+            have | pantry_index.staple_ids(), max_missing=max_missing
+        )
+        return [[pk for pk, _ in group["recipes"]] for group in groups]
+
+    def test_ranked_by_missing_count(self):
+        """Test makeable recipes come first, then those missing one"""
+        self.assertEqual(
+            self.match("Eggs", "spaghetti", "grated parmesan"),
+            [[self.carbonara.pk], [self.amatriciana.pk], []],
+        )
+        self.assertEqual(
+            self.match("spaghetti"),
+            [[], [], [self.carbonara.pk]],
+        )
+
+    def test_incremental_updates(self):
+        """Test saved, unpublished and deleted recipes update the index"""
+        with self.captureOnCommitCallbacks(execute=True):
+            frittata = self.make_recipe("Frittata", "6 eggs\n50g parmesan")
+        self.assertEqual(self.match("eggs", "parmesan")[0], [frittata.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            frittata.status = "draft"
+            frittata.save()
+            self.cake.delete()
+        self.assertEqual(self.match("eggs", "parmesan")[0], [])
+        self.assertEqual(self.match("flour", "sugar")[0], [])
+
+    def test_refresh_picks_up_late_commits(self):
+        """Test a write committed behind the watermark is still polled"""
+        # Not applied in this process, as if saved by another worker
+        # whose transaction committed after a later-stamped one
+        frittata = self.make_recipe("Frittata", "6 eggs\n50g parmesan")
+        Recipe.objects.filter(pk=frittata.pk).update(
+            updated_at=pantry_index._watermark
+            - datetime.timedelta(seconds=5)
+        )
+        pantry_index.refresh()
+        self.assertEqual(self.match("eggs", "parmesan")[0], [frittata.pk])
+
+    def test_matches_brute_force(self):
+        """Test bit-sliced counting agrees with a direct count"""
+        rng = random.Random(7)
+        index = PantryIndex()
+        index._reset()
+        index._loaded = True
+        recipes = {
+            recipe_id: set(rng.sample(range(1, 30), rng.randint(1, 12)))
+            for recipe_id in range(1, 400)
+        }
+        for recipe_id, items in recipes.items():
+            index._set_recipe(recipe_id, items)
+        for recipe_id in range(1, 400, 7):
+            recipes[recipe_id] = set(rng.sample(range(1, 30), 3))
+            index._set_recipe(recipe_id, recipes[recipe_id])
+        have = set(rng.sample(range(1, 30), 10))
+        groups = index.match(have, max_missing=4, limit=1000)
+        for group in groups:
+            expected = {
+                recipe_id for recipe_id, items in recipes.items()
+                if items & have and len(items - have) == group["missing"]
+            }
+            self.assertEqual(
+                {recipe_id for recipe_id, _ in group["recipes"]}, expected
+            )
+            self.assertEqual(group["total"], len(expected))
+
+    def test_pantry_view(self):
+        """Test the pantry page lists matches and unknown entries"""
+        response = self.client.get(
+            reverse("pantry"),
+            {"ingredients": "eggs, spaghetti\nparmesan, unobtainium"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Carbonara")
+        self.assertContains(response, "Missing: guanciale")
+        self.assertContains(response, "No recipes use: unobtainium")
+        self.assertNotContains(response, "Cake")
+
+
+@override_settings(
+    STATICFILES_STORAGE=(
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+)
+class RecommendationTest(TestCase):
+    """Test co-like recommendations"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.client = Client()
+        self.users = [
+            User.objects.create_user(
+                username=f"user{index}", password="testpass123"
+            )
+            for index in range(4)
+        ]
+        self.recipes = {
+            title: Recipe.objects.create(
+                title=title,
+                description="Test",
+                ingredients="Test",
+                instructions="Test",
+                prep_time=5,
+                cook_time=10,
+                author=self.users[0],
+                status="published",
+            )
+            for title in ("Apple Pie", "Brownies", "Crumble", "Dal")
+        }
+        self.like(0, "Apple Pie", "Brownies")
+        self.like(1, "Apple Pie", "Brownies", "Crumble")
+        self.like(2, "Crumble", "Dal")
+
+    def like(self, user_index, *titles):
+        """Like the named recipes as one of the test users"""
+        for title in titles:
+            Like.objects.create(
+                user=self.users[user_index], recipe=self.recipes[title]
+            )
+
+    def recommended(self, title):
+        """Titles recommended for a recipe, best first"""
+        return [
+            row.recommended.title
+            for row in RecipeRecommendation.objects.filter(
+                recipe=self.recipes[title]
+            ).order_by("position")
+        ]
+
+    def test_full_run_ranks_by_cosine(self):
+        """Test neighbours are ordered by co-like cosine similarity"""
+        call_command("compute_recommendations", stdout=StringIO())
+        self.assertEqual(
+            self.recommended("Apple Pie"), ["Brownies", "Crumble"]
+        )
+        self.assertEqual(self.recommended("Dal"), ["Crumble"])
+        self.assertTrue(RecommendationRun.objects.get().full)
+
+    def test_incremental_run(self):
+        """Test a later run picks up new likes only where affected"""
+        call_command("compute_recommendations", stdout=StringIO())
+        self.like(3, "Apple Pie", "Dal")
+        call_command("compute_recommendations", stdout=StringIO())
+        self.assertIn("Dal", self.recommended("Apple Pie"))
+        self.assertIn("Apple Pie", self.recommended("Dal"))
+        latest = RecommendationRun.objects.order_by("-pk").first()
+        self.assertFalse(latest.full)
+        self.assertEqual(latest.last_like_id, Like.objects.latest("pk").pk)
+
+    def test_incremental_run_loads_only_affected_likes(self):
+        """Test an incremental run reads the changed recipes' likers only"""
+        call_command("compute_recommendations", stdout=StringIO())
+        self.like(3, "Dal")
+        graph = LikeGraph(Like.objects.latest("pk").pk, full=False)
+        graph.load_likers_of([self.recipes["Dal"].pk])
+        self.assertEqual(
+            set(graph.by_user), {self.users[2].pk, self.users[3].pk}
+        )
+        self.assertEqual(graph.liker_count(self.recipes["Crumble"].pk), 2)
+
+        call_command("compute_recommendations", stdout=StringIO())
+        incremental = {
+            title: self.recommended(title) for title in self.recipes
+        }
+        call_command(
+            "compute_recommendations", "--full", stdout=StringIO()
+        )
+        self.assertEqual(
+            incremental,
+            {title: self.recommended(title) for title in self.recipes},
+        )
+
+    def test_detail_page_shows_recommendations(self):
+        """Test the detail page lists precomputed recommendations"""
+        call_command("compute_recommendations", stdout=StringIO())
+        self.recipes["Brownies"].status = "draft"
+        self.recipes["Brownies"].save()
+        response = self.client.get(
+            reverse("recipe_detail", args=["apple-pie"])
+        )
+        self.assertContains(response, "People Who Liked This Also Liked")
+        self.assertContains(response, "Crumble")
+        self.assertNotContains(response, "Brownies")
+
+
+@override_settings(
+    STATICFILES_STORAGE=(
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+)
+class TrendingTest(TestCase):
+    """Test time-decayed trending scores and listings"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        self.category = Category.objects.create(name="Dinner")
+        self.stew = self.make_recipe("Stew", category=self.category)
+        self.salad = self.make_recipe("Salad")
+        self.soup = self.make_recipe("Soup")
+
+    def make_recipe(self, title, **kwargs):
+        """Create a published recipe"""
+        return Recipe.objects.create(
+            title=title,
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            status="published",
+            **kwargs,
+        )
+
+    def trending_titles(self, url):
+        """Recipe titles on a trending page, in order"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [recipe.title for recipe in response.context["recipes"]]
+
+    def test_ranked_by_activity(self):
+        """Test comments outweigh likes and idle recipes come last"""
+        Like.objects.create(recipe=self.salad, user=self.user)
+        Comment.objects.create(
+            recipe=self.stew, user=self.user, content="Great"
+        )
+        self.assertEqual(
+            self.trending_titles(reverse("trending")),
+            ["Stew", "Salad", "Soup"],
+        )
+
+    def test_scores_follow_removals(self):
+        """Test removing a like or unapproving a comment subtracts it"""
+        like = Like.objects.create(recipe=self.salad, user=self.user)
+        comment = Comment.objects.create(
+            recipe=self.stew, user=self.user, content="Great"
+        )
+        like.delete()
+        comment.approved = False
+        comment.save()
+        for score in TrendingScore.objects.values_list("score", flat=True):
+            self.assertEqual(score, TrendingScore.EMPTY)
+
+    def test_older_activity_decays(self):
+        """Test a week-old like is worth less than a fresh one"""
+        old = Like.objects.create(recipe=self.stew, user=self.user)
+        Like.objects.filter(pk=old.pk).update(
+            created_at=old.created_at - datetime.timedelta(days=7)
+        )
+        Like.objects.create(recipe=self.salad, user=self.user)
+        call_command("rebuild_trending", stdout=StringIO())
+        self.assertEqual(
+            self.trending_titles(reverse("trending"))[:2],
+            ["Salad", "Stew"],
+        )
+
+    @override_settings(TRENDING_EPOCH="1000-01-01")
+    def test_scores_stay_finite_far_from_epoch(self):
+        """Test scores a million half-lives past the epoch still rank"""
+        other = User.objects.create_user(
+            username="other", password="testpass123"
+        )
+        Like.objects.create(recipe=self.salad, user=self.user)
+        Like.objects.create(recipe=self.stew, user=self.user)
+        Like.objects.create(recipe=self.stew, user=other).delete()
+        Comment.objects.create(
+            recipe=self.stew, user=self.user, content="Great"
+        )
+        scores = dict(TrendingScore.objects.values_list("recipe", "score"))
+        self.assertTrue(all(math.isfinite(score) for score in scores.values()))
+        self.assertEqual(
+            self.trending_titles(reverse("trending")),
+            ["Stew", "Salad", "Soup"],
+        )
+        call_command("rebuild_trending", stdout=StringIO())
+        for recipe, score in TrendingScore.objects.values_list(
+            "recipe", "score"
+        ):
+            self.assertAlmostEqual(score, scores[recipe])
+
+    def test_scoped_listings(self):
+        """Test category listings and unpublished recipes are filtered"""
+        Like.objects.create(recipe=self.stew, user=self.user)
+        self.soup.category = self.category
+        self.soup.status = "draft"
+        self.soup.save()
+        self.assertEqual(
+            self.trending_titles(
+                reverse("trending_category", args=["dinner"])
+            ),
+            ["Stew"],
+        )
+        response = self.client.get(
+            reverse("trending_country", args=["nowhere"])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportRecipesTest(TestCase):
+    """Test the streaming import_recipes command"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = User.objects.create_user(
+            username="admin", password="testpass123"
+        )
+        self.chef = User.objects.create_user(
+            username="chef", password="testpass123"
+        )
+        Category.objects.create(name="Dinner")
+        Recipe.objects.create(
+            title="Pasta",
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.admin,
+        )
+        handle, self.path = tempfile.mkstemp(suffix=".ndjson")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def write_rows(self, rows, mode="w"):
+        """Write rows to the NDJSON input file"""
+        with open(self.path, mode, encoding="utf-8") as handle:
+            for row in rows:
+                handle.write(
+                    row if isinstance(row, str) else json.dumps(row)
+                )
+                handle.write("\n")
+
+    def run_import(self, *args):
+        """Run the command and return its output"""
+        out = StringIO()
+        call_command(
+            "import_recipes", self.path, "--batch-size", "2", *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        """Test rows are inserted with unique slugs and side tables"""
+        self.write_rows([
+            {"title": "Pasta", "author": "chef", "category": "Dinner",
+             "ingredients": "400g spaghetti\n2 eggs", "prep_time": 5},
+            {"title": "Pasta", "category": "Brunch", "country": "Italian"},
+            "{not json",
+            {"title": "", "description": "No title"},
+            {"title": "Bad", "cook_time": "x"},
+            {"title": "Pasta 2"},
+            {"title": "Pasta"},
+        ])
+        output = self.run_import()
+        self.assertIn("Imported 4 recipes", output)
+        self.assertIn("skipped 3 invalid rows", output)
+        self.assertIn("rows/sec", output)
+
+        imported = Recipe.objects.exclude(pk=Recipe.objects.earliest("pk").pk)
+        self.assertEqual(
+            sorted(imported.values_list("slug", flat=True)),
+            ["pasta-2", "pasta-2-2", "pasta-3", "pasta-4"],
+        )
+        first = imported.get(slug="pasta-2")
+        self.assertEqual(first.author, self.chef)
+        self.assertEqual(first.category.name, "Dinner")
+        self.assertEqual(first.status, "published")
+        self.assertEqual(first.recipe_ingredients.count(), 2)
+        self.assertTrue(TrendingScore.objects.filter(recipe=first).exists())
+        self.assertTrue(Category.objects.filter(name="Brunch").exists())
+        self.assertEqual(
+            imported.get(category__name="Brunch").author, self.admin
+        )
+        self.assertIn(first, search_recipes(Recipe.objects.all(), "pasta"))
+
+    def test_resume(self):
+        """Test a second run continues after the last committed row"""
+        self.write_rows([{"title": "Soup"}, {"title": "Stew"}])
+        self.run_import()
+        self.write_rows([{"title": "Salad"}], mode="a")
+        output = self.run_import()
+        self.assertIn("Resuming after row 2", output)
+        self.assertEqual(Recipe.objects.filter(title="Soup").count(), 1)
+        self.assertEqual(Recipe.objects.filter(title="Salad").count(), 1)
+        self.assertEqual(
+            ImportCheckpoint.objects.get(
+                source=os.path.abspath(self.path)
+            ).imported,
+            3,
+        )
+
+        self.run_import("--restart")
+        self.assertEqual(Recipe.objects.filter(title="Soup").count(), 2)
+
+    def test_resume_seeks_past_imported_rows(self):
+        """Test a resumed NDJSON import does not re-read earlier rows"""
+        self.write_rows([{"title": "Soup"}, {"title": "Stew"}])
+        self.run_import()
+        checkpoint = ImportCheckpoint.objects.get(
+            source=os.path.abspath(self.path)
+        )
+        self.assertEqual(checkpoint.offset, os.path.getsize(self.path))
+        # Rows before the offset are not read again, not even counted
+        with open(self.path, "r+b") as handle:
+            handle.write(b" " * len(json.dumps({"title": "Soup"})))
+        self.write_rows([{"title": "Salad"}], mode="a")
+        output = self.run_import()
+        self.assertIn("Imported 1 recipes", output)
+        self.assertIn("skipped 0 invalid rows", output)
+
+    def test_wrongly_typed_rows_skipped(self):
+        """Test rows with non-string text fields are skipped, not fatal"""
+        self.write_rows([
+            {"title": 42},
+            {"title": "Soup", "category": ["Dinner"]},
+            {"title": "Stew", "created_at": 20200101},
+            {"title": "Salad", "description": None},
+        ])
+        output = self.run_import()
+        self.assertIn("Imported 1 recipes", output)
+        self.assertIn("skipped 3 invalid rows", output)
+        self.assertTrue(Recipe.objects.filter(title="Salad").exists())
+
+    def test_import_csv(self):
+        """Test CSV input keeps its creation timestamps"""
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        with open(self.path, "w", encoding="utf-8", newline="") as handle:
+            handle.write(
+                "title,ingredients,created_at\n"
+                "Bread,\"500g flour\n7g yeast\",2020-05-01T12:00:00+00:00\n"
+            )
+        self.run_import()
+        bread = Recipe.objects.get(title="Bread")
+        self.assertEqual(bread.created_at.year, 2020)
+        self.assertEqual(bread.recipe_ingredients.count(), 2)
+
+
+class ScaleDataTest(TestCase):
+    """Test the synthetic scale-data generator"""
+
+    def generate(self, seed=7):
+        return ScaleDataGenerator(
+            recipes=60,
+            users=25,
+            likes_per_recipe=5,
+            comments_per_recipe=2,
+            days=30,
+            seed=seed,
+            batch_size=25,
+        )
+
+    def test_generate(self):
+        """Test generated rows are consistent and spread over time"""
+        counts = self.generate().run()
+        self.assertEqual(counts["recipes"], 60)
+        self.assertEqual(counts["users"], 25)
+        self.assertEqual(Like.objects.count(), counts["likes"])
+        self.assertEqual(Comment.objects.count(), counts["comments"])
+        self.assertGreater(counts["likes"], 0)
+
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.like_count, recipe.likes.count())
+            self.assertEqual(
+                recipe.comment_count,
+                recipe.comments.filter(approved=True).count(),
+            )
+        oldest = Recipe.objects.earliest("created_at").created_at
+        newest = Recipe.objects.latest("created_at").created_at
+        self.assertGreater((newest - oldest).days, 25)
+        self.assertEqual(
+            TrendingScore.objects.count(), Recipe.objects.count()
+        )
+        self.assertTrue(TrendingScore.objects.filter(score__gt=0).exists())
+        self.assertTrue(RecipeIngredient.objects.exists())
+
+    def test_deterministic(self):
+        """Test the same seed gives the same dataset"""
+        first = self.generate()
+        first.run()
+        snapshot = list(
+            Recipe.objects.order_by("slug").values_list(
+                "slug", "like_count", "comment_count"
+            )
+        )
+        Recipe.objects.all().delete()
+        User.objects.all().delete()
+        self.generate().run()
+        self.assertEqual(
+            list(
+                Recipe.objects.order_by("slug").values_list(
+                    "slug", "like_count", "comment_count"
+                )
+            ),
+            snapshot,
+        )
+
+    def test_command(self):
+        """Test populate_recipes --scale refuses to run twice"""
+        out = StringIO()
+        call_command(
+            "populate_recipes", "--scale", "20", "--users", "10", stdout=out
+        )
+        self.assertIn("Generated 10 users, 20 recipes", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("populate_recipes", "--scale", "20", stdout=out)
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class BenchmarkTest(TestCase):
+    """Test the view benchmark suite"""
+
+    def test_benchmark_covers_every_url(self):
+        """Test every URL is requested and measured"""
+        result = benchmark_dataset(30, repeat=2, seed=3)
+        self.assertEqual(result["counts"]["recipes"], 30)
+        self.assertEqual(sorted(result["views"]), url_names())
+        for name, view in result["views"].items():
+            self.assertLess(view["status"], 400, name)
+            self.assertGreaterEqual(
+                view["warm"]["p95_ms"], view["warm"]["p50_ms"]
+            )
+        detail = result["views"]["recipe_detail"]["cold"]
+        self.assertGreater(detail["queries"], 0)
+        self.assertGreater(detail["rows"], 0)
+
+        report = {"datasets": [result]}
+        lines = compare_reports(report, report)
+        self.assertEqual(len(lines), len(url_names()))
+        self.assertIn("(+0%)", lines[0])
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class QueryBudgetTest(TestCase):
+    """Test per-view query budgets"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="cook", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Dinner")
+        self.country = Country.objects.create(name="Italian")
+
+    def create_recipes(self, count):
+        start = Recipe.objects.count()
+        for index in range(start, start + count):
+            recipe = Recipe.objects.create(
+                title=f"Pasta {index}",
+                description="Delicious pasta",
+                ingredients="200g pasta\n2 eggs",
+                instructions="Cook",
+                prep_time=5,
+                cook_time=10,
+                servings=2,
+                author=self.user,
+                category=self.category,
+                country=self.country,
+                status="published",
+            )
+            Like.objects.create(recipe=recipe, user=self.user)
+            Comment.objects.create(
+                recipe=recipe, user=self.user, content="Tasty"
+            )
+
+    def listing_urls(self):
+        return [
+            reverse("home"),
+            reverse("recipe_list"),
+            reverse("category_recipes", kwargs={"slug": "dinner"}),
+            reverse("country_recipes", kwargs={"slug": "italian"}),
+            reverse("trending"),
+            reverse("trending_category", kwargs={"slug": "dinner"}),
+            reverse("trending_country", kwargs={"slug": "italian"}),
+            reverse("search_recipes") + "?q=pasta",
+            reverse("pantry") + "?ingredients=pasta",
+            reverse("favorites"),
+            reverse("user_profile", kwargs={"username": "cook"}),
+        ]
+
+    def query_counts(self):
+        counts = {}
+        for url in self.listing_urls():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[url] = len(queries)
+        return counts
+
+    def test_listings_independent_of_page_size(self):
+        """Test listings run as many queries for 1 recipe as for 20"""
+        self.client.login(username="cook", password="testpass123")
+        self.create_recipes(1)
+        # Count steady-state queries, not the one-off index load
+        pantry_index.load()
+        few = self.query_counts()
+        self.create_recipes(19)
+        self.assertEqual(self.query_counts(), few)
+
+    @override_settings(QUERY_BUDGETS={"home": 1})
+    def test_budget_exceeded_raises(self):
+        """Test the test suite fails a view over its budget"""
+        self.create_recipes(1)
+        with self.assertRaisesMessage(QueryBudgetExceeded, "home ran"):
+            self.client.get(reverse("home"))
+
+    @override_settings(QUERY_BUDGET_MODE="log", QUERY_BUDGETS={"home": 1})
+    def test_log_mode(self):
+        """Test log mode flags the response and logs the queries"""
+        self.create_recipes(1)
+        with self.assertLogs("recipe_project.middleware", "WARNING") as logs:
+            response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["X-Query-Budget"].startswith("exceeded"))
+        self.assertIn("recipes_recipe", logs.output[0])
+
+    def test_fingerprint(self):
+        """Test queries differing only in values share a fingerprint"""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            fingerprint("SELECT *  FROM t\nWHERE id IN (%s, %s)"),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 'x' AND b = 12"),
+            "SELECT * FROM t WHERE a = ? AND b = ?",
+        )
+
+    def test_template_origin(self):
+        """Test queries run while rendering record the template line"""
+        self.create_recipes(1)
+        template = Template(
+            "{% for recipe in recipes %}\n{{ recipe.author }}{% endfor %}"
+        )
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            template.render(Context({"recipes": Recipe.objects.all()}))
+        origins = [origin for _, origin in log.queries]
+        self.assertTrue(origins[0].endswith(":1"))
+        self.assertTrue(origins[1].endswith(":2"))
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class RequestTimingTest(TestCase):
+    """Test the request timing middleware"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="cook", password="testpass123", is_staff=True
+        )
+        self.recipe = Recipe.objects.create(
+            title="Pasta",
+            description="Delicious pasta",
+            ingredients="200g pasta",
+            instructions="Cook",
+            prep_time=5,
+            cook_time=10,
+            servings=2,
+            author=self.user,
+            status="published",
+        )
+        timing_stats.reset()
+        self.addCleanup(timing_stats.reset)
+
+    def server_timing(self, response):
+        timings = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, duration = entry.split(";")[:2]
+            timings[name] = float(duration.split("=")[1])
+        return timings
+
+    @override_settings(REQUEST_TIMING=True)
+    def test_timing_header_logs_and_stats(self):
+        """Test timings reach the header, the log and the aggregates"""
+        url = reverse("recipe_detail", kwargs={"slug": "pasta"})
+        with self.assertLogs("recipe_project.timing", "INFO") as logs:
+            response = self.client.get(url)
+        timings = self.server_timing(response)
+        self.assertGreater(timings["total"], 0)
+        self.assertGreater(timings["tpl"], 0)
+        self.assertLessEqual(timings["tpl"], timings["total"])
+        self.assertIn('queries"', response["Server-Timing"])
+
+        record = logs.records[0]
+        self.assertEqual(record.url_name, "recipe_detail")
+        self.assertEqual(record.status, 200)
+        self.assertGreater(record.queries, 0)
+        self.assertIn("url_name=recipe_detail", record.getMessage())
+
+        self.client.get(url)
+        stats = timing_stats.snapshot()["recipe_detail"]
+        self.assertEqual(stats["count"], 2)
+        self.assertGreaterEqual(stats["max_total_ms"], stats["mean_total_ms"])
+
+        self.client.login(username="cook", password="testpass123")
+        response = self.client.get(reverse("request_timings"))
+        self.assertEqual(response.json()["recipe_detail"]["count"], 2)
+
+    def test_disabled_by_default(self):
+        """Test no timing is collected when REQUEST_TIMING is off"""
+        response = self.client.get(reverse("home"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(timing_stats.snapshot(), {})
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class SamplingProfilerTest(TestCase):
+    """Test the sampling profiler and its report"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_profiles_written_and_reported(self):
+        """Test sampled requests leave collapsed stacks and a report"""
+        with self.settings(
+            PROFILING_SAMPLE_RATE=1.0,
+            PROFILING_INTERVAL_MS=1,
+            PROFILING_DIR=self.directory,
+        ):
+            for _ in range(5):
+                self.client.get(reverse("register"))
+        files = os.listdir(os.path.join(self.directory, "register"))
+        self.assertTrue(files)
+        with open(
+            os.path.join(self.directory, "register", files[0]),
+            encoding="utf-8",
+        ) as handle:
+            line = handle.readline()
+        self.assertRegex(line, r"^\S.*;.* \d+\n$")
+
+        out = StringIO()
+        call_command("profile_report", "--dir", self.directory, stdout=out)
+        self.assertIn(f"register: {len(files)} requests", out.getvalue())
+        self.assertIn("self time:", out.getvalue())
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, "register.folded"))
+        )
+
+    def test_fast_requests_discarded(self):
+        """Test only requests over the slow threshold are kept"""
+        with self.settings(
+            PROFILING_SLOW_MS=60000, PROFILING_DIR=self.directory
+        ):
+            self.client.get(reverse("register"))
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class LikeBufferTest(TestCase):
+    """Test buffered like ingestion"""
+
+    def setUp(self):
+        """Set up test data"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        buffered = self.settings(
+            LIKE_BUFFER=True,
+            LIKE_BUFFER_PATH=os.path.join(directory, "likes.sqlite3"),
+            LIKE_BUFFER_FLUSH_SECONDS=3600,
+        )
+        buffered.enable()
+        self.addCleanup(buffered.disable)
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.recipe = Recipe.objects.create(
+            title="Pasta",
+            description="Test",
+            ingredients="Test",
+            instructions="Test",
+            prep_time=5,
+            cook_time=10,
+            author=self.user,
+            status="published",
+        )
+        self.client.login(username="testuser", password="testpass123")
+
+    def toggle(self):
+        return self.client.post(
+            reverse("toggle_like", kwargs={"slug": self.recipe.slug}),
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        ).json()
+
+    def test_clicks_coalesce_and_show_before_flush(self):
+        """Test the user sees their pending like and it flushes once"""
+        self.toggle()
+        self.toggle()
+        data = self.toggle()
+        self.assertTrue(data["liked"])
+        self.assertEqual(data["total_likes"], 1)
+        self.assertEqual(len(like_buffer), 1)
+        self.assertFalse(Like.objects.exists())
+
+        response = self.client.get(reverse("recipe_list"))
+        self.assertEqual(response.context["user_liked_ids"], {self.recipe.pk})
+        response = self.client.get(reverse("favorites"))
+        self.assertEqual(list(response.context["recipes"]), [self.recipe])
+
+        out = StringIO()
+        call_command("flush_likes", stdout=out)
+        self.assertIn("Flushed 1 new and 0 removed likes", out.getvalue())
+        self.assertEqual(len(like_buffer), 0)
+        self.assertEqual(Like.objects.count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 1)
+        self.assertGreater(TrendingScore.objects.get().score, 0)
+
+    def test_pending_unlike(self):
+        """Test an unflushed unlike hides the stored like"""
+        with self.settings(LIKE_BUFFER=False):
+            Like.objects.create(recipe=self.recipe, user=self.user)
+        response = self.client.delete(
+            reverse("like_state", kwargs={"slug": self.recipe.slug})
+        )
+        self.assertEqual(response.json()["total_likes"], 0)
+        response = self.client.get(
+            reverse("recipe_detail", kwargs={"slug": self.recipe.slug})
+        )
+        self.assertFalse(response.context["user_has_liked"])
+        self.assertEqual(response.context["recipe"].like_count, 0)
+
+        self.assertEqual(like_buffer.flush(), (0, 1))
+        self.assertFalse(Like.objects.exists())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 0)
+        self.assertEqual(
+            TrendingScore.objects.get().score, TrendingScore.EMPTY
+        )
+
+    def test_flush_when_full(self):
+        """Test the request that fills the buffer flushes it"""
+        other = User.objects.create_user(username="other", password="x")
+        self.toggle()
+        self.client.force_login(other)
+        with self.settings(LIKE_BUFFER_FLUSH_SIZE=2):
+            self.toggle()
+        self.assertEqual(len(like_buffer), 0)
+        self.assertEqual(Like.objects.count(), 2)
+
+    def test_flush_skips_deleted_recipes(self):
+        """Test intents for a since-deleted recipe are dropped"""
+        self.toggle()
+        self.recipe.delete()
+        self.assertEqual(like_buffer.flush(), (0, 0))
+        self.assertEqual(len(like_buffer), 0)
+
+    def test_replayed_batch_counted_once(self):
+        """Test re-applying a flushed batch changes no score or version"""
+        like = [(self.user.pk, self.recipe.pk, True)]
+        unlike = [(self.user.pk, self.recipe.pk, False)]
+        self.assertEqual(apply_intents(like), (1, 0))
+        score = TrendingScore.objects.get().score
+        version = Recipe.objects.get().version
+        self.assertEqual(apply_intents(like), (0, 0))
+        self.assertEqual(TrendingScore.objects.get().score, score)
+        self.assertEqual(Recipe.objects.get().version, version)
+
+        self.assertEqual(apply_intents(unlike), (0, 1))
+        self.assertEqual(apply_intents(unlike), (0, 0))
+        self.assertEqual(
+            TrendingScore.objects.get().score, TrendingScore.EMPTY
+        )
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class RecipeApiTest(TestCase):
+    """Test the read-only JSON API"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Dinner")
+        self.country = Country.objects.create(name="Italian")
+        self.recipes = [
+            Recipe.objects.create(
+                title=title,
+                description="Test",
+                ingredients="200g pasta",
+                instructions="Boil",
+                prep_time=5,
+                cook_time=10,
+                author=self.user,
+                category=self.category,
+                country=self.country,
+                status=status,
+            )
+            for title, status in (
+                ("Pasta", "published"),
+                ("Pizza", "published"),
+                ("Secret Stew", "draft"),
+            )
+        ]
+
+    def get_json(self, name, kwargs=None, **params):
+        response = self.client.get(reverse(name, kwargs=kwargs), params)
+        return response.status_code, response.json()
+
+    def test_list_leaves_out_long_fields(self):
+        """Test listings skip ingredients and instructions by default"""
+        with CaptureQueriesContext(connection) as queries:
+            status, data = self.get_json("api_recipe_list")
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            [recipe["title"] for recipe in data["results"]],
+            ["Pizza", "Pasta"],
+        )
+        self.assertEqual(data["results"][0]["author"], "testuser")
+        self.assertNotIn("ingredients", data["results"][0])
+        self.assertNotIn("instructions", queries[-1]["sql"])
+
+    def test_sparse_fieldsets(self):
+        """Test ?fields= selects exactly the requested fields"""
+        status, data = self.get_json(
+            "api_recipe_list", fields="title,ingredients"
+        )
+        self.assertEqual(
+            data["results"][0],
+            {"id": self.recipes[1].pk, "title": "Pizza",
+             "ingredients": "200g pasta"},
+        )
+        status, data = self.get_json("api_recipe_list", fields="password")
+        self.assertEqual(status, 400)
+
+    def test_cursor_pagination(self):
+        """Test limit and cursor walk the list without overlap"""
+        status, first = self.get_json("api_recipe_list", limit=1)
+        status, second = self.get_json(
+            "api_recipe_list", limit=1, cursor=first["next_cursor"]
+        )
+        self.assertEqual(second["results"][0]["title"], "Pasta")
+        self.assertIsNone(second["next_cursor"])
+        status, data = self.get_json("api_recipe_list", cursor="bogus")
+        self.assertEqual(status, 400)
+
+    def test_filtered_lists_and_search(self):
+        """Test category, cuisine and search endpoints"""
+        for name, slug in (
+            ("api_category_recipes", "dinner"),
+            ("api_country_recipes", "italian"),
+        ):
+            status, data = self.get_json(name, {"slug": slug})
+            self.assertEqual(len(data["results"]), 2)
+        status, data = self.get_json(
+            "api_category_recipes", {"slug": "missing"}
+        )
+        self.assertEqual(status, 404)
+        status, data = self.get_json("api_search_recipes", q="pizza")
+        self.assertEqual(
+            [recipe["title"] for recipe in data["results"]], ["Pizza"]
+        )
+
+    def test_detail(self):
+        """Test the detail endpoint returns every field of published recipes"""
+        status, data = self.get_json(
+            "api_recipe_detail", {"slug": self.recipes[0].slug}
+        )
+        self.assertEqual(data["instructions"], "Boil")
+        self.assertEqual(data["category"], "dinner")
+        status, data = self.get_json(
+            "api_recipe_detail", {"slug": self.recipes[2].slug}
+        )
+        self.assertEqual(status, 404)
+
+
+class ExportTest(TestCase):
+    """Test the streaming data export view and command"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.staff = User.objects.create_user(
+            username="staff", password="testpass123", is_staff=True
+        )
+        self.cook = User.objects.create_user(
+            username="cook", password="testpass123"
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                title=title,
+                description="Tasty",
+                ingredients="Salt",
+                instructions="Cook",
+                prep_time=5,
+                cook_time=10,
+                servings=2,
+                author=author,
+                status=status,
+            )
+            for title, author, status in [
+                ("Pasta", self.cook, "published"),
+                ("Soup", self.staff, "published"),
+                ("Stew", self.cook, "draft"),
+            ]
+        ]
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(
+            created_at=datetime.datetime(
+                2024, 1, 15, 12, tzinfo=datetime.timezone.utc
+            )
+        )
+        Comment.objects.create(
+            recipe=self.recipes[0], user=self.staff, content="Lovely"
+        )
+        Like.objects.create(recipe=self.recipes[1], user=self.cook)
+
+    def export(self, kind, **params):
+        response = self.client.get(
+            reverse("export_data", kwargs={"kind": kind}), params
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_staff_only(self):
+        """Test the export view needs a staff login"""
+        url = reverse("export_data", kwargs={"kind": "recipes"})
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.login(username="cook", password="testpass123")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_ndjson_filters(self):
+        """Test NDJSON rows honour the status, author and date filters"""
+        self.client.login(username="staff", password="testpass123")
+        response, body = self.export("recipes")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn("recipes.ndjson", response["Content-Disposition"])
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [row["title"] for row in rows], ["Pasta", "Soup", "Stew"]
+        )
+        self.assertEqual(rows[0]["author"], "cook")
+
+        _, body = self.export("recipes", status="published", author="cook")
+        self.assertEqual(
+            [json.loads(line)["title"] for line in body.splitlines()],
+            ["Pasta"],
+        )
+        _, body = self.export(
+            "recipes", since="2024-01-01", until="2024-01-15"
+        )
+        self.assertEqual(
+            [json.loads(line)["title"] for line in body.splitlines()],
+            ["Pasta"],
+        )
+        _, body = self.export("comments", author="staff")
+        self.assertEqual(json.loads(body)["recipe"], self.recipes[0].slug)
+
+        response = self.client.get(
+            reverse("export_data", kwargs={"kind": "recipes"}),
+            {"since": "yesterday"},
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse("export_data", kwargs={"kind": "users"})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_gzipped_csv(self):
+        """Test CSV output, gzipped on the fly"""
+        self.client.login(username="staff", password="testpass123")
+        response, body = self.export("likes", format="csv", gzip="1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn("likes.csv.gz", response["Content-Disposition"])
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual(lines[0], "id,recipe,user,created_at")
+        self.assertEqual(len(lines), 2)
+        self.assertIn(f",{self.recipes[1].slug},cook,", lines[1])
+
+    def test_command(self):
+        """Test the command writes to standard output or a file"""
+        out = StringIO()
+        call_command(
+            "export_data", "recipes", "--format", "csv", "--status", "draft",
+            "--chunk-size", "1", stdout=out,
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Stew", lines[1])
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "comments.ndjson.gz")
+        call_command(
+            "export_data", "comments", "--gzip", "--output", path,
+            stdout=StringIO(),
+        )
+        with open(path, "rb") as export:
+            row = json.loads(gzip.decompress(export.read()))
+        self.assertEqual(row["content"], "Lovely")
+
+        with self.assertRaises(CommandError):
+            call_command("export_data", "likes", "--since", "soon")
+
+
+@override_settings(SITE_URL="https://recipes.example", SITEMAP_CHUNK_SIZE=2)
+class SitemapTest(TestCase):
+    """Test the prebuilt sitemaps and feeds"""
+
+    def setUp(self):
+        """Set up test data"""
+        # A fresh in-memory storage for each test
+        storage = override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                "sitemaps": {
+                    "BACKEND": "django.core.files.storage.InMemoryStorage",
+                },
+            }
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.user = User.objects.create_user(
+            username="cook", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Dinner")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {index}",
+                description="Tasty",
+                ingredients="Salt",
+                instructions="Cook",
+                prep_time=5,
+                cook_time=10,
+                servings=2,
+                author=self.user,
+                category=self.category,
+                status="draft" if index == 3 else "published",
+            )
+            for index in range(5)
+        ]
+
+    def fetch(self, name, kwargs=None, **extra):
+        return self.client.get(reverse(name, kwargs=kwargs), **extra)
+
+    def test_build_and_serve(self):
+        """Test sections, index and feeds are built and served gzipped"""
+        self.assertEqual(self.fetch("sitemap_index").status_code, 404)
+        call_command("build_sitemaps", stdout=StringIO())
+
+        with self.assertNumQueries(0):
+            response = self.fetch("sitemap_index", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("max-age=86400", response["Cache-Control"])
+        self.assertIn("public", response["Cache-Control"])
+        index = gzip.decompress(response.content).decode()
+        sections = {recipe_section(recipe.pk) for recipe in self.recipes}
+        for section in sections | {"pages"}:
+            self.assertIn(
+                f"https://recipes.example/sitemaps/{section}.xml", index
+            )
+
+        urls = ""
+        for section in sections:
+            response = self.fetch("sitemap_section", {"section": section})
+            self.assertNotIn("Content-Encoding", response)
+            urls += response.content.decode()
+        for recipe in self.recipes:
+            self.assertEqual(
+                recipe.get_absolute_url() in urls,
+                recipe.status == "published",
+            )
+        pages = self.fetch("sitemap_section", {"section": "pages"})
+        self.assertIn(self.category.get_absolute_url(), pages.content.decode())
+        self.assertEqual(
+            self.fetch("sitemap_section", {"section": "users"}).status_code,
+            404,
+        )
+
+        response = self.fetch("recipe_feed", {"feed_format": "atom"})
+        self.assertEqual(
+            response["Content-Type"], "application/atom+xml; charset=utf-8"
+        )
+        self.assertIn("<title>Recipe 4</title>", response.content.decode())
+        self.assertIn("max-age=3600", response["Cache-Control"])
+        response = self.fetch(
+            "recipe_feed",
+            {"feed_format": "rss"},
+            HTTP_IF_NONE_MATCH=self.fetch(
+                "recipe_feed", {"feed_format": "rss"}
+            )["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_incremental_rebuild(self):
+        """Test a build rewrites only the sections that changed"""
+        first = build_sitemaps()
+        self.assertIn("sitemap.xml.gz", first["written"])
+        self.assertEqual(build_sitemaps(), {"written": [], "removed": []})
+
+        edited = self.recipes[4]
+        edited.title = "Renamed"
+        edited.save()
+        written = build_sitemaps()["written"]
+        self.assertIn(section_file(recipe_section(edited.pk)), written)
+        self.assertNotIn(
+            section_file(recipe_section(self.recipes[0].pk)), written
+        )
+        self.assertNotIn(section_file("pages"), written)
+        self.assertIn("latest.rss.gz", written)
+
+        # Drafts count as gone; an emptied section is removed
+        emptied = [
+            recipe for recipe in self.recipes
+            if recipe_section(recipe.pk) == recipe_section(edited.pk)
+        ]
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in emptied]
+        ).update(status="draft")
+        result = build_sitemaps()
+        self.assertEqual(
+            result["removed"], [section_file(recipe_section(edited.pk))]
+        )
+        self.assertEqual(
+            self.fetch(
+                "sitemap_section", {"section": recipe_section(edited.pk)}
+            ).status_code,
+            404,
+        )
+
+    def test_served_while_swapping(self):
+        """Test a file deleted for replacement is served from its copy"""
+        build_sitemaps()
+        storage_class = type(sitemap_storage())
+        delete = storage_class.delete
+        statuses = []
+
+        def delete_and_fetch(storage, name):
+            delete(storage, name)
+            if name == "sitemap.xml.gz":
+                statuses.append(self.fetch("sitemap_index").status_code)
+
+        with mock.patch.object(storage_class, "delete", delete_and_fetch):
+            build_sitemaps(force=True)
+        self.assertEqual(statuses, [200])
+        self.assertEqual(self.fetch("sitemap_index").status_code, 200)
+        self.assertFalse(sitemap_storage().exists("sitemap.xml.gz.tmp"))
+
+    def test_files_replaced_in_place(self):
+        """Test a rebuild on disk swaps files without deleting them"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                "sitemaps": {
+                    "BACKEND": "django.core.files.storage.FileSystemStorage",
+                    "OPTIONS": {"location": directory},
+                },
+            }
+        ):
+            build_sitemaps()
+            edited = self.recipes[0]
+            edited.slug = "renamed"
+            edited.save()
+            with mock.patch.object(
+                FileSystemStorage, "delete", side_effect=AssertionError
+            ):
+                written = build_sitemaps()["written"]
+            section = recipe_section(edited.pk)
+            self.assertIn(section_file(section), written)
+            response = self.fetch("sitemap_section", {"section": section})
+        self.assertIn("/recipe/renamed/", response.content.decode())
+        self.assertEqual(
+            sorted(os.listdir(directory)),
+            sorted(
+                {section_file(recipe_section(recipe.pk))
+                 for recipe in self.recipes if recipe.status == "published"}
+                | {section_file("pages"), "sitemap.xml.gz", "manifest.json",
+                   "latest.rss.gz", "latest.atom.gz"}
+            ),
+        )
+
+
+class SlugAllocationTest(TestCase):
+    """Test unique slug allocation"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username="cook", password="testpass123"
+        )
+
+    def create(self, title, **kwargs):
+        return Recipe.objects.create(
+            title=title,
+            description="Cake",
+            ingredients="200g flour",
+            instructions="Bake",
+            prep_time=5,
+            cook_time=10,
+            servings=2,
+            author=self.user,
+            **kwargs,
+        )
+
+    def test_duplicate_titles_numbered(self):
+        """Test duplicate titles get the next free number"""
+        slugs = [self.create("Chocolate Cake").slug for _ in range(3)]
+        self.assertEqual(
+            slugs, ["chocolate-cake", "chocolate-cake-2", "chocolate-cake-3"]
+        )
+        self.assertEqual(
+            self.create("Chocolate Cake 2").slug, "chocolate-cake-2-2"
+        )
+        self.create("Chocolate Cake Pops")
+        self.assertEqual(
+            self.create("Chocolate Cake").slug, "chocolate-cake-4"
+        )
+
+    def test_categories_and_countries(self):
+        """Test names that slugify alike get distinct slugs"""
+        self.assertEqual(Category.objects.create(name="Café").slug, "cafe")
+        self.assertEqual(Category.objects.create(name="Cafe").slug, "cafe-2")
+        self.assertEqual(Country.objects.create(name="!!!").slug, "country")
+
+    def test_single_query_per_chunk(self):
+        """Test numbering for many bases is read in one query"""
+        self.create("Soup")
+        self.create("Soup")
+        with self.assertNumQueries(1):
+            suffixes = next_suffixes(Recipe, ["soup", "stew", "salad"])
+        self.assertEqual(suffixes, {"soup": 3, "stew": 1, "salad": 1})
+
+    def test_batch_allocation(self):
+        """Test a batch never repeats a slug"""
+        self.create("Soup")
+        allocator = SlugAllocator(Recipe)
+        self.assertEqual(
+            allocator.allocate(["Soup", "Soup", "Soup 2", "Stew"]),
+            ["soup-2", "soup-3", "soup-2-2", "stew"],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(allocator.allocate(["Soup"]), ["soup-4"])
+
+    def test_concurrent_creator_falls_back(self):
+        """Test a slug taken under stale numbering is replaced"""
+        self.create("Cake")
+        with mock.patch(
+            "recipes.slugs.next_suffixes", return_value={"cake": 1}
+        ):
+            recipe = self.create("Cake")
+        self.assertRegex(recipe.slug, r"^cake-[a-z]{6}$")
+        self.assertEqual(Recipe.objects.filter(title="Cake").count(), 2)
@@ -0,0 +1,189 @@
+"""
+Time-decayed trending scores
+
+A like or comment made at time ``t`` is worth ``weight * 2 ** -(now - t)
+/ half_life`` at time ``now``. Every score shares the same
+``2 ** -now / half_life`` factor, so storing each event as ``weight *
+2 ** (t - epoch) / half_life`` instead ranks recipes identically but
+never needs the stored scores to be decayed: new events are simply
+added (and removed events subtracted) with an F() update.
+
+Those sums double every half-life and would overflow a float about a
+thousand half-lives past TRENDING_EPOCH, so scores are stored as their
+base 2 logarithm, which only grows by one per half-life. Adding or
+removing an event is then a log-sum-exp computed in the UPDATE itself,
+and the epoch never has to move.
+"""
+
+import datetime
+import math
+
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest, Least, Log, Power
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from .models import Comment, Like, Recipe, TrendingScore
+
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+EMPTY = TrendingScore.EMPTY
+# 2 ** -64 vanishes next to 1, so larger gaps are clamped to it (keeping
+# POWER() clear of underflow errors)
+NEGLIGIBLE = -64.0
+# A removal that leaves less than this (as a log) is rounding noise
+CANCELLED = -1e-9
+
+
+def _epoch():
+    epoch = datetime.datetime.fromisoformat(
+        getattr(settings, "TRENDING_EPOCH", "2025-01-01")
+    )
+    if timezone.is_naive(epoch):
+        epoch = epoch.replace(tzinfo=datetime.timezone.utc)
+    return epoch
+
+
+def event_value(weight, when):
+    """
+    Stored score contribution of an event, as a base 2 logarithm.
+
+    Args:
+        weight (float): LIKE_WEIGHT or COMMENT_WEIGHT
+        when (datetime): When the like or comment was made
+
+    Returns:
+        float: log2 of ``weight`` plus the half-lives since the epoch
+    """
+    half_life = datetime.timedelta(
+        hours=getattr(settings, "TRENDING_HALF_LIFE_HOURS", 48)
+    )
+    return math.log2(weight) + (when - _epoch()) / half_life
+
+
+def log_add(a, b):
+    """``log2(2 ** a + 2 ** b)`` without leaving log space"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2.0 ** max(low - high, NEGLIGIBLE))
+
+
+def log_subtract(a, b):
+    """``log2(2 ** a - 2 ** b)``, or EMPTY when nothing is left"""
+    if b - a >= CANCELLED:
+        return EMPTY
+    return a + math.log2(1 - 2.0 ** max(b - a, NEGLIGIBLE))
+
+
+def added(value):
+    """Expression for the stored score with ``value`` added to it"""
+    score, value = F("score"), Value(value)
+    gap = Greatest(Least(score, value) - Greatest(score, value), NEGLIGIBLE)
+    return Greatest(score, value) + Log(2, 1 + Power(2, gap))
+
+
+def subtracted(value):
+    """Expression for the stored score with ``value`` taken out of it"""
+    score, value = F("score"), Value(value)
+    return Case(
+        When(GreaterThanOrEqual(value - score, CANCELLED), then=EMPTY),
+        default=score + Log(
+            2, 1 - Power(2, Greatest(value - score, NEGLIGIBLE))
+        ),
+    )
+
+
+def record_event(recipe_id, weight, when, sign=1):
+    """Add (or with ``sign=-1`` remove) an event from a recipe's score"""
+    value = event_value(weight, when)
+    TrendingScore.objects.filter(recipe_id=recipe_id).update(
+        score=added(value) if sign > 0 else subtracted(value)
+    )
+
+
+def record_events(events):
+    """
+    Add or remove many events with one UPDATE per recipe.
+
+    Args:
+        events (iterable): (recipe_id, weight, when, sign) tuples
+    """
+    # recipe_id -> [log of the additions, log of the removals]
+    totals = {}
+    for recipe_id, weight, when, sign in events:
+        total = totals.setdefault(recipe_id, [EMPTY, EMPTY])
+        side = 0 if sign > 0 else 1
+        total[side] = log_add(total[side], event_value(weight, when))
+    for recipe_id, (additions, removals) in totals.items():
+        if additions >= removals:
+            net = log_subtract(additions, removals)
+            score = added(net)
+        else:
+            net = log_subtract(removals, additions)
+            score = subtracted(net)
+        if net != EMPTY:
+            TrendingScore.objects.filter(recipe_id=recipe_id).update(
+                score=score
+            )
+
+
+def sync_recipe(recipe, created):
+    """
+    Create the score row for a new recipe, or copy changed listing
+    columns onto an existing one.
+    """
+    fields = {
+        "published": recipe.status == "published",
+        "category_id": recipe.category_id,
+        "country_id": recipe.country_id,
+    }
+    if created:
+        TrendingScore.objects.create(recipe_id=recipe.pk, **fields)
+        return
+    loaded = getattr(recipe, "_loaded_values", {})
+    if any(
+        loaded.get(name) != getattr(recipe, name)
+        for name in ("status", "category_id", "country_id")
+    ):
+        TrendingScore.objects.filter(recipe_id=recipe.pk).update(**fields)
+
+
+def rebuild_scores(batch_size=1000):
+    """
+    Recompute every score from the full like and comment history.
+
+    Returns:
+        int: Number of score rows written
+    """
+    scores = {}
+    events = [
+        (LIKE_WEIGHT, Like.objects.all()),
+        (COMMENT_WEIGHT, Comment.objects.filter(approved=True)),
+    ]
+    for weight, queryset in events:
+        rows = queryset.order_by().values_list("recipe_id", "created_at")
+        for recipe_id, created_at in rows.iterator(chunk_size=10000):
+            scores[recipe_id] = log_add(
+                scores.get(recipe_id, EMPTY), event_value(weight, created_at)
+            )
+
+    rows = [
+        TrendingScore(
+            recipe_id=pk,
+            score=scores.get(pk, EMPTY),
+            published=status == "published",
+            category_id=category_id,
+            country_id=country_id,
+        )
+        for pk, status, category_id, country_id in Recipe.objects.values_list(
+            "pk", "status", "category_id", "country_id"
+        ).iterator(chunk_size=10000)
+    ]
+    TrendingScore.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["recipe"],
+        update_fields=["score", "published", "category", "country"],
+    )
+    return len(rows)
@@ -3,7 +3,7 @@ URL patterns for recipes app
 """
 
 from django.urls import path
-from . import views
+from . import api, sitemaps, views
 
 urlpatterns = [
     # Home and recipe list
@@ -41,9 +41,31 @@ urlpatterns = [
         views.CountryRecipeListView.as_view(),
         name="country_recipes",
     ),
+    # Trending
+    path(
+        "trending/",
+        views.TrendingRecipeListView.as_view(),
+        name="trending"
+    ),
+    path(
+        "trending/category/<slug:slug>/",
+        views.TrendingRecipeListView.as_view(scope="category"),
+        name="trending_category",
+    ),
+    path(
+        "trending/cuisine/<slug:slug>/",
+        views.TrendingRecipeListView.as_view(scope="country"),
+        name="trending_country",
+    ),
     # Search
     path("search/", views.SearchRecipeView.as_view(), name="search_recipes"),
+    path("pantry/", views.PantryView.as_view(), name="pantry"),
     # Comments
+    path(
+        "recipe/<slug:slug>/comments/",
+        views.RecipeCommentsView.as_view(),
+        name="recipe_comments",
+    ),
     path(
         "recipe/<slug:slug>/comment/",
         views.add_comment,
@@ -60,7 +82,55 @@ urlpatterns = [
         views.toggle_like,
         name="toggle_like"
     ),
+    path(
+        "recipe/<slug:slug>/like/me/",
+        views.like_state,
+        name="like_state"
+    ),
+    path(
+        "recipe/<slug:slug>/like/me/async/",
+        views.like_state_async,
+        name="like_state_async",
+    ),
     path("favorites/", views.FavoritesListView.as_view(), name="favorites"),
+    # JSON API
+    path(
+        "api/recipes/",
+        api.RecipeListApiView.as_view(),
+        name="api_recipe_list",
+    ),
+    path(
+        "api/recipes/<slug:slug>/",
+        api.RecipeDetailApiView.as_view(),
+        name="api_recipe_detail",
+    ),
+    path(
+        "api/categories/<slug:slug>/recipes/",
+        api.CategoryRecipesApiView.as_view(),
+        name="api_category_recipes",
+    ),
+    path(
+        "api/cuisines/<slug:slug>/recipes/",
+        api.CountryRecipesApiView.as_view(),
+        name="api_country_recipes",
+    ),
+    path(
+        "api/search/",
+        api.SearchRecipesApiView.as_view(),
+        name="api_search_recipes",
+    ),
+    # Sitemaps and feeds, prebuilt by build_sitemaps
+    path("sitemap.xml", sitemaps.sitemap_index, name="sitemap_index"),
+    path(
+        "sitemaps/<slug:section>.xml",
+        sitemaps.sitemap_section,
+        name="sitemap_section",
+    ),
+    path(
+        "feeds/latest.<slug:feed_format>",
+        sitemaps.recipe_feed,
+        name="recipe_feed",
+    ),
     # User profile
     path(
         "profile/<str:username>/",
@@ -2,26 +2,162 @@
 Views for recipes app
 """
 
-from django.shortcuts import redirect, get_object_or_404
+import re
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import redirect, get_object_or_404, render
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.views.generic import (
     ListView,
+    TemplateView,
     DetailView,
     CreateView,
     UpdateView,
     DeleteView,
+    View,
 )
 from django.urls import reverse_lazy
-from django.db.models import Q, Count
-from django.http import JsonResponse
-from .models import Recipe, Category, Country, Comment, Like
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from .models import (
+    Recipe,
+    Comment,
+    Like,
+    RecipeRecommendation,
+    TrendingScore,
+)
 from .forms import RecipeForm, CommentForm
+from .like_buffer import like_buffer
+from .likes import flip_like, set_like, unset_like
+from .navigation import navigation
+from .page_cache import (
+    AnonymousPageCacheMixin,
+    ConditionalPageMixin,
+    author_tag,
+    category_tag,
+    country_tag,
+    recipe_tag,
+    LIST_TAG,
+    TRENDING_TAG,
+)
+from .pagination import (
+    CursorPaginationMixin,
+    CursorPaginator,
+    InvalidCursor,
+)
+from .pantry import pantry_index
+from .search import search_recipes
+
+COMMENTS_PER_PAGE = 20
+
+
+def published_recipes():
+    """Published recipes, newest first"""
+    return Recipe.objects.filter(status="published").order_by(
+        "-created_at", "-id"
+    )
+
+
+def category_recipes(category):
+    """Published recipes in ``category``, newest first"""
+    return published_recipes().filter(category=category)
+
+
+def country_recipes(country):
+    """Published recipes of ``country``'s cuisine, newest first"""
+    return published_recipes().filter(country=country)
+
+
+def matching_recipes(query):
+    """Published recipes matching a search ``query``, best match first"""
+    if not query:
+        return published_recipes().none()
+    return search_recipes(Recipe.objects.filter(status="published"), query)
+
+
+def recipe_comments(recipe):
+    """A recipe's approved comments, newest first, in a stable order"""
+    return (
+        Comment.objects.filter(recipe=recipe, approved=True)
+        .select_related("user")
+        .order_by("-created_at", "-id")
+    )
+
+
+def liked_recipe_ids(user, recipes):
+    """
+    Return the ids of ``recipes`` that ``user`` has liked.
+
+    Only the given recipes are looked up, in a single query, so the
+    cost depends on the page size rather than on how many likes the
+    user has ever made.
+
+    Args:
+        user (User): The requesting user, possibly anonymous
+        recipes (iterable): Recipes shown on the current page
+
+    Returns:
+        set: Liked recipe ids, for O(1) membership tests in templates
+    """
+    if not user.is_authenticated:
+        return set()
+    recipe_ids = [recipe.id for recipe in recipes]
+    if not recipe_ids:
+        return set()
+    liked = set(
+        Like.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list("recipe_id", flat=True)
+    )
+    if like_buffer.enabled:
+        # The user's own unflushed clicks win over the stored likes
+        pending = like_buffer.pending_state(user.pk, recipe_ids)
+        for recipe_id, (pending_liked, _) in pending.items():
+            if pending_liked:
+                liked.add(recipe_id)
+            else:
+                liked.discard(recipe_id)
+    return liked
+
+
+class LikedStateMixin:
+    """
+    Add ``user_liked_ids`` for the recipes on the current page to a
+    recipe ListView's context
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["user_liked_ids"] = liked_recipe_ids(
+            self.request.user, context["object_list"]
+        )
+        return context
+
+
+class RecipePageMixin(ConditionalPageMixin):
+    """
+    Conditional GET for pages showing recipes; the validators also
+    cover the user's unflushed likes when LIKE_BUFFER is on
+    """
 
+    def get_validator_extra(self):
+        user = self.request.user
+        if like_buffer.enabled and user.is_authenticated:
+            return like_buffer.user_stamp(user.pk)
+        return ""
 
-class RecipeListView(ListView):
+
+class RecipeListView(
+    RecipePageMixin,
+    AnonymousPageCacheMixin,
+    CursorPaginationMixin,
+    LikedStateMixin,
+    ListView,
+):
     """
     Display list of all published recipes
     """
@@ -31,33 +167,16 @@ class RecipeListView(ListView):
     context_object_name = "recipes"
     paginate_by = 12
 
+    def get_cache_tags(self):
+        return [LIST_TAG]
+
     def get_queryset(self):
-        return (
-            Recipe.objects.filter(status="published")
-            .select_related("author", "category", "country")
-            .annotate(like_count=Count("likes"))
-            .order_by("-created_at")
+        return published_recipes().select_related(
+            "author", "category", "country"
         )
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["categories"] = Category.objects.all()
-        context["countries"] = Country.objects.all()
-
-        # Get user's liked recipe IDs
-        if self.request.user.is_authenticated:
-            context["user_liked_ids"] = list(
-                Like.objects.filter(user=self.request.user).values_list(
-                    "recipe_id", flat=True
-                )
-            )
-        else:
-            context["user_liked_ids"] = []
-
-        return context
-
 
-class RecipeDetailView(DetailView):
+class RecipeDetailView(RecipePageMixin, AnonymousPageCacheMixin, DetailView):
     """
     Display detailed view of a single recipe
     """
@@ -66,28 +185,85 @@ class RecipeDetailView(DetailView):
     template_name = "recipes/recipe_detail.html"
     context_object_name = "recipe"
 
+    def get_cache_tags(self):
+        return [recipe_tag(self.kwargs["slug"])]
+
     def get_queryset(self):
         return Recipe.objects.select_related("author", "category", "country")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        recipe = self.get_object()
-        context["comments"] = recipe.comments.filter(
-            approved=True
-        ).select_related("user")
+        recipe = self.object
+        # Only the newest comments are inlined; the rest load on demand
+        # from RecipeCommentsView, so the page costs the same however
+        # many comments the recipe has
+        context["comments"] = CursorPaginator(
+            recipe_comments(recipe), COMMENTS_PER_PAGE
+        ).page()
         context["comment_form"] = CommentForm()
+        context["recommendations"] = [
+            row.recommended
+            for row in RecipeRecommendation.objects.filter(
+                recipe=recipe, recommended__status="published"
+            )
+            .select_related("recommended")
+            .order_by("position")
+        ]
 
         # Check if user has liked this recipe
-        if self.request.user.is_authenticated:
-            context["user_has_liked"] = Like.objects.filter(
-                recipe=recipe, user=self.request.user
-            ).exists()
-        else:
-            context["user_has_liked"] = False
+        context["user_has_liked"] = bool(
+            liked_recipe_ids(self.request.user, [recipe])
+        )
+        if like_buffer.enabled:
+            recipe.like_count += like_buffer.pending_deltas(
+                [recipe.pk]
+            ).get(recipe.pk, 0)
 
         return context
 
 
+class RecipeCommentsView(RecipePageMixin, AnonymousPageCacheMixin, View):
+    """
+    One page of a recipe's approved comments, newest first, selected by
+    ``?cursor=``. Returns the HTML fragment the detail page appends, or
+    JSON with ``?format=json``.
+    """
+
+    def get_cache_tags(self):
+        return [recipe_tag(self.kwargs["slug"])]
+
+    def get(self, request, slug):
+        recipe = get_object_or_404(
+            Recipe.objects.only("id", "slug"), slug=slug
+        )
+        paginator = CursorPaginator(
+            recipe_comments(recipe), COMMENTS_PER_PAGE
+        )
+        try:
+            page = paginator.page(request.GET.get("cursor"))
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
+
+        if request.GET.get("format") == "json":
+            return JsonResponse({
+                "comments": [
+                    {
+                        "id": comment.pk,
+                        "user": comment.user.username,
+                        "content": comment.content,
+                        "created_at": comment.created_at.isoformat(),
+                    }
+                    for comment in page
+                ],
+                "next_cursor": page.next_cursor,
+            })
+        return render(
+            request,
+            "recipes/includes/comment_page.html",
+            {"recipe": recipe, "comments": page},
+        )
+
+
 class RecipeCreateView(LoginRequiredMixin, CreateView):
     """
     Create a new recipe (requires login)
@@ -103,7 +279,30 @@ class RecipeCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class RecipeUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class RecipeOwnerMixin(UserPassesTestMixin):
+    """
+    Only the recipe author or site admin passes. The recipe is loaded
+    once for the permission test and the view, with the category and
+    country that the page cache invalidation needs.
+    """
+
+    def get_queryset(self):
+        return Recipe.objects.select_related("category", "country")
+
+    def get_object(self, queryset=None):
+        if not hasattr(self, "_recipe"):
+            self._recipe = super().get_object(queryset)
+        return self._recipe
+
+    def test_func(self):
+        recipe = self.get_object()
+        return (
+            recipe.author_id == self.request.user.pk
+            or self.request.user.is_staff
+        )
+
+
+class RecipeUpdateView(LoginRequiredMixin, RecipeOwnerMixin, UpdateView):
     """
     Update an existing recipe. Only the recipe author or site admin can edit.
     """
@@ -112,16 +311,14 @@ class RecipeUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     form_class = RecipeForm
     template_name = "recipes/recipe_form.html"
 
-    def test_func(self):
-        recipe = self.get_object()
-        return self.request.user == recipe.author or self.request.user.is_staff
-
     def form_valid(self, form):
         messages.success(self.request, "Recipe updated successfully!")
-        return super().form_valid(form)
+        # One transaction for the row and everything its signals rewrite
+        with transaction.atomic():
+            return super().form_valid(form)
 
 
-class RecipeDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class RecipeDeleteView(LoginRequiredMixin, RecipeOwnerMixin, DeleteView):
     """
     Delete a recipe. Only the recipe author or site admin can delete.
     """
@@ -130,16 +327,18 @@ class RecipeDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     template_name = "recipes/recipe_confirm_delete.html"
     success_url = reverse_lazy("home")
 
-    def test_func(self):
-        recipe = self.get_object()
-        return self.request.user == recipe.author or self.request.user.is_staff
-
     def delete(self, request, *args, **kwargs):
         messages.success(request, "Recipe deleted successfully!")
         return super().delete(request, *args, **kwargs)
 
 
-class CategoryRecipeListView(ListView):
+class CategoryRecipeListView(
+    RecipePageMixin,
+    AnonymousPageCacheMixin,
+    CursorPaginationMixin,
+    LikedStateMixin,
+    ListView,
+):
     """
     Display recipes filtered by category
     """
@@ -149,36 +348,28 @@ class CategoryRecipeListView(ListView):
     context_object_name = "recipes"
     paginate_by = 12
 
+    def get_cache_tags(self):
+        return [category_tag(self.kwargs["slug"])]
+
     def get_queryset(self):
-        self.category = get_object_or_404(
-            Category, slug=self.kwargs["slug"]
-        )
-        return (
-            Recipe.objects.filter(
-                category=self.category, status="published"
-            )
-            .select_related("author", "country")
-            .order_by("-created_at")
+        self.category = navigation.get_category(self.kwargs["slug"])
+        return category_recipes(self.category).select_related(
+            "author", "country"
         )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["category"] = self.category
-
-        # Get user's liked recipe IDs
-        if self.request.user.is_authenticated:
-            context["user_liked_ids"] = list(
-                Like.objects.filter(user=self.request.user).values_list(
-                    "recipe_id", flat=True
-                )
-            )
-        else:
-            context["user_liked_ids"] = []
-
         return context
 
 
-class CountryRecipeListView(ListView):
+class CountryRecipeListView(
+    RecipePageMixin,
+    AnonymousPageCacheMixin,
+    CursorPaginationMixin,
+    LikedStateMixin,
+    ListView,
+):
     """
     Display recipes filtered by country/cuisine
     """
@@ -188,40 +379,73 @@ class CountryRecipeListView(ListView):
     context_object_name = "recipes"
     paginate_by = 12
 
+    def get_cache_tags(self):
+        return [country_tag(self.kwargs["slug"])]
+
     def get_queryset(self):
-        self.country = get_object_or_404(
-            Country, slug=self.kwargs["slug"]
-        )
-        return (
-            Recipe.objects.filter(
-                country=self.country, status="published"
-            )
-            .select_related("author", "category", "country")
-            .order_by("-created_at")
+        self.country = navigation.get_country(self.kwargs["slug"])
+        return country_recipes(self.country).select_related(
+            "author", "category", "country"
         )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["country"] = self.country
-        context["categories"] = Category.objects.all()
-        context["countries"] = Country.objects.all()
-
-        # Get user's liked recipe IDs
-        if self.request.user.is_authenticated:
-            context["user_liked_ids"] = list(
-                Like.objects.filter(user=self.request.user).values_list(
-                    "recipe_id", flat=True
-                )
-            )
-        else:
-            context["user_liked_ids"] = []
+        return context
+
+
+class TrendingRecipeListView(
+    RecipePageMixin,
+    AnonymousPageCacheMixin,
+    CursorPaginationMixin,
+    LikedStateMixin,
+    ListView,
+):
+    """
+    Display published recipes ranked by time-decayed likes and comments,
+    overall or within one category (scope="category") or cuisine
+    (scope="country")
+    """
+
+    template_name = "recipes/trending.html"
+    context_object_name = "recipes"
+    paginate_by = 12
+    scope = None
+
+    def get_cache_tags(self):
+        return [TRENDING_TAG]
+
+    def get_queryset(self):
+        self.category = self.country = None
+        queryset = TrendingScore.objects.filter(published=True)
+        if self.scope == "category":
+            self.category = navigation.get_category(self.kwargs["slug"])
+            queryset = queryset.filter(category=self.category)
+        elif self.scope == "country":
+            self.country = navigation.get_country(self.kwargs["slug"])
+            queryset = queryset.filter(country=self.country)
+        return queryset.select_related(
+            "recipe__author", "recipe__category", "recipe__country"
+        ).order_by("-score", "-recipe_id")
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, rows, is_paginated = super().paginate_queryset(
+            queryset, page_size
+        )
+        # Cursors are built from the score rows; the cards need recipes
+        page.object_list = [row.recipe for row in rows]
+        return paginator, page, page.object_list, is_paginated
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["category"] = self.category
+        context["country"] = self.country
         return context
 
 
-class SearchRecipeView(ListView):
+class SearchRecipeView(CursorPaginationMixin, LikedStateMixin, ListView):
     """
-    Search recipes by title or ingredients
+    Search recipes by title, ingredients or description, best match first
     """
 
     model = Recipe
@@ -230,40 +454,75 @@ class SearchRecipeView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        query = self.request.GET.get("q", "")
-        if query:
-            return (
-                Recipe.objects.filter(
-                    Q(title__icontains=query)
-                    | Q(ingredients__icontains=query)
-                    | Q(description__icontains=query),
-                    status="published",
-                )
-                .select_related("author", "category", "country")
-                .order_by("-created_at")
-            )
-        return Recipe.objects.none()
+        return matching_recipes(self.request.GET.get("q", "")).select_related(
+            "author", "category", "country"
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["query"] = self.request.GET.get("q", "")
-        context["categories"] = Category.objects.all()
-        context["countries"] = Country.objects.all()
-
-        # Get user's liked recipe IDs
-        if self.request.user.is_authenticated:
-            context["user_liked_ids"] = list(
-                Like.objects.filter(user=self.request.user).values_list(
-                    "recipe_id", flat=True
-                )
-            )
-        else:
-            context["user_liked_ids"] = []
+        return context
+
+
+class PantryView(TemplateView):
+    """
+    Rank recipes by how few ingredients they need beyond the user's
+    pantry: fully makeable first, then missing one item, and so on
+    """
+
+    template_name = "recipes/pantry.html"
+    per_group = 12
+    max_missing = 5
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("ingredients", "")
+        try:
+            missing = int(self.request.GET.get("missing", 2))
+        except ValueError:
+            missing = 2
+        missing = min(max(missing, 0), self.max_missing)
+        context.update(
+            query=query, missing=missing, groups=[], unknown=[], found=False
+        )
+
+        entries = [entry for entry in re.split(r"[,\n]", query)
+                   if entry.strip()]
+        if not entries:
+            return context
 
+        have, context["unknown"] = pantry_index.resolve(entries)
+        have |= pantry_index.staple_ids()
+        groups = pantry_index.match(
+            have, max_missing=missing, limit=self.per_group
+        )
+        # The index may trail deletions made by other workers, so load
+        # the page's recipes through the published filter
+        recipes = (
+            Recipe.objects.filter(status="published")
+            .select_related("author", "category", "country")
+            .in_bulk(
+                [recipe_id for group in groups
+                 for recipe_id, _ in group["recipes"]]
+            )
+        )
+        for group in groups:
+            group["recipes"] = [
+                (recipes[recipe_id], names)
+                for recipe_id, names in group["recipes"]
+                if recipe_id in recipes
+            ]
+        context["groups"] = groups
+        context["found"] = any(group["total"] for group in groups)
+        context["user_liked_ids"] = liked_recipe_ids(
+            self.request.user, recipes.values()
+        )
         return context
 
 
-class UserProfileView(ListView):
+class UserProfileView(
+    RecipePageMixin, CursorPaginationMixin, LikedStateMixin, ListView
+):
     """
     Display user's profile with their recipes
     """
@@ -273,37 +532,36 @@ class UserProfileView(ListView):
     context_object_name = "recipes"
     paginate_by = 12
 
+    def get_profile_user(self):
+        if not hasattr(self, "profile_user"):
+            self.profile_user = get_object_or_404(
+                User, username=self.kwargs["username"]
+            )
+        return self.profile_user
+
+    def get_cache_tags(self):
+        return [author_tag(self.get_profile_user().pk)]
+
     def get_queryset(self):
-        self.profile_user = get_object_or_404(
-            User, username=self.kwargs["username"]
-        )
         return (
             Recipe.objects.filter(
-                author=self.profile_user, status="published"
+                author=self.get_profile_user(), status="published"
             )
-            .select_related("category", "country")
-            .order_by("-created_at")
+            .select_related("author", "category", "country")
+            .order_by("-created_at", "-id")
         )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["profile_user"] = self.profile_user
-        context["total_recipes"] = self.get_queryset().count()
-
-        # Get user's liked recipe IDs
-        if self.request.user.is_authenticated:
-            context["user_liked_ids"] = list(
-                Like.objects.filter(user=self.request.user).values_list(
-                    "recipe_id", flat=True
-                )
-            )
-        else:
-            context["user_liked_ids"] = []
-
+        context["is_own_profile"] = self.request.user == self.profile_user
+        context["total_recipes"] = self.object_list.count()
         return context
 
 
-class FavoritesListView(LoginRequiredMixin, ListView):
+class FavoritesListView(
+    LoginRequiredMixin, CursorPaginationMixin, LikedStateMixin, ListView
+):
     """
     Display user's favorite/liked recipes
     """
@@ -318,27 +576,21 @@ class FavoritesListView(LoginRequiredMixin, ListView):
         liked_recipe_ids = Like.objects.filter(
             user=self.request.user
         ).values_list("recipe_id", flat=True)
+        liked = Q(id__in=liked_recipe_ids)
+        if like_buffer.enabled:
+            user_id = self.request.user.pk
+            liked = (
+                liked | Q(id__in=like_buffer.liked_ids(user_id))
+            ) & ~Q(id__in=like_buffer.unliked_ids(user_id))
         return (
-            Recipe.objects.filter(
-                id__in=liked_recipe_ids, status="published"
-            )
+            Recipe.objects.filter(liked, status="published")
             .select_related("author", "category", "country")
-            .annotate(like_count=Count("likes"))
-            .order_by("-created_at")
+            .order_by("-created_at", "-id")
         )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["total_favorites"] = self.get_queryset().count()
-
-        # Get user's liked recipe IDs
-        # (all recipes in favorites are liked by definition)
-        context["user_liked_ids"] = list(
-            Like.objects.filter(user=self.request.user).values_list(
-                "recipe_id", flat=True
-            )
-        )
-
         return context
 
 
@@ -366,7 +618,8 @@ def add_comment(request, slug):
                 comment = form.save(commit=False)
                 comment.recipe = recipe
                 comment.user = request.user
-                comment.save()
+                with transaction.atomic():
+                    comment.save()
                 messages.success(request, "Comment added successfully!")
             except Exception:
                 messages.error(
@@ -398,7 +651,8 @@ def delete_comment(request, pk):
     if request.user == comment.user or request.user.is_staff:
         recipe_slug = comment.recipe.slug
         try:
-            comment.delete()
+            with transaction.atomic():
+                comment.delete()
             messages.success(request, "Comment deleted successfully!")
         except Exception:
             messages.error(
@@ -429,33 +683,28 @@ def toggle_like(request, slug):
     Raises:
         Http404: If recipe with given slug does not exist
     """
-    recipe = get_object_or_404(Recipe, slug=slug)
-
     try:
-        like, created = Like.objects.get_or_create(
-            recipe=recipe, user=request.user
-        )
+        liked, total_likes = flip_like(request.user, slug)
 
-        if not created:
-            like.delete()
-            liked = False
-            message = "Recipe removed from favorites!"
-        else:
-            liked = True
+        if liked:
             message = "Recipe added to favorites!"
+        else:
+            message = "Recipe removed from favorites!"
 
         # If AJAX request, return JSON
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
             return JsonResponse({
                 "success": True,
                 "liked": liked,
-                "total_likes": recipe.total_likes()
+                "total_likes": total_likes
             })
 
         # Otherwise, redirect back to the page the user came from
         messages.success(request, message)
         return redirect(request.META.get("HTTP_REFERER", "home"))
 
+    except Http404:
+        raise
     except Exception:
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
             return JsonResponse(
@@ -470,3 +719,51 @@ def toggle_like(request, slug):
             "Unable to update favorite status. Please try again."
         )
         return redirect(request.META.get("HTTP_REFERER", "home"))
+
+
+def _set_like_state(request, slug):
+    if request.method not in ("PUT", "DELETE"):
+        return HttpResponseNotAllowed(["PUT", "DELETE"])
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {"success": False, "error": "Log in to add favorites"},
+            status=401,
+        )
+    liked = request.method == "PUT"
+    change = set_like if liked else unset_like
+    changed, total_likes = change(request.user, slug)
+    return JsonResponse({
+        "success": True,
+        "liked": liked,
+        "changed": changed,
+        "total_likes": total_likes,
+    })
+
+
+def like_state(request, slug):
+    """
+    Like (PUT) or unlike (DELETE) a recipe for the current user.
+    Unlike toggle_like, repeating a request changes nothing, so a
+    double click or a retried request cannot undo itself.
+
+    Args:
+        request (HttpRequest): The HTTP request object
+        slug (str): The unique slug identifier for the recipe
+
+    Returns:
+        JsonResponse: The like status, whether this request changed it,
+            and the recipe's like count; 401 for anonymous users
+
+    Raises:
+        Http404: If recipe with given slug does not exist
+    """
+    return _set_like_state(request, slug)
+
+
+async def like_state_async(request, slug):
+    """
+    Async variant of like_state for deployments served through
+    recipe_project.asgi: the event loop keeps serving other requests
+    while the database work runs in Django's sync thread.
+    """
+    return await sync_to_async(_set_like_state)(request, slug)
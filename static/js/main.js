@@ -160,13 +160,19 @@ document.addEventListener('DOMContentLoaded', function() {
             e.preventDefault();
             
             const form = e.target;
-            const url = form.action;
             const button = form.querySelector('button[type="submit"]');
             const heartSpan = button.querySelector('span');
+            // Ask for the state the heart should end up in, so a double
+            // click cannot undo itself
+            const url = form.dataset.likeUrl || form.action;
+            let method = 'POST';
+            if (form.dataset.likeUrl) {
+                method = heartSpan.classList.contains('text-danger') ? 'DELETE' : 'PUT';
+            }
             
             // Send AJAX request
             fetch(url, {
-                method: 'POST',
+                method: method,
                 headers: {
                     'X-CSRFToken': csrftoken,
                     'X-Requested-With': 'XMLHttpRequest'
@@ -204,3 +210,31 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 });
+
+// Load further pages of comments in place
+document.addEventListener('DOMContentLoaded', function() {
+    document.addEventListener('click', function(e) {
+        const link = e.target.closest('.load-more-comments a');
+        if (!link) {
+            return;
+        }
+        e.preventDefault();
+
+        const container = link.parentElement;
+        link.classList.add('disabled');
+        fetch(link.href, {
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            credentials: 'same-origin'
+        })
+        .then(response => response.text())
+        .then(html => {
+            // The fragment ends with its own "load more" link, if any
+            container.insertAdjacentHTML('beforebegin', html);
+            container.remove();
+        })
+        .catch(error => {
+            link.classList.remove('disabled');
+            console.error('Error:', error);
+        });
+    });
+});